@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+"""
+Load and soak test for a running Professor Finder server.
+
+Drives the HTTP API with a configurable request mix and concurrency, for a fixed
+duration or number of requests, and reports throughput, latency percentiles,
+error rates and SQLite lock errors ("database is locked"). Lock errors are
+counted from the server's X-DB-Locked response header (set by its metrics
+middleware, so METRICS_ENABLED must be on), which works with DEBUG off and
+also catches lock errors a view handled itself.
+
+Searches need upstream APIs; --stub-upstream starts a local Tavily/Groq
+stand-in so no quota is spent. Start the server pointed at it, e.g.:
+
+    python load_test.py --stub-upstream --stub-only &
+    TAVILY_API_URL=http://127.0.0.1:8765/search \\
+    GROQ_API_URL=http://127.0.0.1:8765/chat/completions \\
+    TAVILY_API_KEY=stub GROQ_API_KEY=stub python manage.py runserver --noreload
+
+    python load_test.py --duration 60 --concurrency 16
+    python load_test.py --sweep 1,2,4,8,16,32 --duration 20   # find where throughput saturates
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+DEFAULT_MIX = 'list=50,list_filtered=20,locations=20,search=10'
+KINDS = ('list', 'list_filtered', 'locations', 'search')
+LOCKED_HEADER = 'X-DB-Locked'
+
+SKILLS = [
+    'machine learning', 'robotics', 'quantum computing', 'computer vision', 'databases',
+    'natural language processing', 'cryptography', 'bioinformatics', 'control theory',
+    'distributed systems', 'graph theory', 'signal processing',
+]
+FIRST_NAMES = ['Alice', 'Bob', 'Carol', 'David', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy']
+LAST_NAMES = ['Smith', 'Chen', 'Garcia', 'Kumar', 'Novak', 'Okafor', 'Rossi', 'Sato', 'Weber', 'Young']
+
+
+# Stub upstream
+
+class StubUpstreamHandler(BaseHTTPRequestHandler):
+    """Answers Tavily /search and Groq /chat/completions with plausible canned data"""
+
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        if self.path.endswith('/search'):
+            query = request.get('query', '')
+            self._reply({'results': [
+                {
+                    'url': f'https://example.edu/people/{i}-{abs(hash(query)) % 100000}',
+                    'title': f'Faculty profile {i}',
+                    'content': f'Professor profile page. {query}',
+                    'raw_content': f'Professor profile page. {query} ' * 20,
+                }
+                for i in range(5)
+            ]})
+        elif self.path.endswith('/chat/completions'):
+            professors = [
+                {
+                    'name': f'{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)} '
+                            f'{"".join(random.choices(string.ascii_uppercase, k=3))}',
+                    'email': '',
+                    'portfolio_link': 'https://example.edu/people/stub',
+                    'department': 'Computer Science',
+                    'university': '',
+                    'skills': ', '.join(random.sample(SKILLS, 2)),
+                }
+                for _ in range(random.randint(1, 4))
+            ]
+            self._reply({'choices': [{'message': {'content': json.dumps(professors)}}]})
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+def start_stub(port, latency):
+    StubUpstreamHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubUpstreamHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Stub upstream listening on http://127.0.0.1:{server.server_port} "
+          f"(/search, /chat/completions, ~{latency}s latency)")
+    return server
+
+
+# Request mix
+
+class Workload:
+    """Builds randomized requests for each kind in the mix"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.countries, self.cities, self.universities = [], [], []
+
+    def discover(self, session):
+        """Learn some real location ids and names for the location and filter requests"""
+        self.countries = session.get(f'{self.base_url}/api/countries/', timeout=self.timeout).json().get('countries', [])
+        for country in self.countries[:10]:
+            cities = session.get(f'{self.base_url}/api/cities/{country["id"]}/', timeout=self.timeout).json()
+            for city in cities.get('cities', [])[:10]:
+                self.cities.append({**city, 'country': country['name']})
+        for city in self.cities[:20]:
+            universities = session.get(f'{self.base_url}/api/universities/{city["id"]}/', timeout=self.timeout).json()
+            for university in universities.get('universities', [])[:10]:
+                self.universities.append({**university, 'city': city['name'], 'country': city['country']})
+        print(f"Discovered {len(self.countries)} countries, {len(self.cities)} cities, "
+              f"{len(self.universities)} universities")
+
+    def request(self, kind):
+        """Return (method, url, json body or None)"""
+        base = self.base_url
+        if kind == 'list':
+            return 'GET', f'{base}/api/professors/?page={random.randint(1, 5)}', None
+        if kind == 'list_filtered':
+            params = random.choice([
+                {'skills': random.choice(SKILLS)},
+                {'country': random.choice(self.countries)['name'] if self.countries else 'USA'},
+                {'university': random.choice(self.universities)['name'] if self.universities else 'MIT',
+                 'skills': random.choice(SKILLS)},
+                {'city': random.choice(self.cities)['name'] if self.cities else 'Boston', 'page_size': 50},
+            ])
+            return 'GET', f'{base}/api/professors/', params
+        if kind == 'locations':
+            choices = [('countries', f'{base}/api/countries/')]
+            if self.countries:
+                choices.append(('cities', f'{base}/api/cities/{random.choice(self.countries)["id"]}/'))
+            if self.cities:
+                choices.append(('universities', f'{base}/api/universities/{random.choice(self.cities)["id"]}/'))
+            if self.universities:
+                choices.append(('departments', f'{base}/api/departments/{random.choice(self.universities)["id"]}/'))
+            return 'GET', random.choice(choices)[1], None
+        if kind == 'search':
+            university = random.choice(self.universities) if self.universities else {
+                'name': 'Massachusetts Institute of Technology', 'city': 'Cambridge', 'country': 'United States'}
+            return 'POST', f'{base}/api/search/', {
+                'country': university['country'],
+                'city': university['city'],
+                'university': university['name'],
+                'department': 'Computer Science',
+                'skills': ', '.join(random.sample(SKILLS, 2)),
+                'local_first': False,
+            }
+        raise ValueError(f'Unknown request kind: {kind}')
+
+
+# Results
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.locked = 0
+
+    def add(self, kind, seconds, error=None, locked=False):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            if error:
+                self.errors[kind][error] += 1
+            if locked:
+                self.locked += 1
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_phase(workload, mix, concurrency, duration, total_requests):
+    kinds, weights = zip(*mix.items())
+    results = Results()
+    stop_at = time.monotonic() + duration if duration else None
+    issued = [0]
+    issued_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            if stop_at and time.monotonic() >= stop_at:
+                return
+            with issued_lock:
+                if total_requests and issued[0] >= total_requests:
+                    return
+                issued[0] += 1
+            kind = random.choices(kinds, weights)[0]
+            method, url, body = workload.request(kind)
+            started = time.perf_counter()
+            error, locked = None, False
+            try:
+                if method == 'GET':
+                    response = session.get(url, params=body, timeout=workload.timeout)
+                else:
+                    response = session.post(url, json=body, timeout=workload.timeout)
+                if response.status_code >= 400:
+                    error = str(response.status_code)
+                locked = int(response.headers.get(LOCKED_HEADER, 0)) > 0
+            except requests.exceptions.Timeout:
+                error = 'timeout'
+            except requests.exceptions.RequestException:
+                error = 'connection'
+            results.add(kind, time.perf_counter() - started, error, locked)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        workers = [executor.submit(worker) for _ in range(concurrency)]
+    for future in workers:
+        # A bug in the harness should stop the run, not quietly shrink the concurrency
+        future.result()
+    return results, time.monotonic() - started
+
+
+def report(results, elapsed, concurrency):
+    total = sum(len(values) for values in results.latencies.values())
+    total_errors = sum(sum(errors.values()) for errors in results.errors.values())
+    # A run can finish within the clock's resolution (e.g. every request refused at once)
+    seconds = max(elapsed, 1e-9)
+    print(f"\n=== Concurrency {concurrency}: {total} requests in {elapsed:.1f}s "
+          f"= {total / seconds:.1f} req/s, errors {total_errors} "
+          f"({100.0 * total_errors / max(total, 1):.1f}%), SQLite locked {results.locked} ===")
+    print(f"{'kind':<15}{'count':>8}{'req/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  errors")
+    for kind in sorted(results.latencies):
+        ordered = sorted(results.latencies[kind])
+        errors = ', '.join(f'{code}: {count}' for code, count in sorted(results.errors[kind].items())) or '-'
+        print(f"{kind:<15}{len(ordered):>8}{len(ordered) / seconds:>9.1f}"
+              f"{percentile(ordered, 0.5) * 1000:>10.1f}{percentile(ordered, 0.9) * 1000:>10.1f}"
+              f"{percentile(ordered, 0.99) * 1000:>10.1f}{ordered[-1] * 1000:>10.1f}  {errors}")
+    return total / seconds
+
+
+def parse_mix(text):
+    """``kind=weight,...`` as a dict; raises ValueError for unknown kinds or bad weights"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"unknown request kind {kind!r} (choose from {', '.join(KINDS)})")
+        try:
+            weight = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"weight for {kind!r} is not a number: {weight!r}") from None
+        if weight < 0:
+            raise ValueError(f"weight for {kind!r} is negative")
+        if weight > 0:
+            mix[kind] = weight
+    if not mix:
+        raise ValueError('the mix has no request kinds with a positive weight')
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--sweep', help='Comma-separated concurrency levels to run one after another')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per phase (0 = use --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='Requests per phase when --duration is 0')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Request kinds and weights (default {DEFAULT_MIX})')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--stub-upstream', action='store_true', help='Start the local Tavily/Groq stand-in')
+    parser.add_argument('--stub-port', type=int, default=8765)
+    parser.add_argument('--stub-latency', type=float, default=0.3, help='Mean stub response time in seconds')
+    parser.add_argument('--stub-only', action='store_true', help='Only run the stub upstream until interrupted')
+    args = parser.parse_args()
+
+    if args.stub_upstream or args.stub_only:
+        start_stub(args.stub_port, args.stub_latency)
+    if args.stub_only:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return
+
+    if not args.duration and not args.requests:
+        parser.error('give --duration or --requests')
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(f'--mix: {e}')
+
+    workload = Workload(args.base_url, args.timeout)
+    try:
+        workload.discover(requests.Session())
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"✗ Could not reach {args.base_url}: {e}")
+        sys.exit(1)
+
+    levels = [int(level) for level in args.sweep.split(',')] if args.sweep else [args.concurrency]
+    throughput = []
+    for concurrency in levels:
+        results, elapsed = run_phase(workload, mix, concurrency, args.duration, args.requests)
+        throughput.append((concurrency, report(results, elapsed, concurrency)))
+
+    if len(throughput) > 1:
+        print("\n=== Throughput by concurrency ===")
+        best = max(rate for _, rate in throughput)
+        for concurrency, rate in throughput:
+            bar = '#' * int(40 * rate / best) if best else ''
+            print(f"{concurrency:>5} {rate:>9.1f} req/s  {bar}")
+        saturated = next((c for c, rate in throughput if rate >= 0.9 * best), throughput[-1][0])
+        print(f"Throughput reaches 90% of its peak at concurrency {saturated}")
+
+
+if __name__ == '__main__':
+    main()
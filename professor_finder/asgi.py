@@ -8,9 +8,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
-from django.core.asgi import get_asgi_application
+_started = time.perf_counter()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'professor_finder.settings')
 
 application = get_asgi_application()
+
+# Do the first request's one-off work (imports, connections, caches) now
+from search.warmup import warm_up  # noqa: E402
+
+warm_up(import_seconds=time.perf_counter() - _started)
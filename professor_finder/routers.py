@@ -0,0 +1,25 @@
+from django.db import connections
+
+
+class ReadReplicaRouter:
+    """
+    Send reads to the read-only "replica" connection and all writes to "default".
+
+    Both aliases open the same SQLite file; in WAL mode readers see every
+    committed write and never wait for the writer. Reads made inside a
+    transaction on "default" stay there so they see its uncommitted changes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return 'replica'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
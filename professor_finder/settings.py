@@ -12,14 +12,16 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables from .env (python-dotenv is only imported when there is one)
+DOTENV_PATH = Path(os.getenv('DOTENV_PATH', BASE_DIR / '.env'))
+if DOTENV_PATH.is_file():
+    from dotenv import load_dotenv
+    load_dotenv(DOTENV_PATH)
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -46,11 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'search.middleware.MetricsMiddleware',
+    'search.middleware.SQLBudgetMiddleware',
+    'search.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'search.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,13 +84,58 @@ WSGI_APPLICATION = 'professor_finder.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite is run in WAL mode so readers don't block on the writer. WAL is a
+# property of the database file, set once by migration 0007_sqlite_wal; the
+# pragmas below are per connection and applied to every new one. Connections
+# are kept for SQLITE_CONN_MAX_AGE seconds. There is no dedicated writer
+# thread or process: SQLite itself allows one writer at a time, and starting
+# transactions with BEGIN IMMEDIATE makes each writer take that lock up front,
+# so concurrent writers queue on busy_timeout instead of failing with
+# "database is locked" when a read transaction tries to upgrade.
+SQLITE_PATH = BASE_DIR / 'db.sqlite3'
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '20000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_CONN_MAX_AGE = int(os.getenv('SQLITE_CONN_MAX_AGE', '600'))
+# Route reads to a separate read-only connection ("replica" alias, same file)
+SQLITE_READ_REPLICA = os.getenv('SQLITE_READ_REPLICA', 'True').lower() == 'true'
+
+SQLITE_PRAGMAS = (
+    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};'
+    f'PRAGMA synchronous=NORMAL;'
+    f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};'
+    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+    f'PRAGMA temp_store=MEMORY'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_PATH,
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+if SQLITE_READ_REPLICA:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{SQLITE_PATH}?mode=ro',
+        'CONN_MAX_AGE': SQLITE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS + ';PRAGMA query_only=ON',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    DATABASE_ROUTERS = ['professor_finder.routers.ReadReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,6 +173,179 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Search pipeline
+# Overall time budget for one /api/search/ request; clients may ask for less
+# (or up to SEARCH_MAX_DEADLINE_SECONDS) via the "timeout" field.
+SEARCH_DEFAULT_DEADLINE_SECONDS = float(os.getenv('SEARCH_DEFAULT_DEADLINE_SECONDS', '45'))
+SEARCH_MAX_DEADLINE_SECONDS = float(os.getenv('SEARCH_MAX_DEADLINE_SECONDS', '90'))
+
+# Local-first search: answer from stored professors when at least
+# SEARCH_LOCAL_MIN_RESULTS matches were verified in the last SEARCH_LOCAL_MAX_AGE_DAYS.
+# Clients can also ask for it with "local_first": true.
+SEARCH_LOCAL_FIRST = os.getenv('SEARCH_LOCAL_FIRST', 'False').lower() == 'true'
+SEARCH_LOCAL_MIN_RESULTS = int(os.getenv('SEARCH_LOCAL_MIN_RESULTS', '5'))
+SEARCH_LOCAL_MAX_AGE_DAYS = int(os.getenv('SEARCH_LOCAL_MAX_AGE_DAYS', '30'))
+# How long (seconds) an empty upstream outcome is remembered for identical searches
+SEARCH_NEGATIVE_CACHE_TTL = int(os.getenv('SEARCH_NEGATIVE_CACHE_TTL', '600'))
+
+# Minimum score (0-1) for two professor records to be treated as the same person,
+# both when saving search results and in `manage.py dedupe_professors`
+DEDUP_MATCH_THRESHOLD = float(os.getenv('DEDUP_MATCH_THRESHOLD', '0.85'))
+
+# `manage.py refresh_stale_professors`: re-verify professors older than
+# REFRESH_MAX_AGE_DAYS using at most REFRESH_SEARCH_QUOTA upstream searches per run
+REFRESH_MAX_AGE_DAYS = int(os.getenv('REFRESH_MAX_AGE_DAYS', '90'))
+REFRESH_SEARCH_QUOTA = int(os.getenv('REFRESH_SEARCH_QUOTA', '20'))
+REFRESH_CONCURRENCY = int(os.getenv('REFRESH_CONCURRENCY', '2'))
+
+# University/Department name canonicalization: incoming names at or above
+# CANONICAL_MATCH_THRESHOLD map to the existing row; between the two thresholds
+# a new row is created and queued for review in the admin.
+CANONICAL_MATCH_THRESHOLD = float(os.getenv('CANONICAL_MATCH_THRESHOLD', '0.85'))
+CANONICAL_REVIEW_THRESHOLD = float(os.getenv('CANONICAL_REVIEW_THRESHOLD', '0.6'))
+
+# "Similar professors" index (needs numpy): memory-mapped skill vectors,
+# built with `manage.py build_similarity_index` and updated as professors are saved
+SIMILARITY_INDEX_DIR = Path(os.getenv('SIMILARITY_INDEX_DIR', BASE_DIR / 'var' / 'similarity'))
+SIMILARITY_DIM = int(os.getenv('SIMILARITY_DIM', '128'))
+
+# Upstream API endpoints. Override to point searches at a local stand-in
+# (e.g. the stub server started by load_test.py --stub-upstream).
+TAVILY_API_URL = os.getenv('TAVILY_API_URL', 'https://api.tavily.com/search')
+GROQ_API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1/chat/completions')
+
+# Latency tier used to route Groq extraction when the client doesn't send "tier"
+# (fast, balanced or thorough; see search/routing.py)
+GROQ_DEFAULT_TIER = os.getenv('GROQ_DEFAULT_TIER', 'balanced')
+
+# Multi-query fan-out: run narrower Tavily queries per skill / department alias
+# and merge them by URL. Clients can also ask for it with "fan_out": true.
+TAVILY_FAN_OUT = os.getenv('TAVILY_FAN_OUT', 'False').lower() == 'true'
+TAVILY_FANOUT_MAX_VARIANTS = int(os.getenv('TAVILY_FANOUT_MAX_VARIANTS', '4'))
+
+# Upstream (Tavily/Groq) circuit breakers: open after this many consecutive
+# failures or slow calls, then allow a probe call after the reset period.
+UPSTREAM_BREAKER_FAILURES = int(os.getenv('UPSTREAM_BREAKER_FAILURES', '5'))
+UPSTREAM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv('UPSTREAM_BREAKER_SLOW_CALL_SECONDS', '20'))
+UPSTREAM_BREAKER_RESET_SECONDS = float(os.getenv('UPSTREAM_BREAKER_RESET_SECONDS', '30'))
+# Upstreams to hedge (send a duplicate once a call passes its p95), e.g. "groq"
+UPSTREAM_HEDGING = {name.strip() for name in os.getenv('UPSTREAM_HEDGING', '').split(',') if name.strip()}
+
+# Priority lanes in front of each upstream (per process): at most
+# UPSTREAM_MAX_CONCURRENCY calls in flight, UPSTREAM_INTERACTIVE_RESERVED of them
+# only usable by interactive searches; queued calls are served by weighted fair
+# queuing with UPSTREAM_LANE_WEIGHTS, e.g. "interactive=4,bulk=1".
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', '8'))
+UPSTREAM_INTERACTIVE_RESERVED = int(os.getenv('UPSTREAM_INTERACTIVE_RESERVED', '2'))
+UPSTREAM_LANE_WEIGHTS = {
+    lane.strip(): float(weight)
+    for lane, _, weight in (
+        item.partition('=') for item in os.getenv('UPSTREAM_LANE_WEIGHTS', 'interactive=4,bulk=1').split(',')
+    )
+    if lane.strip() and weight
+}
+
+# In-process request/pipeline metrics, exposed at /metrics in Prometheus format
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+
+# On-demand request profiling (cProfile + SQL). When enabled, requests are
+# profiled if a staff user or a client sending X-Profile-Token: PROFILING_TOKEN
+# asks with "X-Profile: 1" / "?_profile=1", or by PROFILING_SAMPLE_RATE (0-1).
+# Profiles are kept in a ring of PROFILING_MAX_PROFILES under /admin/profiles/.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_DIR = Path(os.getenv('PROFILING_DIR', BASE_DIR / 'var' / 'profiles'))
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '50'))
+
+# Store of pages fetched by Tavily (separate SQLite file), used to replay
+# extraction offline with `manage.py replay_extraction`. Least recently used
+# pages are evicted once compressed bodies exceed PAGE_STORE_MAX_MB.
+# PAGE_STORE_CODEC is 'zlib' or 'zstd' (needs the zstandard package).
+PAGE_STORE_ENABLED = os.getenv('PAGE_STORE_ENABLED', 'True').lower() == 'true'
+PAGE_STORE_PATH = Path(os.getenv('PAGE_STORE_PATH', BASE_DIR / 'var' / 'pages.sqlite3'))
+PAGE_STORE_MAX_MB = int(os.getenv('PAGE_STORE_MAX_MB', '512'))
+PAGE_STORE_CODEC = os.getenv('PAGE_STORE_CODEC', 'zlib')
+
+# Portfolio-page enrichment (`manage.py enrich_portfolios`): concurrent fetches,
+# at most ENRICH_PER_HOST_CONCURRENCY at a time and one every
+# ENRICH_HOST_DELAY_SECONDS per host. Pages fetched within ENRICH_CACHE_HOURS are
+# reused from the page store; older ones are revalidated with conditional GETs.
+# Hosts resolving to loopback, private, link-local or other non-public addresses
+# are refused unless ENRICH_ALLOW_PRIVATE_HOSTS is set (local testing only).
+ENRICH_CONCURRENCY = int(os.getenv('ENRICH_CONCURRENCY', '8'))
+ENRICH_PER_HOST_CONCURRENCY = int(os.getenv('ENRICH_PER_HOST_CONCURRENCY', '1'))
+ENRICH_HOST_DELAY_SECONDS = float(os.getenv('ENRICH_HOST_DELAY_SECONDS', '1.0'))
+ENRICH_TIMEOUT_SECONDS = float(os.getenv('ENRICH_TIMEOUT_SECONDS', '10'))
+ENRICH_MAX_PAGE_BYTES = int(os.getenv('ENRICH_MAX_PAGE_BYTES', str(2 * 1024 * 1024)))
+ENRICH_CACHE_HOURS = float(os.getenv('ENRICH_CACHE_HOURS', '168'))
+ENRICH_RESPECT_ROBOTS = os.getenv('ENRICH_RESPECT_ROBOTS', 'True').lower() == 'true'
+ENRICH_USER_AGENT = os.getenv('ENRICH_USER_AGENT', 'ProfessorFinderBot/1.0 (+portfolio enrichment)')
+ENRICH_ALLOW_PRIVATE_HOSTS = os.getenv('ENRICH_ALLOW_PRIVATE_HOSTS', 'False').lower() == 'true'
+
+# Process-local Country/City/University/Department cache. Changes bump the
+# version file; other processes re-check it every HIERARCHY_CHECK_SECONDS.
+HIERARCHY_VERSION_FILE = Path(os.getenv('HIERARCHY_VERSION_FILE', BASE_DIR / 'var' / 'hierarchy.version'))
+HIERARCHY_CHECK_SECONDS = float(os.getenv('HIERARCHY_CHECK_SECONDS', '1.0'))
+
+# Brotli (with the optional brotli package) or gzip compression of JSON
+# responses of at least RESPONSE_COMPRESSION_MIN_BYTES, chosen by Accept-Encoding
+RESPONSE_COMPRESSION_ENABLED = os.getenv('RESPONSE_COMPRESSION_ENABLED', 'True').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', '6'))
+RESPONSE_BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', '5'))
+
+# Cache shared by all worker processes: a SQLite file (search/sharedcache.py)
+# bounded by CACHE_MAX_MB and CACHE_MAX_ENTRIES, least recently used entries
+# evicted first. List API responses are kept in it for LIST_CACHE_SECONDS
+# (0 disables), or until a professor or location changes.
+CACHE_PATH = Path(os.getenv('CACHE_PATH', BASE_DIR / 'var' / 'cache.sqlite3'))
+CACHE_MAX_MB = int(os.getenv('CACHE_MAX_MB', '256'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '200000'))
+LIST_CACHE_SECONDS = int(os.getenv('LIST_CACHE_SECONDS', '300'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'search.sharedcache.SQLiteCache',
+        'LOCATION': str(CACHE_PATH),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': CACHE_MAX_ENTRIES,
+            'MAX_BYTES': CACHE_MAX_MB * 1024 * 1024,
+        },
+    }
+}
+
+# /api/changes/ feed: page size when the client doesn't send "limit", the
+# largest page allowed, and how long `manage.py prune_change_log` keeps entries
+CHANGE_FEED_PAGE_SIZE = int(os.getenv('CHANGE_FEED_PAGE_SIZE', '100'))
+CHANGE_FEED_MAX_PAGE_SIZE = int(os.getenv('CHANGE_FEED_MAX_PAGE_SIZE', '1000'))
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv('CHANGE_LOG_RETENTION_DAYS', '90'))
+
+# Worker warm-up (search/warmup.py) run by wsgi.py/asgi.py before the first
+# request: imports, priming queries and in-process indexes. Keep-alive
+# connections to the upstream APIs are opened in the background by each worker
+# process on its first request, so preloading and forking is safe.
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'True').lower() == 'true'
+WARMUP_UPSTREAM_CONNECTIONS = os.getenv('WARMUP_UPSTREAM_CONNECTIONS', 'True').lower() == 'true'
+WARMUP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('WARMUP_CONNECT_TIMEOUT_SECONDS', '3'))
+
+# Per-request SQL budget (search/sqlbudget.py): requests issuing more than
+# SQL_BUDGET_QUERIES queries or SQL_BUDGET_SECONDS of query time (views can
+# raise their own with @query_budget), or any query slower than
+# SQL_SLOW_QUERY_SECONDS, are written with their normalized SQL and the query
+# plans of the SQL_SLOW_LOG_EXPLAIN costliest statements to a size-rotated
+# slow-query log. SQL_BUDGET_STRICT turns violations into errors (for tests).
+SQL_BUDGET_ENABLED = os.getenv('SQL_BUDGET_ENABLED', 'True').lower() == 'true'
+SQL_BUDGET_STRICT = os.getenv('SQL_BUDGET_STRICT', 'False').lower() == 'true'
+SQL_BUDGET_QUERIES = int(os.getenv('SQL_BUDGET_QUERIES', '50'))
+SQL_BUDGET_SECONDS = float(os.getenv('SQL_BUDGET_SECONDS', '0.5'))
+SQL_SLOW_QUERY_SECONDS = float(os.getenv('SQL_SLOW_QUERY_SECONDS', '0.1'))
+SQL_SLOW_LOG_EXPLAIN = int(os.getenv('SQL_SLOW_LOG_EXPLAIN', '5'))
+SQL_SLOW_LOG_PATH = Path(os.getenv('SQL_SLOW_LOG_PATH', BASE_DIR / 'var' / 'slow_queries.log'))
+SQL_SLOW_LOG_MAX_MB = int(os.getenv('SQL_SLOW_LOG_MAX_MB', '10'))
+SQL_SLOW_LOG_BACKUPS = int(os.getenv('SQL_SLOW_LOG_BACKUPS', '5'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -17,7 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from search import views as search_views
+
 urlpatterns = [
+    # Staff-only profile browser; listed before admin/ so the admin catch-all doesn't swallow it
+    path('admin/profiles/', search_views.profiles_admin, name='profiles_admin'),
+    path('admin/profiles/<str:profile_id>.<str:kind>', search_views.profile_download, name='profile_download'),
     path('admin/', admin.site.urls),
     path('', include('search.urls')),
 ]
@@ -8,9 +8,17 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
-from django.core.wsgi import get_wsgi_application
+_started = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'professor_finder.settings')
 
 application = get_wsgi_application()
+
+# Do the first request's one-off work (imports, connections, caches) now
+from search.warmup import warm_up  # noqa: E402
+
+warm_up(import_seconds=time.perf_counter() - _started)
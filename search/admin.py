@@ -1,5 +1,86 @@
-from django.contrib import admin
-from .models import Country, City, University, Department, Professor
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+from .canonical import approve_review
+from .models import (
+    CanonicalNameReview, Country, City, University, Department, DepartmentAlias,
+    Professor, ProfessorChange, UniversityAlias,
+)
+
+# Filtered changelists count at most this many rows; past it the count is a lower bound
+COUNT_CAP = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs an unbounded COUNT(*).
+
+    Unfiltered changelists use the table estimate (planner statistics on
+    PostgreSQL, MAX(pk) elsewhere); filtered ones count up to COUNT_CAP rows.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            model = queryset.model
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [model._meta.db_table])
+                    row = cursor.fetchone()
+                if row and row[0] > 0:
+                    return int(row[0])
+            return model._default_manager.using(queryset.db).aggregate(top=Max('pk'))['top'] or 0
+        return queryset.order_by()[:COUNT_CAP + 1].count()
+
+
+class NameStartsWithFilter(admin.SimpleListFilter):
+    """
+    Sidebar text box filtering on a related object's name prefix, instead of
+    listing every related row as RelatedFieldListFilter does.
+    """
+    template = 'admin/search/input_filter.html'
+    field_path = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if value:
+            return queryset.filter(**{f'{self.field_path}__name__istartswith': value})
+        return queryset
+
+    def choices(self, changelist):
+        # Carries the other active filters into the text box's GET form
+        yield {
+            'value': self.value() or '',
+            'hidden_params': [
+                (key, value) for key, value in changelist.filter_params.items()
+                if key != self.parameter_name
+            ],
+        }
+
+
+def name_filter(title, field_path):
+    parameter = field_path.split('__')[-1]
+    return type(f'{parameter.title()}NameFilter', (NameStartsWithFilter,), {
+        'title': title, 'parameter_name': parameter, 'field_path': field_path,
+    })
+
+
+class FastChangeListMixin:
+    """Changelist settings for tables too large to count or list exhaustively"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 @admin.register(Country)
 class CountryAdmin(admin.ModelAdmin):
@@ -8,16 +89,20 @@ class CountryAdmin(admin.ModelAdmin):
     ordering = ['name']
 
 @admin.register(City)
-class CityAdmin(admin.ModelAdmin):
+class CityAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ['name', 'country']
-    list_filter = ['country']
+    list_filter = [name_filter('country', 'country')]
+    list_select_related = ['country']
+    autocomplete_fields = ['country']
     search_fields = ['name', 'country__name']
     ordering = ['country__name', 'name']
 
 @admin.register(University)
-class UniversityAdmin(admin.ModelAdmin):
+class UniversityAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ['name', 'city', 'get_country']
-    list_filter = ['city__country', 'city']
+    list_filter = [name_filter('country', 'city__country'), name_filter('city', 'city')]
+    list_select_related = ['city__country']
+    autocomplete_fields = ['city']
     search_fields = ['name', 'city__name', 'city__country__name']
     ordering = ['city__country__name', 'city__name', 'name']
     
@@ -27,9 +112,15 @@ class UniversityAdmin(admin.ModelAdmin):
     get_country.admin_order_field = 'city__country__name'
 
 @admin.register(Department)
-class DepartmentAdmin(admin.ModelAdmin):
+class DepartmentAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ['name', 'university', 'get_city', 'get_country']
-    list_filter = ['university__city__country', 'university__city', 'university']
+    list_filter = [
+        name_filter('country', 'university__city__country'),
+        name_filter('city', 'university__city'),
+        name_filter('university', 'university'),
+    ]
+    list_select_related = ['university__city__country']
+    autocomplete_fields = ['university']
     search_fields = ['name', 'university__name', 'university__city__name']
     ordering = ['university__city__country__name', 'university__name', 'name']
     
@@ -44,14 +135,77 @@ class DepartmentAdmin(admin.ModelAdmin):
     get_country.admin_order_field = 'university__city__country__name'
 
 @admin.register(Professor)
-class ProfessorAdmin(admin.ModelAdmin):
+class ProfessorAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ['name', 'department', 'get_university', 'email', 'created_at']
-    list_filter = ['department__university__city__country', 'department__university', 'created_at']
+    list_filter = [
+        name_filter('country', 'department__university__city__country'),
+        name_filter('university', 'department__university'),
+        'created_at',
+    ]
+    list_select_related = ['department__university__city__country']
+    autocomplete_fields = ['department']
     search_fields = ['name', 'email', 'skills', 'department__name', 'department__university__name']
     readonly_fields = ['created_at']
-    ordering = ['-created_at', 'name']
+    # Newest first by primary key: same order as created_at, but served by the pk index
+    ordering = ['-id']
     
     def get_university(self, obj):
         return obj.department.university.name
     get_university.short_description = 'University'
     get_university.admin_order_field = 'department__university__name'
+
+@admin.register(UniversityAlias)
+class UniversityAliasAdmin(admin.ModelAdmin):
+    list_display = ['alias', 'university']
+    list_select_related = ['university__city__country']
+    search_fields = ['alias', 'university__name']
+    autocomplete_fields = ['university']
+
+@admin.register(DepartmentAlias)
+class DepartmentAliasAdmin(admin.ModelAdmin):
+    list_display = ['alias', 'department', 'university']
+    list_select_related = ['department__university', 'university__city__country']
+    search_fields = ['alias', 'department__name', 'university__name']
+    autocomplete_fields = ['department', 'university']
+
+@admin.register(CanonicalNameReview)
+class CanonicalNameReviewAdmin(admin.ModelAdmin):
+    list_display = ['raw_name', 'kind', 'get_suggestion', 'score', 'status', 'created_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['raw_name']
+    readonly_fields = ['created_at']
+    list_select_related = ['suggested_university__city__country', 'suggested_department__university']
+    autocomplete_fields = ['university', 'suggested_university', 'department', 'suggested_department']
+    actions = ['approve', 'reject']
+    
+    def get_suggestion(self, obj):
+        return obj.suggested_university or obj.suggested_department
+    get_suggestion.short_description = 'Suggested match'
+    
+    @admin.action(description='Approve: merge into the suggested match and remember the alias')
+    def approve(self, request, queryset):
+        approved = 0
+        for review in queryset.filter(status='pending'):
+            approve_review(review)
+            approved += 1
+        self.message_user(request, f"Approved {approved} reviews", messages.SUCCESS)
+    
+    @admin.action(description='Reject: keep as a separate row')
+    def reject(self, request, queryset):
+        rejected = queryset.filter(status='pending').update(status='rejected')
+        self.message_user(request, f"Rejected {rejected} reviews", messages.SUCCESS)
+
+
+@admin.register(ProfessorChange)
+class ProfessorChangeAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ['id', 'professor_id', 'action', 'changed_at']
+    list_filter = ['action']
+    search_fields = ['=professor_id']
+    ordering = ['-id']
+    
+    # The log is append-only
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,317 @@
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .changes import record_changes
+from .hierarchy import hierarchy_cache
+from .models import CanonicalNameReview, Department, DepartmentAlias, University, UniversityAlias
+from .normalize import normalize_person_name, normalize_text
+from .suggest import suggest_index
+
+# Words ignored when building acronyms ("Massachusetts Institute of Technology" -> "mit")
+ACRONYM_STOPWORDS = {'of', 'the', 'and', 'at', 'for', 'in', 'de', 'la', 'du', 'und'}
+
+# Only the best candidates by shared trigrams get a full similarity score
+MAX_SCORED_CANDIDATES = 20
+
+# How a name matched: exactly or through an alias, as the acronym of one known
+# name, by trigram similarity with the same words in the same order (typos),
+# or by trigram similarity alone. The last is never merged without review:
+# "Washington University" and "University of Washington" are different schools.
+EXACT = 'exact'
+ACRONYM = 'acronym'
+FUZZY = 'fuzzy'
+SIMILAR = 'similar'
+
+# Two words count as the same word misspelled at this trigram similarity
+WORD_TYPO_SIMILARITY = 0.5
+
+
+def canonical_key(name: str) -> str:
+    """Normalized form used for exact/alias matching; joins spelled-out initials ('m i t' -> 'mit')"""
+    tokens = normalize_text(name).split()
+    joined, initials = [], ''
+    for token in tokens:
+        if len(token) == 1:
+            initials += token
+            continue
+        if initials:
+            joined.append(initials)
+            initials = ''
+        joined.append(token)
+    if initials:
+        joined.append(initials)
+    return ' '.join(joined)
+
+
+def acronym(key: str) -> str:
+    words = [word for word in key.split() if word not in ACRONYM_STOPWORDS]
+    return ''.join(word[0] for word in words) if len(words) > 1 else ''
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 1.0
+
+
+def words_aligned(a: str, b: str) -> bool:
+    """Whether two keys have the same words in the same order, allowing for typos"""
+    a_words = [word for word in a.split() if word not in ACRONYM_STOPWORDS]
+    b_words = [word for word in b.split() if word not in ACRONYM_STOPWORDS]
+    return len(a_words) == len(b_words) and all(
+        x == y or dice(trigrams(x), trigrams(y)) >= WORD_TYPO_SIMILARITY for x, y in zip(a_words, b_words)
+    )
+
+
+class NameIndex:
+    """In-memory exact/alias/acronym/trigram index over one set of names"""
+
+    def __init__(self):
+        self.exact: Dict[str, int] = {}
+        self.acronyms: Dict[str, Set[int]] = defaultdict(set)
+        self.grams: Dict[str, Set[int]] = defaultdict(set)
+        self.gram_sets: Dict[int, Set[str]] = {}
+        self.keys: Dict[int, str] = {}
+
+    def add(self, row_id: int, name: str):
+        key = canonical_key(name)
+        if not key:
+            return
+        self.exact.setdefault(key, row_id)
+        self.keys[row_id] = key
+        if acronym(key):
+            self.acronyms[acronym(key)].add(row_id)
+        grams = trigrams(key)
+        self.gram_sets[row_id] = grams
+        for gram in grams:
+            self.grams[gram].add(row_id)
+
+    def add_alias(self, alias: str, row_id: int):
+        key = canonical_key(alias)
+        if key:
+            self.exact[key] = row_id
+
+    def match(self, name: str) -> Tuple[Optional[int], float, Optional[str]]:
+        """Return ``(row_id, score, how)`` of the closest name, score in [0, 1]"""
+        key = canonical_key(name)
+        if not key:
+            return None, 0.0, None
+        if key in self.exact:
+            return self.exact[key], 1.0, EXACT
+        # "mit" typed as an acronym of exactly one known name
+        ids = self.acronyms.get(key.replace(' ', ''))
+        if ids and len(ids) == 1:
+            return next(iter(ids)), 0.9, ACRONYM
+
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.grams.get(gram, ()))
+        best_id, best_score = None, 0.0
+        for row_id, _ in shared.most_common(MAX_SCORED_CANDIDATES):
+            score = dice(grams, self.gram_sets[row_id])
+            if score > best_score:
+                best_id, best_score = row_id, score
+        if best_id is None:
+            return None, 0.0, None
+        return best_id, best_score, FUZZY if words_aligned(key, self.keys[best_id]) else SIMILAR
+
+
+class CanonicalIndex:
+    """
+    Lazily built name indexes for universities (one index per city) and
+    departments (one index per university), kept current by signals in
+    ``search.signals``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._universities: Optional[Dict[int, NameIndex]] = None
+        self._departments: Optional[Dict[int, NameIndex]] = None
+
+    def _build(self):
+        universities: Dict[int, NameIndex] = defaultdict(NameIndex)
+        for row_id, name, city_id in University.objects.values_list('id', 'name', 'city_id'):
+            universities[city_id].add(row_id, name)
+        for alias, row_id, city_id in UniversityAlias.objects.values_list(
+                'alias', 'university_id', 'university__city_id'):
+            universities[city_id].add_alias(alias, row_id)
+
+        departments: Dict[int, NameIndex] = defaultdict(NameIndex)
+        for row_id, name, university_id in Department.objects.values_list('id', 'name', 'university_id'):
+            departments[university_id].add(row_id, name)
+        for alias, row_id, university_id in DepartmentAlias.objects.values_list(
+                'alias', 'department_id', 'university_id'):
+            departments[university_id].add_alias(alias, row_id)
+
+        self._universities, self._departments = universities, departments
+
+    def _ensure_built(self):
+        with self._lock:
+            if self._universities is None:
+                self._build()
+
+    def warm(self):
+        self._ensure_built()
+
+    def match_university(self, name: str, city_id: int) -> Tuple[Optional[int], float, Optional[str]]:
+        self._ensure_built()
+        return self._universities[city_id].match(name)
+
+    def match_department(self, name: str, university_id: int) -> Tuple[Optional[int], float, Optional[str]]:
+        self._ensure_built()
+        return self._departments[university_id].match(name)
+
+    def add_university(self, row_id: int, name: str, city_id: int):
+        with self._lock:
+            if self._universities is not None:
+                self._universities[city_id].add(row_id, name)
+
+    def add_department(self, row_id: int, name: str, university_id: int):
+        with self._lock:
+            if self._departments is not None:
+                self._departments[university_id].add(row_id, name)
+
+    def invalidate(self):
+        with self._lock:
+            self._universities = self._departments = None
+
+
+canonical_index = CanonicalIndex()
+
+
+def _merges(score: float, how: Optional[str]) -> bool:
+    """Whether a match is close enough to reuse the existing row without review"""
+    return how != SIMILAR and score >= settings.CANONICAL_MATCH_THRESHOLD
+
+
+def resolve_university(name: str, city) -> University:
+    """
+    Map an incoming university name to its canonical row in ``city``.
+
+    Close matches (aliases, acronyms, misspellings above
+    CANONICAL_MATCH_THRESHOLD) reuse the existing university. Weaker but
+    plausible matches, and names that only match with their words reordered,
+    create a new row and queue it for review in the admin.
+    """
+    name = name.strip()
+    match_id, score, how = canonical_index.match_university(name, city.id)
+    if match_id and _merges(score, how):
+        university = hierarchy_cache.instance('university', match_id) or \
+            University.objects.filter(id=match_id).first()
+        if university:
+            return university
+
+    university, created = University.objects.get_or_create(name=name, city=city)
+    if created and match_id and score >= settings.CANONICAL_REVIEW_THRESHOLD:
+        CanonicalNameReview.objects.create(
+            kind='university', raw_name=name, score=score,
+            university=university, suggested_university_id=match_id
+        )
+    return university
+
+
+def resolve_department(name: str, university: University) -> Department:
+    """Map an incoming department name to its canonical row within ``university``"""
+    name = name.strip()
+    match_id, score, how = canonical_index.match_department(name, university.id)
+    if match_id and _merges(score, how):
+        department = hierarchy_cache.instance('department', match_id) or \
+            Department.objects.filter(id=match_id).first()
+        if department:
+            return department
+
+    department, created = Department.objects.get_or_create(name=name, university=university)
+    if created and match_id and score >= settings.CANONICAL_REVIEW_THRESHOLD:
+        CanonicalNameReview.objects.create(
+            kind='department', raw_name=name, score=score,
+            department=department, suggested_department_id=match_id
+        )
+    return department
+
+
+def merge_department(duplicate: Department, target: Department):
+    """
+    Fold ``duplicate`` into ``target``: professors already in ``target`` absorb
+    their namesakes (dedup.merge_groups), the rest move over, aliases follow,
+    and ``duplicate`` is deleted.
+    """
+    from .dedup import merge_groups
+    from .models import Professor
+
+    existing = {normalize_person_name(name): professor_id
+                for professor_id, name in target.professors.values_list('id', 'name')}
+    groups = defaultdict(list)
+    for professor_id, name in duplicate.professors.values_list('id', 'name'):
+        match = existing.get(normalize_person_name(name))
+        if match:
+            groups[match].append(professor_id)
+    merge_groups([[match, *professor_ids] for match, professor_ids in groups.items()])
+
+    # Whichever of a merged pair survived, nothing left here collides by name any more
+    moving = list(duplicate.professors.values_list('id', flat=True))
+    Professor.objects.filter(id__in=moving).update(department=target)
+    record_changes(moving)
+    # update() sends no signals, so the typeahead counts for both departments are off
+    transaction.on_commit(suggest_index.invalidate)
+    DepartmentAlias.objects.filter(department=duplicate).update(department=target, university=target.university)
+    duplicate.delete()
+
+
+def approve_review(review: CanonicalNameReview):
+    """
+    Record the raw name as an alias of the suggested row and fold the row that was
+    created for it into the suggestion.
+    """
+    with transaction.atomic():
+        if review.kind == 'university' and review.university and review.suggested_university:
+            _approve_university(review)
+        elif review.kind == 'department' and review.department and review.suggested_department:
+            _approve_department(review)
+    canonical_index.invalidate()
+
+
+def _approve_university(review: CanonicalNameReview):
+    duplicate, target = review.university, review.suggested_university
+    UniversityAlias.objects.update_or_create(alias=canonical_key(review.raw_name), defaults={'university': target})
+    UniversityAlias.objects.filter(university=duplicate).update(university=target)
+
+    # Departments the target already has are merged into it, the others move over
+    existing = NameIndex()
+    for department_id, name in target.departments.values_list('id', 'name'):
+        existing.add(department_id, name)
+    for department in list(duplicate.departments.all()):
+        match_id, score, how = existing.match(department.name)
+        if match_id and _merges(score, how):
+            merge_department(department, Department.objects.get(id=match_id))
+        else:
+            # save() (not update) so the hierarchy cache and change log see the move
+            department.university = target
+            department.save()
+            DepartmentAlias.objects.filter(department=department).update(university=target)
+
+    review.status = 'approved'
+    review.university = None
+    review.save()
+    duplicate.delete()
+    # Moved departments take their professors to other university/city names
+    transaction.on_commit(suggest_index.invalidate)
+
+
+def _approve_department(review: CanonicalNameReview):
+    duplicate, target = review.department, review.suggested_department
+    DepartmentAlias.objects.update_or_create(
+        alias=canonical_key(review.raw_name), university=target.university,
+        defaults={'department': target}
+    )
+    review.status = 'approved'
+    review.department = None
+    review.save()
+    merge_department(duplicate, target)
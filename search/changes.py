@@ -0,0 +1,91 @@
+"""
+Professor change feed for downstream mirrors.
+
+Every professor write appends a ProfessorChange row (signals.py for ORM saves
+and deletes, ``record_changes`` for bulk updates that send no signals). The
+feed reads the log in id order after an opaque cursor. SQLite serializes
+writers, so ids are assigned in commit order and a reader can never skip a
+change that commits after it read a later one.
+
+Within a page, several changes to one professor collapse into one entry with
+its current state. Clients apply entries as upserts/deletes and store
+``next_cursor``; re-applying a page is harmless.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core import signing
+
+from .models import ProfessorChange
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+CURSOR_SALT = 'search.changes'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    """The cursor points before the oldest retained log entry; the client has to resync"""
+
+
+def record_changes(professor_ids: Iterable[int], action: str = UPDATED):
+    """Log changes written without post_save/post_delete (bulk_update, queryset.update)"""
+    ProfessorChange.objects.bulk_create(
+        [ProfessorChange(professor_id=professor_id, action=action) for professor_id in professor_ids],
+        batch_size=1000,
+    )
+
+
+def encode_cursor(position: int) -> str:
+    return signing.dumps(position, salt=CURSOR_SALT, compress=False)
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Log position a cursor stands for; no cursor means the beginning of the log"""
+    if not cursor:
+        return 0
+    try:
+        position = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(position, int) or position < 0:
+        raise InvalidCursor('Invalid cursor')
+    return position
+
+
+def latest_position() -> int:
+    last = ProfessorChange.objects.order_by('-id').values_list('id', flat=True).first()
+    return last or 0
+
+
+def changes_since(position: int, limit: int) -> Tuple[List[Dict], int, bool]:
+    """
+    Collapsed changes after ``position``: (entries, new position, has_more).
+    Entries are {'professor_id', 'action'} in the order of each professor's
+    last change in the page.
+    """
+    oldest = ProfessorChange.objects.order_by('id').values_list('id', flat=True).first()
+    if oldest is not None and position < oldest - 1:
+        raise CursorExpired(f'Changes before #{oldest} have been pruned')
+
+    rows = list(
+        ProfessorChange.objects.filter(id__gt=position).order_by('id')
+        .values_list('id', 'professor_id', 'action')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], position, False
+
+    collapsed: Dict[int, Dict] = {}
+    for change_id, professor_id, action in rows:
+        previous = collapsed.pop(professor_id, None)
+        # Created and then updated within the page is still new to the client
+        if previous and previous['action'] == CREATED and action == UPDATED:
+            action = CREATED
+        collapsed[professor_id] = {'professor_id': professor_id, 'action': action}
+    return list(collapsed.values()), rows[-1][0], has_more
@@ -0,0 +1,218 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+from .listcache import batched_bumps
+from .models import Professor
+from .normalize import jaccard, normalize_person_name, normalize_text
+from .signals import bulk_update_professors
+
+# Local-part words of shared role mailboxes ("cs-office@", "info@", "dept.chair@").
+# Several people can be listed with one of these, so they say nothing about identity.
+ROLE_EMAIL_WORDS = {'info', 'office', 'admin', 'administration', 'contact', 'dept', 'department',
+                    'secretary', 'secretariat', 'enquiries', 'inquiries', 'admissions', 'hr',
+                    'webmaster', 'faculty', 'staff', 'help', 'helpdesk', 'support', 'mail',
+                    'noreply', 'reception', 'chair', 'head', 'grad', 'undergrad', 'team',
+                    'general', 'school', 'lab', 'group', 'hello'}
+
+# Blocks larger than this are too generic to compare pairwise (e.g. a very common surname
+# at a huge university); they are skipped rather than letting the work go quadratic
+MAX_BLOCK_SIZE = 200
+
+# Fields loaded per professor for matching
+CANDIDATE_FIELDS = ('id', 'name', 'email', 'department_id', 'department__name',
+                    'department__university_id')
+
+
+def _email_domain(email: Optional[str]) -> str:
+    return email.rsplit('@', 1)[-1].lower() if email and '@' in email else ''
+
+
+def is_role_address(email: str) -> bool:
+    """True for shared mailboxes like 'cs-office@uni.edu' that aren't one person's"""
+    local = email.split('@', 1)[0]
+    return bool(ROLE_EMAIL_WORDS.intersection(re.split(r'[-._+]+', local)))
+
+
+class Candidate:
+    """The parts of a professor that matter for entity resolution"""
+
+    __slots__ = ('id', 'tokens', 'email', 'department_id', 'department_tokens', 'university_id')
+
+    def __init__(self, id, name, email, department_id, department_name, university_id):
+        self.id = id
+        self.tokens = normalize_person_name(name).split()
+        email = (email or '').strip().lower()
+        # A role address is treated as no address at all
+        self.email = '' if is_role_address(email) else email
+        self.department_id = department_id
+        self.department_tokens = set(normalize_text(department_name).split())
+        self.university_id = university_id
+
+    @property
+    def surname(self) -> str:
+        return self.tokens[-1] if self.tokens else ''
+
+    def blocking_keys(self) -> List[tuple]:
+        """Only candidates sharing at least one of these keys are ever compared"""
+        keys = []
+        if self.email:
+            keys.append(('email', self.email))
+        if self.surname:
+            keys.append(('surname', self.surname, self.university_id))
+            domain = _email_domain(self.email)
+            if domain:
+                keys.append(('domain', domain, self.surname))
+        return keys
+
+
+def score_pair(a: Candidate, b: Candidate) -> float:
+    """Likelihood in [0, 1] that two candidates are the same person"""
+    if not a.surname or a.surname != b.surname:
+        return 0.0
+
+    first_a, first_b = a.tokens[0], b.tokens[0]
+    if len(a.tokens) == 1 or len(b.tokens) == 1:
+        given = 0.6
+    elif first_a == first_b:
+        given = 1.0
+    elif first_a[0] == first_b[0] and (len(first_a) == 1 or len(first_b) == 1):
+        # An initial alone isn't enough to merge: it could chain "Jane" and "John" together
+        given = 0.7
+    else:
+        given = 0.2
+
+    if a.email and a.email == b.email:
+        # A shared personal address settles it, as long as the names agree
+        return 1.0 if given >= 0.6 else 0.7 * given
+
+    if a.department_id == b.department_id:
+        context = 1.0
+    elif a.university_id == b.university_id:
+        # Namesakes in unrelated departments of a big university are common
+        context = jaccard(a.department_tokens, b.department_tokens)
+    elif _email_domain(a.email) and _email_domain(a.email) == _email_domain(b.email):
+        context = 0.5
+    else:
+        context = 0.0
+
+    score = 0.7 * given + 0.3 * context
+    if a.email and b.email:
+        # Different addresses at the same place usually mean different people
+        score -= 0.2
+    return max(0.0, score)
+
+
+def find_duplicate_groups(candidates: Iterable[Candidate], threshold: float) -> List[List[int]]:
+    """
+    Group candidates that resolve to the same person.
+
+    Pairs are only scored within blocks that share a blocking key, and matches are
+    joined transitively with union-find. Returns groups of professor ids (size >= 2).
+    """
+    blocks: Dict[tuple, List[Candidate]] = defaultdict(list)
+    for candidate in candidates:
+        for key in candidate.blocking_keys():
+            blocks[key].append(candidate)
+
+    parent: Dict[int, int] = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    seen_pairs = set()
+    for block in blocks.values():
+        if len(block) < 2 or len(block) > MAX_BLOCK_SIZE:
+            continue
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                pair = (min(a.id, b.id), max(a.id, b.id))
+                if pair in seen_pairs:
+                    continue
+                seen_pairs.add(pair)
+                if score_pair(a, b) >= threshold:
+                    root_a, root_b = find(a.id), find(b.id)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for professor_id in parent:
+        groups[find(professor_id)].append(professor_id)
+    for root, members in groups.items():
+        if root not in members:
+            members.append(root)
+    return [sorted(members) for members in groups.values() if len(members) > 1]
+
+
+def merge_skills(*skill_strings: str) -> str:
+    merged = {}
+    for skills in skill_strings:
+        for skill in (skills or '').split(','):
+            skill = skill.strip()
+            if skill and skill.lower() not in merged:
+                merged[skill.lower()] = skill
+    return ', '.join(merged.values())
+
+
+def merge_groups(groups: List[List[int]]) -> int:
+    """
+    Merge each group into its oldest professor: missing email/portfolio are filled
+    from the duplicates, skills are unioned, and the duplicates are deleted in bulk.
+    Returns the number of rows deleted.
+    """
+    if not groups:
+        return 0
+
+    all_ids = [professor_id for group in groups for professor_id in group]
+    professors = Professor.objects.in_bulk(all_ids)
+    survivors, doomed = [], []
+    for group in groups:
+        members = sorted((professors[i] for i in group if i in professors),
+                         key=lambda p: (p.created_at, p.id))
+        if len(members) < 2:
+            continue
+        survivor, duplicates = members[0], members[1:]
+        for duplicate in duplicates:
+            survivor.email = survivor.email or duplicate.email
+            survivor.portfolio_link = survivor.portfolio_link or duplicate.portfolio_link
+        survivor.skills = merge_skills(survivor.skills, *(d.skills for d in duplicates))
+        survivors.append(survivor)
+        doomed.extend(d.id for d in duplicates)
+
+    # Each deleted row sends post_delete; bump the list cache once for the batch
+    with transaction.atomic(), batched_bumps():
+        bulk_update_professors(survivors, ['email', 'portfolio_link', 'skills'])
+        deleted, _ = Professor.objects.filter(id__in=doomed).delete()
+    return deleted
+
+
+def find_matching_professor(name: str, email: str, department, threshold: float) -> Optional[Professor]:
+    """
+    Return an existing professor that resolves to the same person as the incoming
+    one, looking only at the blocks the incoming record falls into.
+    """
+    incoming = Candidate(None, name, email, department.id, department.name, department.university_id)
+    if not incoming.surname and not incoming.email:
+        return None
+
+    rows = []
+    if incoming.surname:
+        rows += Professor.objects.filter(
+            surname_key=incoming.surname, department__university_id=department.university_id
+        ).values_list(*CANDIDATE_FIELDS)[:MAX_BLOCK_SIZE]
+    if incoming.email:
+        rows += Professor.objects.filter(
+            email__iexact=incoming.email
+        ).values_list(*CANDIDATE_FIELDS)[:MAX_BLOCK_SIZE]
+
+    best_id, best_score = None, threshold
+    for row in rows:
+        score = score_pair(incoming, Candidate(*row))
+        if score >= best_score:
+            best_id, best_score = row[0], score
+    return Professor.objects.filter(id=best_id).first() if best_id else None
@@ -0,0 +1,70 @@
+"""
+Response encoding helpers: a fast JSON response and Content-Encoding negotiation.
+
+``json_response`` serializes with orjson when it is installed (falling back to
+Django's JsonResponse encoder). ``negotiate`` and ``compress`` pick and apply
+brotli or gzip from the client's Accept-Encoding header; brotli is only offered
+when the optional ``brotli`` package is installed.
+"""
+import gzip
+from typing import Optional
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    """JsonResponse equivalent for plain dicts/lists/str/int/None data"""
+    if orjson is None:
+        return JsonResponse(data, status=status)
+    return HttpResponse(orjson.dumps(data), content_type='application/json', status=status)
+
+
+def supported_encodings():
+    """Encodings this process can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    The best encoding the client accepts, or None for identity. Quality values
+    are honoured ("gzip;q=0" refuses gzip); ties go to the server's preference.
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    # mtime=0 keeps the output (and any ETag derived from it) stable
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
@@ -0,0 +1,447 @@
+"""
+Portfolio-page enrichment.
+
+Fetches professors' portfolio pages concurrently and pulls out what Tavily
+snippets usually miss: an email address and research keywords. Fetching is
+polite (per-host concurrency limit and minimum delay, robots.txt), conditional
+(ETag/If-Modified-Since against the page store) and bounded in size; parsing is
+a cheap stdlib HTML pass, no LLM involved.
+
+Portfolio links come from search results, so every request (redirects and
+robots.txt included) is refused unless its host resolves only to public
+addresses; enrichment can't be pointed at localhost or the internal network.
+"""
+import ipaddress
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib import robotparser
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+from .dedup import merge_skills, normalize_person_name
+from .lazy import lazy_module
+from .metrics import metrics
+from .models import Professor
+from .pagestore import page_store
+from .signals import bulk_update_professors
+
+requests = lazy_module('requests')
+
+# Fields enrichment may change
+ENRICHED_FIELDS = ['email', 'skills', 'updated_at']
+
+EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}')
+# "jane [at] mit [dot] edu", "jane (at) mit.edu", "jane AT mit DOT edu"
+AT_TOKEN = r'\s*(?:[\[(\{<]\s*(?:(?i:at)|@)\s*[\])\}>]|\sAT\s)\s*'
+DOT_TOKEN = r'\s*(?:[\[(\{<]\s*(?:(?i:dot)|\.)\s*[\])\}>]|\sDOT\s|\.)\s*'
+OBFUSCATED_EMAIL_RE = re.compile(
+    rf'([A-Za-z0-9._%+-]+){AT_TOKEN}([A-Za-z0-9-]+(?:{DOT_TOKEN}[A-Za-z0-9-]+)+)'
+)
+DOT_RE = re.compile(DOT_TOKEN)
+# Addresses that are never a person's
+EMAIL_IGNORE_PREFIXES = ('webmaster@', 'info@', 'admin@', 'noreply@', 'no-reply@', 'support@', 'example@')
+# Second-level labels countries register names under ("ac.uk", "edu.au"); a domain
+# like that is shared by every institution in the country, not one site
+PUBLIC_SECOND_LEVEL = {'ac', 'co', 'com', 'edu', 'gov', 'net', 'org'}
+
+# Headings that introduce research keywords
+INTEREST_HEADING_RE = re.compile(
+    r'\b(research interests?|research areas?|areas of (?:interest|expertise)|interests|expertise|research)\b',
+    re.IGNORECASE
+)
+KEYWORD_SPLIT_RE = re.compile(r'[,;•·|\n]|\band\b')
+# Text taken after a heading when looking for keywords
+INTEREST_WINDOW_CHARS = 600
+MAX_KEYWORDS = 10
+MAX_KEYWORD_WORDS = 5
+
+TEXT_CONTENT_TYPES = ('text/html', 'text/plain', 'application/xhtml+xml')
+# Redirects followed per fetch; each hop is checked like the original URL
+MAX_REDIRECTS = 5
+
+
+class _PageParser(HTMLParser):
+    """Collects visible text blocks, mailto links, headings and meta keywords"""
+
+    BLOCK_TAGS = {'p', 'div', 'li', 'br', 'tr', 'section', 'article', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dt', 'dd'}
+    HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b', 'dt'}
+    SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self.mailto: List[str] = []
+        self.headings: List[Tuple[str, int]] = []   # (heading text, offset of the text after it)
+        self.meta_keywords = ''
+        self.length = 0
+        self._skip = 0
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        elif tag == 'a' and (attrs.get('href') or '').lower().startswith('mailto:'):
+            self.mailto.append(attrs['href'][7:].split('?')[0].strip())
+        elif tag == 'meta' and (attrs.get('name') or '').lower() == 'keywords':
+            self.meta_keywords = attrs.get('content') or ''
+        if tag in self.BLOCK_TAGS:
+            self._append('\n')
+        if tag in self.HEADING_TAGS:
+            self._heading = []
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip:
+            self._skip -= 1
+        if tag in self.HEADING_TAGS and self._heading is not None:
+            self.headings.append((' '.join(self._heading), self.length))
+            self._heading = None
+        if tag in self.BLOCK_TAGS:
+            self._append('\n')
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        self._append(data)
+        if self._heading is not None:
+            self._heading.append(data.strip())
+
+    def _append(self, text: str):
+        self.chunks.append(text)
+        self.length += len(text)
+
+    def text(self) -> str:
+        return ''.join(self.chunks)
+
+
+def _clean_email(email: str) -> str:
+    return email.strip().strip('.').lower()
+
+
+def find_emails(text: str, mailto: Iterable[str] = ()) -> List[str]:
+    """Plain, mailto and lightly obfuscated addresses, in page order, without duplicates"""
+    found = [_clean_email(e) for e in mailto if EMAIL_RE.fullmatch(e.strip())]
+    found += [_clean_email(e) for e in EMAIL_RE.findall(text)]
+    for user, domain in OBFUSCATED_EMAIL_RE.findall(text):
+        candidate = f"{user}@{DOT_RE.sub('.', domain)}"
+        if EMAIL_RE.fullmatch(candidate):
+            found.append(_clean_email(candidate))
+    return [e for e in dict.fromkeys(found) if not e.startswith(EMAIL_IGNORE_PREFIXES)]
+
+
+def _is_public_suffix(domain: str) -> bool:
+    labels = domain.split('.')
+    return len(labels) < 2 or (len(labels) == 2 and len(labels[1]) == 2 and labels[0] in PUBLIC_SECOND_LEVEL)
+
+
+def pick_email(emails: List[str], professor_name: str, page_url: str) -> str:
+    """
+    The address most likely to be the professor's: one containing their surname
+    or given name, then one whose domain is the page's host or a parent domain
+    of it (``ox.ac.uk`` for a page on ``cs.ox.ac.uk``). Anything else belongs to
+    someone else (a department office, a collaborator), so it is ''.
+    """
+    words = normalize_person_name(professor_name).split()
+    for word in reversed(words):
+        if len(word) > 1:
+            for email in emails:
+                if word in email.split('@')[0]:
+                    return email
+    host = (urlsplit(page_url).hostname or '').lower()
+    for email in emails:
+        domain = email.rsplit('@', 1)[-1].lower()
+        if _is_public_suffix(domain):
+            continue
+        if host == domain or host.endswith('.' + domain):
+            return email
+    return ''
+
+
+def _keyword_phrases(text: str) -> List[str]:
+    phrases = []
+    for part in KEYWORD_SPLIT_RE.split(text):
+        phrase = ' '.join(part.strip(' .:-–—()[]"\'\t').split())
+        words = phrase.split()
+        if 0 < len(words) <= MAX_KEYWORD_WORDS and len(phrase) > 2 and not EMAIL_RE.search(phrase):
+            phrases.append(phrase)
+    return phrases
+
+
+def find_keywords(parser: _PageParser) -> List[str]:
+    """Research keywords from meta keywords and text after "Research interests"-style headings"""
+    keywords = _keyword_phrases(parser.meta_keywords)
+    text = parser.text()
+    for heading, offset in parser.headings:
+        if INTEREST_HEADING_RE.search(heading) and len(heading) < 60:
+            keywords += _keyword_phrases(text[offset:offset + INTEREST_WINDOW_CHARS])
+    if not keywords:
+        # No heading markup: look for an inline "Research interests: ..." line
+        for line in text.splitlines():
+            label, sep, rest = line.partition(':')
+            if sep and INTEREST_HEADING_RE.search(label) and len(label) < 40:
+                keywords += _keyword_phrases(rest)
+    unique = {}
+    for keyword in keywords:
+        unique.setdefault(keyword.lower(), keyword)
+    return list(unique.values())[:MAX_KEYWORDS]
+
+
+def extract_details(html: str, page_url: str, professor_name: str) -> Dict[str, str]:
+    """``{'email', 'skills'}`` found on a portfolio page (empty strings if nothing)"""
+    parser = _PageParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:  # malformed markup: use whatever was parsed
+        print(f"HTML parse error on {page_url}: {e}")
+    emails = find_emails(parser.text(), parser.mailto)
+    return {
+        'email': pick_email(emails, professor_name, page_url),
+        'skills': ', '.join(find_keywords(parser)),
+    }
+
+
+def is_public_host(host: str) -> bool:
+    """True if ``host`` resolves, and only to globally routable unicast addresses"""
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return False
+    for _, _, _, _, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            return False
+    return bool(infos)
+
+
+class BlockedURL(Exception):
+    """A URL (or redirect target) that enrichment must not request"""
+
+
+class HostLimiter:
+    """Per-host concurrency cap plus a minimum delay between requests to the same host"""
+
+    def __init__(self, per_host: int, delay: float):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.Semaphore] = {}
+        self._next_at: Dict[str, float] = {}
+
+    def acquire(self, host: str):
+        with self._lock:
+            slot = self._slots.setdefault(host, threading.Semaphore(self.per_host))
+        slot.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at.get(host, 0.0))
+            self._next_at[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host: str):
+        self._slots[host].release()
+
+
+class PortfolioFetcher:
+    """Polite, conditional, size-bounded page fetching backed by the page store"""
+
+    def __init__(self, per_host: int = None, delay: float = None, timeout: float = None,
+                 max_bytes: int = None, cache_hours: float = None, respect_robots: bool = None,
+                 allow_private: bool = None):
+        self.limiter = HostLimiter(
+            per_host or settings.ENRICH_PER_HOST_CONCURRENCY,
+            settings.ENRICH_HOST_DELAY_SECONDS if delay is None else delay,
+        )
+        self.timeout = timeout or settings.ENRICH_TIMEOUT_SECONDS
+        self.max_bytes = max_bytes or settings.ENRICH_MAX_PAGE_BYTES
+        self.cache_seconds = 3600 * (settings.ENRICH_CACHE_HOURS if cache_hours is None else cache_hours)
+        self.respect_robots = settings.ENRICH_RESPECT_ROBOTS if respect_robots is None else respect_robots
+        self.allow_private = settings.ENRICH_ALLOW_PRIVATE_HOSTS if allow_private is None else allow_private
+        self._local = threading.local()
+        self._robots: Dict[str, Optional[robotparser.RobotFileParser]] = {}
+        self._robots_locks: Dict[str, threading.Lock] = {}
+        self._robots_lock = threading.Lock()
+
+    def _session(self) -> 'requests.Session':
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers['User-Agent'] = settings.ENRICH_USER_AGENT
+        return session
+
+    def _check(self, url: str):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise BlockedURL(url)
+        if not self.allow_private and not is_public_host(parts.hostname):
+            raise BlockedURL(url)
+
+    def _get(self, url: str, **kwargs) -> 'requests.Response':
+        """GET that checks the URL and every redirect target before requesting it"""
+        for _ in range(MAX_REDIRECTS + 1):
+            self._check(url)
+            response = self._session().get(url, timeout=self.timeout, allow_redirects=False, **kwargs)
+            if not response.is_redirect:
+                return response
+            response.close()
+            url = urljoin(url, response.headers['Location'])
+        raise requests.exceptions.TooManyRedirects(f'More than {MAX_REDIRECTS} redirects')
+
+    def _allowed(self, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        parts = urlsplit(url)
+        origin = f'{parts.scheme}://{parts.netloc}'
+        with self._robots_lock:
+            origin_lock = self._robots_locks.setdefault(origin, threading.Lock())
+        # One robots.txt fetch per origin, however many workers arrive at once
+        with origin_lock:
+            if origin not in self._robots:
+                rules = None
+                try:
+                    response = self._get(origin + '/robots.txt')
+                    if response.status_code == 200:
+                        rules = robotparser.RobotFileParser()
+                        rules.parse(response.text.splitlines())
+                except (requests.exceptions.RequestException, BlockedURL):
+                    pass
+                self._robots[origin] = rules
+            rules = self._robots[origin]
+        return rules is None or rules.can_fetch(settings.ENRICH_USER_AGENT, url)
+
+    def _read(self, response) -> Optional[str]:
+        content_type = response.headers.get('Content-Type', 'text/html').split(';')[0].strip().lower()
+        if content_type not in TEXT_CONTENT_TYPES:
+            return None
+        body = bytearray()
+        for chunk in response.iter_content(65536):
+            body += chunk
+            if len(body) >= self.max_bytes:
+                del body[self.max_bytes:]
+                break
+        return body.decode(response.encoding or 'utf-8', errors='replace')
+
+    def fetch(self, url: str) -> Tuple[Optional[str], str]:
+        """Return ``(html or None, outcome)``; outcome is cached/not_modified/fetched/... for metrics"""
+        cached = page_store.get(url)
+        if cached and time.time() - cached['fetched_at'] < self.cache_seconds:
+            return cached['raw_content'], 'cached'
+        try:
+            self._check(url)
+        except BlockedURL:
+            return None, 'blocked'
+        if not self._allowed(url):
+            return None, 'robots'
+
+        headers = {}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        host = urlsplit(url).hostname or ''
+        self.limiter.acquire(host)
+        try:
+            response = self._get(url, headers=headers, stream=True)
+            with response:
+                if response.status_code == 304 and cached:
+                    page_store.touch(url)
+                    return cached['raw_content'], 'not_modified'
+                if response.status_code != 200:
+                    return None, f'http_{response.status_code}'
+                html = self._read(response)
+        except BlockedURL:
+            return None, 'blocked'
+        except requests.exceptions.RequestException as e:
+            print(f"Portfolio fetch failed for {url}: {e}")
+            return None, 'error'
+        finally:
+            self.limiter.release(host)
+
+        if html is None:
+            return None, 'not_text'
+        page_store.put(url, html, etag=response.headers.get('ETag', ''),
+                       last_modified=response.headers.get('Last-Modified', ''))
+        return html, 'fetched'
+
+
+def needs_enrichment(professor: Professor, min_skills: int) -> bool:
+    return bool(professor.portfolio_link) and (
+        not professor.email or len(professor.get_skills_list()) < min_skills
+    )
+
+
+def enrichment_candidates(min_skills: int, limit: int):
+    """Professors with a portfolio link but no email or fewer than ``min_skills`` skills, stalest first"""
+    candidates = []
+    queryset = (
+        Professor.objects.exclude(portfolio_link__isnull=True).exclude(portfolio_link='')
+        .only('id', 'name', 'email', 'skills', 'portfolio_link', 'department_id', 'updated_at')
+        .order_by('updated_at', 'id')
+    )
+    for professor in queryset.iterator(chunk_size=2000):
+        if needs_enrichment(professor, min_skills):
+            candidates.append(professor)
+            if len(candidates) == limit:
+                break
+    return candidates
+
+
+def enrich_professors(professors: List[Professor], concurrency: int = None,
+                      fetcher: PortfolioFetcher = None, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Fetch each professor's portfolio page and fill in a missing email and extra
+    skills. Pages are fetched concurrently; updates are written with bulk_update
+    every ``batch_size`` professors. Returns outcome counts.
+    """
+    fetcher = fetcher or PortfolioFetcher()
+    stats = {'professors': len(professors), 'updated': 0, 'emails': 0, 'skills': 0}
+
+    def visit(professor):
+        html, outcome = fetcher.fetch(professor.portfolio_link)
+        details = extract_details(html, professor.portfolio_link, professor.name) if html else None
+        return professor, outcome, details
+
+    pending = []
+
+    def flush():
+        if pending:
+            bulk_update_professors(pending, ENRICHED_FIELDS)
+            stats['updated'] += len(pending)
+            pending.clear()
+
+    workers = max(1, concurrency or settings.ENRICH_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='enrich') as executor:
+        for professor, outcome, details in executor.map(visit, professors):
+            stats[outcome] = stats.get(outcome, 0) + 1
+            metrics.inc('enrich_fetches_total', 'Portfolio page fetches by outcome', outcome=outcome)
+            if not details:
+                continue
+            changed = False
+            if details['email'] and not professor.email:
+                professor.email = details['email']
+                stats['emails'] += 1
+                changed = True
+            if details['skills']:
+                merged = merge_skills(professor.skills, details['skills'])
+                if merged != professor.skills:
+                    professor.skills = merged
+                    stats['skills'] += 1
+                    changed = True
+            if changed:
+                professor.updated_at = timezone.now()
+                pending.append(professor)
+                if len(pending) >= batch_size:
+                    flush()
+    flush()
+    return stats
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .dedup import merge_skills
+from .models import Professor
+from .normalize import normalize_person_name
+
+# Fields a refresh may change on an existing professor
+REFRESHED_FIELDS = ['email', 'portfolio_link', 'skills', 'last_verified_at', 'updated_at']
+
+
+def apply_fresh_details(professor: Professor, prof_data: Dict[str, str]) -> None:
+    """
+    Update ``professor`` in memory from newly extracted data: non-empty email and
+    portfolio replace the stored ones, skills are merged, and it is marked verified.
+    """
+    email = (prof_data.get('email') or '').strip()
+    portfolio_link = (prof_data.get('portfolio_link') or '').strip()
+    if email:
+        professor.email = email
+    if portfolio_link:
+        professor.portfolio_link = portfolio_link
+    professor.skills = merge_skills(professor.skills, prof_data.get('skills', ''))
+    professor.last_verified_at = professor.updated_at = timezone.now()
+
+
+def fresh_filter(max_age_days: int) -> Q:
+    """Professors verified (or, if never verified, created) within ``max_age_days``"""
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    return Q(last_verified_at__gte=cutoff) | Q(last_verified_at__isnull=True, created_at__gte=cutoff)
+
+
+def stale_professors(max_age_days: int, retry_after_hours: int, limit: int):
+    """
+    Professors not verified for ``max_age_days``, least recently verified first.
+    Rows a refresh already searched for in the last ``retry_after_hours`` are
+    skipped so one unmatched professor can't hog every run.
+    """
+    now = timezone.now()
+    retry_cutoff = now - timedelta(hours=retry_after_hours)
+    return (
+        Professor.objects
+        .select_related('department__university__city__country')
+        .annotate(verified=Coalesce('last_verified_at', 'created_at'))
+        .filter(Q(refresh_attempted_at__isnull=True) | Q(refresh_attempted_at__lt=retry_cutoff),
+                verified__lt=now - timedelta(days=max_age_days))
+        .order_by('verified', 'id')[:limit]
+    )
+
+
+def group_by_university(professors, group_size: int) -> List[List[Professor]]:
+    """Split professors into per-university batches, keeping the stalest batches first"""
+    by_university = OrderedDict()
+    for professor in professors:
+        by_university.setdefault(professor.department.university_id, []).append(professor)
+    batches = []
+    for members in by_university.values():
+        batches.extend(members[i:i + group_size] for i in range(0, len(members), group_size))
+    return batches
+
+
+def batch_skills(batch: List[Professor], max_skills: int = 5) -> str:
+    """The most common skills of a batch, used as the refresh search's skills"""
+    counts = OrderedDict()
+    for professor in batch:
+        for skill in professor.get_skills_list():
+            counts[skill.lower()] = counts.get(skill.lower(), 0) + 1
+    ranked = sorted(counts, key=counts.get, reverse=True)
+    return ', '.join(ranked[:max_skills])
+
+
+def match_results(batch: List[Professor], results: List[Dict[str, str]]) -> Dict[int, Dict[str, str]]:
+    """Map professor id -> extracted record for batch members found in ``results``"""
+    by_name = {normalize_person_name(p.name): p for p in batch}
+    matched = {}
+    for prof_data in results:
+        professor = by_name.get(normalize_person_name(prof_data.get('name', '')))
+        if professor is not None:
+            matched[professor.id] = prof_data
+    return matched
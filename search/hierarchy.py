@@ -0,0 +1,190 @@
+"""
+Process-local cache of the Country > City > University > Department hierarchy.
+
+The hierarchy is small and rarely changes, so every process keeps all four
+levels in memory: id -> (name, parent id), plus normalized-name lookups scoped
+to the parent. Saves resolve location names to ids, list filters turn name
+filters into a ``department_id IN (...)`` filter, and serializers read the
+location names of a department, all without touching the database.
+
+Signals keep the cache current in the process that made a change and bump a
+version stamp file once the change is committed; other processes notice the
+new version (checked at most every HIERARCHY_CHECK_SECONDS) and rebuild.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .models import City, Country, Department, University
+from .normalize import normalize_text
+
+LEVELS = ('country', 'city', 'university', 'department')
+MODELS = {'country': Country, 'city': City, 'university': University, 'department': Department}
+PARENT_FIELDS = {'country': None, 'city': 'country_id', 'university': 'city_id', 'department': 'university_id'}
+
+# Above this many matching departments a name filter falls back to SQL joins
+MAX_DEPARTMENT_IDS = 2000
+
+
+class _Level:
+    """One level of the hierarchy"""
+
+    def __init__(self):
+        self.rows: Dict[int, Tuple[str, Optional[int]]] = {}    # id -> (name, parent id)
+        self.lowered: Dict[int, str] = {}                        # id -> name.lower(), for icontains
+        self.by_key: Dict[Tuple[Optional[int], str], int] = {}   # (parent id, normalized name) -> id
+
+    def add(self, row_id: int, name: str, parent_id: Optional[int]):
+        self.rows[row_id] = (name, parent_id)
+        self.lowered[row_id] = name.lower()
+        self.by_key.setdefault((parent_id, normalize_text(name)), row_id)
+
+    def containing(self, text: str) -> List[int]:
+        """Ids whose name contains ``text`` case-insensitively (same as ``name__icontains``)"""
+        text = text.lower()
+        return [row_id for row_id, name in self.lowered.items() if text in name]
+
+
+class HierarchyCache:
+    def __init__(self, stamp_path, check_seconds: float):
+        self.stamp_path = Path(stamp_path)
+        self.check_seconds = check_seconds
+        self._levels: Optional[Dict[str, _Level]] = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    # Versioning
+
+    def _read_stamp(self) -> Optional[str]:
+        try:
+            return self.stamp_path.read_text()
+        except OSError:
+            return None
+
+    def _bump(self):
+        """Publish a new version so other processes rebuild"""
+        version = str(time.time_ns())
+        try:
+            self.stamp_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.stamp_path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp.write_text(version)
+            os.replace(tmp, self.stamp_path)
+        except OSError as e:
+            print(f"Could not write hierarchy version stamp: {e}")
+        self._version = version
+
+    def _build(self):
+        levels = {level: _Level() for level in LEVELS}
+        for level in LEVELS:
+            parent = PARENT_FIELDS[level]
+            fields = ('id', 'name', parent) if parent else ('id', 'name')
+            for row in MODELS[level].objects.values_list(*fields):
+                levels[level].add(row[0], row[1], row[2] if parent else None)
+        self._levels = levels
+
+    def _current(self) -> Dict[str, _Level]:
+        with self._lock:
+            now = time.monotonic()
+            if self._levels is not None and now - self._checked_at < self.check_seconds:
+                return self._levels
+            self._checked_at = now
+            version = self._read_stamp()
+            if self._levels is None or version != self._version:
+                self._build()
+                self._version = version
+            return self._levels
+
+    def warm(self):
+        self._current()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    # Updates (called from signals)
+
+    def add(self, level: str, row_id: int, name: str, parent_id: Optional[int]):
+        with self._lock:
+            if self._levels is not None:
+                self._levels[level].add(row_id, name, parent_id)
+            self._bump()
+
+    def invalidate(self):
+        with self._lock:
+            self._levels = None
+            self._bump()
+
+    # Lookups
+
+    def lookup(self, level: str, name: str, parent_id: Optional[int] = None) -> Optional[int]:
+        """Id of the ``level`` row called ``name`` (normalized) under ``parent_id``"""
+        return self._current()[level].by_key.get((parent_id, normalize_text(name)))
+
+    def instance(self, level: str, row_id: int):
+        """
+        A model instance for a cached row, built without a query (other fields
+        are deferred), or None if the row isn't known.
+        """
+        row = self._current()[level].rows.get(row_id)
+        if row is None:
+            return None
+        name, parent_id = row
+        parent = PARENT_FIELDS[level]
+        if parent:
+            return MODELS[level].from_db('default', ['id', 'name', parent], [row_id, name, parent_id])
+        return MODELS[level].from_db('default', ['id', 'name'], [row_id, name])
+
+    def country_id(self, name: str) -> int:
+        """Id of the country called ``name``, creating it if needed"""
+        row_id = self.lookup('country', name)
+        if row_id is None:
+            # A new row reaches the cache through post_save once it is committed
+            row_id = Country.objects.get_or_create(name=name, defaults={'code': name[:3].upper()})[0].id
+        return row_id
+
+    def city_id(self, name: str, country_id: int) -> int:
+        """Id of the city called ``name`` in ``country_id``, creating it if needed"""
+        row_id = self.lookup('city', name, country_id)
+        if row_id is None:
+            row_id = City.objects.get_or_create(name=name, country_id=country_id)[0].id
+        return row_id
+
+    def department_ids(self, country=None, city=None, university=None, department=None) -> Optional[List[int]]:
+        """
+        Ids of departments under locations whose names contain the given filters,
+        or None when there are too many to filter by id.
+        """
+        levels = self._current()
+        allowed = None
+        for level, text in zip(LEVELS, (country, city, university, department)):
+            if allowed is not None:
+                # Keep only children of the rows that matched the level above
+                allowed = {row_id for row_id, (_, parent_id) in levels[level].rows.items() if parent_id in allowed}
+            if text:
+                matching = set(levels[level].containing(text))
+                allowed = matching if allowed is None else allowed & matching
+        if allowed is None:
+            allowed = set(levels['department'].rows)
+        if len(allowed) > MAX_DEPARTMENT_IDS:
+            return None
+        return sorted(allowed)
+
+    def path(self, department_id: int) -> Optional[Dict[str, str]]:
+        """Department, university, city and country names of a department"""
+        levels = self._current()
+        names = {}
+        row_id = department_id
+        for level in reversed(LEVELS):
+            row = levels[level].rows.get(row_id)
+            if row is None:
+                return None
+            names[level], row_id = row
+        return names
+
+
+hierarchy_cache = HierarchyCache(settings.HIERARCHY_VERSION_FILE, settings.HIERARCHY_CHECK_SECONDS)
@@ -0,0 +1,44 @@
+"""
+Deferred imports for heavy modules (numpy, requests).
+
+``lazy_module('requests')`` returns a stand-in that imports the real module on
+first attribute access, so commands and processes that never touch it don't
+pay for the import. Worker processes import them up front during warm-up.
+"""
+import importlib
+import importlib.util
+import threading
+from typing import Optional
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
+
+
+def lazy_module(name: str, optional: bool = False) -> Optional[LazyModule]:
+    """
+    A deferred import of ``name``. With ``optional``, returns None when the
+    module isn't installed (the usual ``except ImportError: module = None``).
+    """
+    if optional and importlib.util.find_spec(name) is None:
+        return None
+    return LazyModule(name)
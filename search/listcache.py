@@ -0,0 +1,69 @@
+"""
+List API responses memoized in the shared cache.
+
+Cached responses are keyed by a generation number that is itself stored in the
+shared cache. Professor and location changes bump it (see signals.py) once
+their transaction commits, so every worker stops serving the old lists at once;
+the orphaned entries age out of the LRU. Loops that save many rows wrap them in
+``batched_bumps()`` to bump once instead of once per row. Writes that skip signals (bulk_update, raw SQL) are only picked up once
+LIST_CACHE_SECONDS has passed.
+"""
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+GENERATION_KEY = 'list:generation'
+
+
+def generation() -> int:
+    # Seeded from the clock so a lost generation key can't bring back old entries
+    return cache.get_or_set(GENERATION_KEY, time.time_ns, None)
+
+
+_batch = threading.local()
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+
+
+def bump_generation(using=None):
+    """
+    Start a new generation once the current transaction commits, so no worker
+    rebuilds a list from data that isn't visible yet and caches it as current
+    """
+    if getattr(_batch, 'depth', 0):
+        _batch.pending = True
+    else:
+        transaction.on_commit(_next_generation, using=using)
+
+
+@contextmanager
+def batched_bumps():
+    """Collapse the generation bumps of every write in the block into one at its end"""
+    _batch.depth = getattr(_batch, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _batch.depth -= 1
+        if not _batch.depth and getattr(_batch, 'pending', False):
+            _batch.pending = False
+            bump_generation()
+
+
+def cached_list(namespace: str, params, build):
+    """``build()``'s result for ``params``, shared between workers until the data changes"""
+    if settings.LIST_CACHE_SECONDS <= 0:
+        return build()
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    key = f'{namespace}:{generation()}:{digest}'
+    return cache.get_or_set(key, build, settings.LIST_CACHE_SECONDS)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from search.models import Professor
+from search.similarity import np, similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped skill vectors used by /api/professors/similar/'
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('numpy is required: pip install numpy')
+
+        professors = Professor.objects.order_by('id').values_list('id', 'skills')
+        total = professors.count()
+        self.stdout.write(f'Vectorizing {total} professors...')
+        count = similarity_index.rebuild(professors.iterator(chunk_size=5000), total)
+        self.stdout.write(self.style.SUCCESS(
+            f'Built similarity index with {count} rows in {similarity_index.directory}'
+        ))
@@ -0,0 +1,35 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from search.sharedcache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Show per-namespace statistics of the shared cache, summed over all worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clear', action='store_true', help='Remove every cached entry afterwards')
+
+    def handle(self, *args, **options):
+        cache = caches['default']
+        if not isinstance(cache, SQLiteCache):
+            raise CommandError('The default cache is not search.sharedcache.SQLiteCache')
+
+        totals = cache.totals()
+        self.stdout.write(
+            f"{totals['entries']}/{totals['max_entries']} entries, "
+            f"{totals['bytes'] / 1e6:.1f}/{totals['max_bytes'] / 1e6:.0f} MB"
+        )
+        self.stdout.write(f"{'namespace':<20} {'entries':>8} {'MB':>8} {'hits':>10} {'misses':>10} "
+                          f"{'hit %':>6} {'sets':>8} {'evicted':>8}")
+        for namespace, counts in sorted(cache.stats().items()):
+            lookups = counts['hits'] + counts['misses']
+            hit_rate = f"{100 * counts['hits'] / lookups:.1f}" if lookups else '-'
+            self.stdout.write(
+                f"{namespace:<20} {counts['entries']:>8} {(counts['bytes'] or 0) / 1e6:>8.2f} "
+                f"{counts['hits']:>10} {counts['misses']:>10} {hit_rate:>6} "
+                f"{counts['sets']:>8} {counts['evictions']:>8}"
+            )
+        if options['clear']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS('Cleared the shared cache'))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from search.dedup import CANDIDATE_FIELDS, Candidate, find_duplicate_groups, merge_groups
+from search.models import Professor
+
+
+class Command(BaseCommand):
+    help = 'Find and merge duplicate professors across the whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=settings.DEDUP_MATCH_THRESHOLD,
+                            help='Minimum match score (0-1) to treat two rows as the same person')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of duplicate groups merged per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report duplicate groups without merging them')
+
+    def handle(self, *args, **options):
+        candidates = (
+            Candidate(*row)
+            for row in Professor.objects.values_list(*CANDIDATE_FIELDS).iterator(chunk_size=5000)
+        )
+        groups = find_duplicate_groups(candidates, options['threshold'])
+        duplicates = sum(len(group) - 1 for group in groups)
+        self.stdout.write(f'Found {len(groups)} duplicate groups ({duplicates} extra rows)')
+
+        if options['dry_run']:
+            for group in groups[:20]:
+                names = Professor.objects.filter(id__in=group).values_list('name', flat=True)
+                self.stdout.write(f'  {group}: {list(names)}')
+            return
+
+        deleted = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(groups), batch_size):
+            deleted += merge_groups(groups[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Merged duplicates, removed {deleted} rows'))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from search.enrich import PortfolioFetcher, enrich_professors, enrichment_candidates
+
+
+class Command(BaseCommand):
+    help = 'Fill in missing emails and sparse skills from professors\' portfolio pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500,
+                            help='Maximum number of professors to enrich')
+        parser.add_argument('--min-skills', type=int, default=3,
+                            help='Enrich professors with fewer skills than this (or no email)')
+        parser.add_argument('--concurrency', type=int, default=settings.ENRICH_CONCURRENCY,
+                            help='Number of pages fetched at the same time')
+        parser.add_argument('--host-delay', type=float, default=settings.ENRICH_HOST_DELAY_SECONDS,
+                            help='Minimum seconds between requests to the same host')
+        parser.add_argument('--ignore-cache', action='store_true',
+                            help='Revalidate every page instead of reusing recently fetched ones')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the professors that would be enriched')
+
+    def handle(self, *args, **options):
+        professors = enrichment_candidates(options['min_skills'], options['limit'])
+        self.stdout.write(f'{len(professors)} professors to enrich')
+
+        if options['dry_run']:
+            for professor in professors:
+                self.stdout.write(f'  {professor.name}: {professor.portfolio_link}')
+            return
+
+        fetcher = PortfolioFetcher(
+            delay=options['host_delay'], cache_hours=0 if options['ignore_cache'] else None
+        )
+        stats = enrich_professors(professors, concurrency=options['concurrency'], fetcher=fetcher)
+        self.stdout.write(', '.join(f'{key}={value}' for key, value in stats.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {stats['updated']} professors ({stats['emails']} emails, {stats['skills']} skill sets)"
+        ))
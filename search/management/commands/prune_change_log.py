@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from search.models import ProfessorChange
+
+
+class Command(BaseCommand):
+    help = 'Delete /api/changes/ log entries older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHANGE_LOG_RETENTION_DAYS,
+                            help='Keep this many days of changes (default: CHANGE_LOG_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ProfessorChange.objects.filter(changed_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} change log entries older than {options['days']} days; "
+            'clients with older cursors will be asked to resync'
+        ))
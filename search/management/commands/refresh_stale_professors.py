@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from search.freshness import (
+    REFRESHED_FIELDS, apply_fresh_details, batch_skills, group_by_university,
+    match_results, stale_professors,
+)
+from search.models import Professor
+from search.scheduler import BULK
+from search.services import Deadline, ProfessorSearchService
+from search.signals import bulk_update_professors
+
+
+class Command(BaseCommand):
+    help = 'Re-verify the stalest professors, one upstream search per university batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=settings.REFRESH_MAX_AGE_DAYS,
+                            help='Refresh professors not verified for this many days')
+        parser.add_argument('--retry-after-hours', type=int, default=24,
+                            help='Skip professors already searched for in the last N hours')
+        parser.add_argument('--limit', type=int, default=200,
+                            help='Maximum number of stale professors to consider')
+        parser.add_argument('--group-size', type=int, default=10,
+                            help='Maximum professors refreshed by one upstream search')
+        parser.add_argument('--quota', type=int, default=settings.REFRESH_SEARCH_QUOTA,
+                            help='Maximum number of upstream searches in this run')
+        parser.add_argument('--concurrency', type=int, default=settings.REFRESH_CONCURRENCY,
+                            help='Number of upstream searches run at the same time')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show the planned batches without searching')
+
+    def handle(self, *args, **options):
+        professors = list(stale_professors(
+            options['max_age_days'], options['retry_after_hours'], options['limit']
+        ))
+        batches = group_by_university(professors, options['group_size'])[:options['quota']]
+        self.stdout.write(
+            f'{len(professors)} stale professors, refreshing {sum(map(len, batches))} '
+            f'in {len(batches)} searches'
+        )
+
+        if options['dry_run']:
+            for batch in batches:
+                university = batch[0].department.university
+                self.stdout.write(f'  {university.name}: {len(batch)} professors, skills "{batch_skills(batch)}"')
+            return
+
+        def search(batch):
+            university = batch[0].department.university
+            service = ProfessorSearchService(lane=BULK)
+            results = service.search_and_extract_professors(
+                university.city.country.name, university.city.name, university.name, '',
+                batch_skills(batch), deadline=Deadline(settings.SEARCH_DEFAULT_DEADLINE_SECONDS)
+            )
+            # A failed or degraded search says nothing about who is still listed
+            return batch, results, service.failed or service.degraded
+
+        refreshed = unsearched = 0
+        # Upstream calls run concurrently; database writes stay on this thread
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as executor:
+            for batch, results, unreliable in executor.map(search, batches):
+                if unreliable:
+                    # Not stamped, so the next run tries these professors again
+                    unsearched += 1
+                    continue
+                matched = match_results(batch, results)
+                now = timezone.now()
+                found, missing = [], []
+                for professor in batch:
+                    # Searched either way: not retried before --retry-after-hours
+                    professor.refresh_attempted_at = now
+                    if professor.id in matched:
+                        apply_fresh_details(professor, matched[professor.id])
+                        found.append(professor)
+                    else:
+                        missing.append(professor)
+                Professor.objects.bulk_update(missing, ['refresh_attempted_at'])
+                bulk_update_professors(found, REFRESHED_FIELDS + ['refresh_attempted_at'])
+                refreshed += len(matched)
+                self.stdout.write(
+                    f'  {batch[0].department.university.name}: verified {len(matched)}/{len(batch)}'
+                )
+
+        if unsearched:
+            self.stdout.write(self.style.WARNING(f'{unsearched} searches failed or were degraded; retried next run'))
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} professors'))
@@ -0,0 +1,63 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from search.pagestore import page_store
+from search.routing import LATENCY_TIERS
+from search.scheduler import BULK
+from search.services import GroqLLMService
+
+
+class Command(BaseCommand):
+    help = 'Re-run LLM extraction over searches kept in the page store, without calling Tavily'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since-days', type=float, default=None,
+                            help='Only replay searches recorded in the last N days')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Maximum number of searches to replay (newest first)')
+        parser.add_argument('--tier', choices=list(LATENCY_TIERS), default=settings.GROQ_DEFAULT_TIER,
+                            help='Latency tier used to route the extraction model')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of extraction calls run at the same time')
+        parser.add_argument('--output', default=None,
+                            help='Write one JSON line per search to this file instead of stdout')
+        parser.add_argument('--stats', action='store_true',
+                            help='Only print page store statistics')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in page_store.stats().items():
+                self.stdout.write(f'{key}: {value}')
+            return
+
+        since = time.time() - options['since_days'] * 86400 if options['since_days'] else None
+        searches = [search for search in page_store.searches(since, options['limit']) if search['results']]
+        self.stderr.write(f'Replaying extraction for {len(searches)} stored searches')
+
+        def extract(search):
+            professors = GroqLLMService(lane=BULK).extract_professor_info(
+                search['results'], search['params'].get('skills', ''), tier=options['tier']
+            )
+            return search, professors
+
+        output = open(options['output'], 'w') if options['output'] else self.stdout
+        extracted = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as executor:
+                for search, professors in executor.map(extract, searches):
+                    extracted += len(professors)
+                    output.write(json.dumps({
+                        'search_id': search['id'],
+                        'params': search['params'],
+                        'pages': len(search['results']),
+                        'professors': professors,
+                    }) + '\n')
+        finally:
+            if options['output']:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(f'Extracted {extracted} professors from {len(searches)} searches'))
@@ -0,0 +1,149 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from django.conf import settings
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Buckets for per-request counts (queries, results)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str, quote: bool = True) -> str:
+    """Backslash, newline (and in label values, double quote) escaped as the text format requires"""
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format_labels(key, extra=()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help_text = name, help_text
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {_escape(self.help_text, quote=False)}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for key, value in sorted(self.values.items()):
+            yield f'{self.name}{_format_labels(key)} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self.values[_label_key(labels)] = value
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name, self.help_text = name, help_text
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self.values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {_escape(self.help_text, quote=False)}'
+        yield f'# TYPE {self.name} histogram'
+        for key, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}'
+            yield f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {series[-1]}'
+            yield f'{self.name}_sum{_format_labels(key)} {series[-2]}'
+            yield f'{self.name}_count{_format_labels(key)} {series[-1]}'
+
+
+class Registry:
+    """In-process metrics; every update is a dict operation under one lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help_text, **options):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help_text, **options)
+        return metric
+
+    def inc(self, name: str, help_text: str, amount: float = 1, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._get(Counter, name, help_text).inc(amount, **labels)
+
+    def set(self, name: str, help_text: str, value: float, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._get(Gauge, name, help_text).set(value, **labels)
+
+    def observe(self, name: str, help_text: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._get(Histogram, name, help_text, buckets=buckets).observe(value, **labels)
+
+    @contextmanager
+    def timer(self, name: str, help_text: str, **labels):
+        """Observe the wall time of the ``with`` block into a histogram"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, help_text, time.perf_counter() - started, **labels)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        with self._lock:
+            lines = [line for name in sorted(self._metrics) for line in self._metrics[name].render()]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Registry()
+
+
+def stage_timer(stage: str):
+    """Time one search pipeline stage (tavily, groq, parse, save, ...)"""
+    return metrics.timer('search_stage_seconds', 'Time spent in each search pipeline stage', stage=stage)
+
+
+def record_upstream_status(upstream: str, status: str):
+    metrics.inc('upstream_responses_total', 'Upstream API responses by status', upstream=upstream, status=status)
+
+
+def record_cache(cache_name: str, hit: bool):
+    metrics.inc('cache_requests_total', 'Cache lookups by result', cache=cache_name,
+                result='hit' if hit else 'miss')
@@ -0,0 +1,283 @@
+import cProfile
+import hmac
+import random
+import sqlite3
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError, connections
+from django.utils.cache import patch_vary_headers
+
+from .encoding import compress, negotiate
+from .metrics import COUNT_BUCKETS, metrics
+
+# Set on responses whose request hit SQLite lock errors (their count), whatever
+# the view did with the exception; read by load_test.py
+LOCKED_HEADER = 'X-DB-Locked'
+
+
+def is_lock_error(error: Exception) -> bool:
+    """SQLITE_BUSY or SQLITE_LOCKED ("database is locked", "database table is locked")"""
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and 'locked' in str(error)
+
+
+class QueryCollector:
+    """Database execute wrapper that counts and times every query it sees, and its lock errors"""
+
+    def __init__(self, keep_sql=False):
+        self.keep_sql = keep_sql
+        self.count = 0
+        self.time = 0.0
+        self.locked = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except Exception as e:
+            if is_lock_error(e):
+                self.locked += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.time += elapsed
+            self._record(context['connection'].alias, sql, params, many, elapsed)
+
+    def _record(self, alias, sql, params, many, seconds):
+        if self.keep_sql:
+            self.queries.append({'alias': alias, 'sql': sql, 'params': params, 'many': many, 'seconds': seconds})
+
+    def wrap_all(self, stack: ExitStack):
+        """Install this collector on every configured database connection"""
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+
+
+class BudgetCollector(QueryCollector):
+    """
+    QueryCollector for SQL budgets. Every query is only counted and timed, per
+    distinct statement; queries are kept in full (with their parameters) once
+    the request is over its budget, and for single queries slower than
+    SQL_SLOW_QUERY_SECONDS. Requests within budget keep no SQL at all.
+    """
+
+    def __init__(self, request):
+        super().__init__()
+        self.request = request
+        # (alias, sql) -> [count, seconds, max seconds]
+        self.statements = {}
+        self.over_budget = False
+        self._budget = None
+
+    def budget(self):
+        from .sqlbudget import budget_for
+
+        if self._budget is not None:
+            return self._budget
+        budget = budget_for(self.request)
+        # Queries issued before URL resolution are held to the defaults; keep asking until the view is known
+        if getattr(self.request, 'resolver_match', None) is not None:
+            self._budget = budget
+        return budget
+
+    def _record(self, alias, sql, params, many, seconds):
+        statement = self.statements.get((alias, sql))
+        if statement is None:
+            statement = self.statements[(alias, sql)] = [0, 0.0, 0.0]
+        statement[0] += 1
+        statement[1] += seconds
+        statement[2] = max(statement[2], seconds)
+        if not self.over_budget:
+            max_queries, max_seconds = self.budget()
+            self.over_budget = self.count > max_queries or self.time > max_seconds
+        if self.over_budget or seconds > settings.SQL_SLOW_QUERY_SECONDS:
+            self.queries.append({'alias': alias, 'sql': sql, 'params': params, 'many': many, 'seconds': seconds})
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+class MetricsMiddleware:
+    """Per-view request latency, status and database query metrics"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.first_request = True
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            collector.wrap_all(stack)
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = view_name(request)
+        metrics.observe('http_request_seconds', 'Request latency by view', elapsed,
+                        view=view, method=request.method)
+        metrics.inc('http_requests_total', 'Requests by view and status',
+                    view=view, status=response.status_code)
+        metrics.observe('db_queries_per_request', 'Database queries issued per request',
+                        collector.count, buckets=COUNT_BUCKETS, view=view)
+        metrics.observe('db_query_seconds_per_request', 'Database time per request',
+                        collector.time, view=view)
+        if collector.locked:
+            metrics.inc('db_locked_errors_total', 'Queries that failed with an SQLite lock error',
+                        collector.locked, view=view)
+            response[LOCKED_HEADER] = str(collector.locked)
+        if self.first_request:
+            self.first_request = False
+            metrics.set('worker_first_request_seconds', "Latency of this worker's first request", elapsed)
+            print(f"First request ({view}) took {elapsed * 1000:.0f}ms")
+        return response
+
+
+class SQLBudgetMiddleware:
+    """
+    Checks each request's queries against its view's SQL budget and writes
+    violations and slow queries to the slow-query log (see sqlbudget.py). Not
+    installed unless SQL_BUDGET_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_BUDGET_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .sqlbudget import SQLBudgetExceeded, slow_query_log
+
+        collector = BudgetCollector(request)
+        with ExitStack() as stack:
+            collector.wrap_all(stack)
+            response = self.get_response(request)
+
+        max_queries, max_seconds = collector.budget()
+        reasons = []
+        if collector.count > max_queries:
+            reasons.append(f'{collector.count} queries (budget {max_queries})')
+        if collector.time > max_seconds:
+            reasons.append(f'{collector.time:.3f}s of SQL (budget {max_seconds}s)')
+        over_budget = bool(reasons)
+        slow = sum(1 for query in collector.queries if query['seconds'] > settings.SQL_SLOW_QUERY_SECONDS)
+        if slow:
+            reasons.append(f'{slow} queries slower than {settings.SQL_SLOW_QUERY_SECONDS}s')
+        if not reasons:
+            return response
+
+        # EXPLAIN runs here, after the collector is removed, so it isn't counted
+        view = view_name(request)
+        slow_query_log.record(request, response, view, collector.statements, collector.queries,
+                              (max_queries, max_seconds), reasons)
+        metrics.inc('sql_budget_violations_total', 'Requests over their SQL budget or with slow queries',
+                    view=view, kind='budget' if over_budget else 'slow_query')
+        if settings.SQL_BUDGET_STRICT and over_budget:
+            raise SQLBudgetExceeded(f'{request.method} {request.path} ({view}): ' + '; '.join(reasons))
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in cProfile + SQL capture for individual requests.
+
+    A request is profiled when a staff user (or a client presenting
+    PROFILING_TOKEN in ``X-Profile-Token``) sends ``X-Profile: 1`` or
+    ``?_profile=1``, or when it is picked by PROFILING_SAMPLE_RATE. Results go to
+    the on-disk ring listed at /admin/profiles/. Not installed unless
+    PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def _requested(self, request) -> bool:
+        if request.headers.get('X-Profile') != '1' and request.GET.get('_profile') != '1':
+            return False
+        token = request.headers.get('X-Profile-Token', '')
+        if settings.PROFILING_TOKEN and hmac.compare_digest(token, settings.PROFILING_TOKEN):
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_active and user.is_staff)
+
+    def __call__(self, request):
+        sampled = settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE
+        if not sampled and not self._requested(request):
+            return self.get_response(request)
+
+        from .profiling import profile_store
+
+        collector = QueryCollector(keep_sql=True)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            collector.wrap_all(stack)
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        try:
+            profile_id = profile_store.save(
+                profiler, request, response, view_name(request), elapsed, collector.queries
+            )
+            response['X-Profile-Id'] = profile_id
+        except OSError as e:
+            print(f"Could not write request profile: {e}")
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Brotli/gzip compression of JSON responses, negotiated from Accept-Encoding.
+    Bodies smaller than RESPONSE_COMPRESSION_MIN_BYTES are sent as they are.
+    Not installed unless RESPONSE_COMPRESSION_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RESPONSE_COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming or response.has_header('Content-Encoding')
+                or not response.get('Content-Type', '').startswith('application/json')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        encoding = negotiate(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        original_size = len(response.content)
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= original_size:
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The body changed, so a strong validator no longer holds byte-for-byte
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        metrics.inc('http_response_bytes_total', 'Compressed response bytes, before (original) and after (sent)',
+                    original_size, encoding=encoding, stage='original')
+        metrics.inc('http_response_bytes_total', 'Compressed response bytes, before (original) and after (sent)',
+                    len(compressed), encoding=encoding, stage='sent')
+        return response
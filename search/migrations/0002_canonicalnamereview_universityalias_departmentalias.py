@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CanonicalNameReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('university', 'University'), ('department', 'Department')], max_length=20)),
+                ('raw_name', models.CharField(max_length=200)),
+                ('score', models.FloatField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('department', models.ForeignKey(blank=True, help_text='Row created for the raw name', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='search.department')),
+                ('suggested_department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='search.department')),
+                ('suggested_university', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='search.university')),
+                ('university', models.ForeignKey(blank=True, help_text='Row created for the raw name', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='search.university')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UniversityAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(help_text="Normalized alias, e.g. 'mit'", max_length=200, unique=True)),
+                ('university', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='search.university')),
+            ],
+            options={
+                'verbose_name_plural': 'University aliases',
+                'ordering': ['alias'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DepartmentAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(help_text="Normalized alias, e.g. 'cs'", max_length=150)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='search.department')),
+                ('university', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='department_aliases', to='search.university')),
+            ],
+            options={
+                'verbose_name_plural': 'Department aliases',
+                'ordering': ['alias'],
+                'unique_together': {('alias', 'university')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_canonicalnamereview_universityalias_departmentalias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text="When a search last confirmed this professor's details", null=True),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
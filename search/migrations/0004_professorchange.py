@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+def log_existing_professors(apps, schema_editor):
+    """Start the change log with every current professor so a feed read from the beginning is complete"""
+    Professor = apps.get_model('search', 'Professor')
+    ProfessorChange = apps.get_model('search', 'ProfessorChange')
+    db_alias = schema_editor.connection.alias
+    ids = Professor.objects.using(db_alias).order_by('id').values_list('id', flat=True)
+    ProfessorChange.objects.using(db_alias).bulk_create(
+        (ProfessorChange(professor_id=professor_id, action='created') for professor_id in ids.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_professor_last_verified_at_professor_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfessorChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('professor_id', models.BigIntegerField(db_index=True)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(log_existing_professors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+from search.normalize import surname_key
+
+
+def fill_surname_keys(apps, schema_editor):
+    Professor = apps.get_model('search', 'Professor')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for professor in Professor.objects.using(db_alias).only('id', 'name').iterator():
+        professor.surname_key = surname_key(professor.name)
+        batch.append(professor)
+        if len(batch) >= 1000:
+            Professor.objects.using(db_alias).bulk_update(batch, ['surname_key'])
+            batch = []
+    Professor.objects.using(db_alias).bulk_update(batch, ['surname_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_professorchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='surname_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_surname_keys, migrations.RunPython.noop),
+    ]
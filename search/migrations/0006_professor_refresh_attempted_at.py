@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0005_professor_surname_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professor',
+            name='refresh_attempted_at',
+            field=models.DateTimeField(blank=True, help_text='When refresh_stale_professors last searched for this professor', null=True),
+        ),
+    ]
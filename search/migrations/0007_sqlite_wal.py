@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def apply(apps, schema_editor):
+        # The journal mode is stored in the database file, so this only has to happen once
+        if schema_editor.connection.vendor == 'sqlite':
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={mode}')
+    return apply
+
+
+class Migration(migrations.Migration):
+    # journal_mode can't be changed inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('search', '0006_professor_refresh_attempted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE'), atomic=False),
+    ]
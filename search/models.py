@@ -1,5 +1,7 @@
 from django.db import models
 
+from .normalize import surname_key
+
 class Country(models.Model):
     name = models.CharField(max_length=100, unique=True)
     code = models.CharField(max_length=3, unique=True)  # ISO country code
@@ -52,10 +54,32 @@ class Professor(models.Model):
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='professors')
     skills = models.TextField(help_text="Comma-separated list of skills/expertise areas")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    last_verified_at = models.DateTimeField(blank=True, null=True, db_index=True,
+                                            help_text="When a search last confirmed this professor's details")
+    refresh_attempted_at = models.DateTimeField(
+        blank=True, null=True, help_text="When refresh_stale_professors last searched for this professor"
+    )
+    # Normalized last name ("Dr. Jane Doe, PhD" -> "doe"), kept in sync by save()
+    surname_key = models.CharField(max_length=150, blank=True, db_index=True, editable=False)
     
     def __str__(self):
         return f"{self.name} - {self.department}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept so signal handlers can tell what a later save() changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.surname_key = surname_key(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'surname_key'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['name']
         unique_together = ['name', 'department']
@@ -63,3 +87,80 @@ class Professor(models.Model):
     def get_skills_list(self):
         """Return skills as a list"""
         return [skill.strip() for skill in self.skills.split(',') if skill.strip()]
+
+class UniversityAlias(models.Model):
+    """Alternative spelling that should resolve to a canonical university"""
+    alias = models.CharField(max_length=200, unique=True, help_text="Normalized alias, e.g. 'mit'")
+    university = models.ForeignKey(University, on_delete=models.CASCADE, related_name='aliases')
+    
+    def __str__(self):
+        return f"{self.alias} -> {self.university.name}"
+    
+    class Meta:
+        ordering = ['alias']
+        verbose_name_plural = "University aliases"
+
+class DepartmentAlias(models.Model):
+    """Alternative spelling that should resolve to a canonical department of a university"""
+    alias = models.CharField(max_length=150, help_text="Normalized alias, e.g. 'cs'")
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='aliases')
+    university = models.ForeignKey(University, on_delete=models.CASCADE, related_name='department_aliases')
+    
+    def __str__(self):
+        return f"{self.alias} -> {self.department.name}"
+    
+    class Meta:
+        ordering = ['alias']
+        verbose_name_plural = "Department aliases"
+        unique_together = ['alias', 'university']
+
+class CanonicalNameReview(models.Model):
+    """A new University/Department that looked like an existing one but fell below the auto-merge threshold"""
+    KIND_CHOICES = [
+        ('university', 'University'),
+        ('department', 'Department'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    raw_name = models.CharField(max_length=200)
+    score = models.FloatField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    university = models.ForeignKey(University, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='+', help_text="Row created for the raw name")
+    suggested_university = models.ForeignKey(University, on_delete=models.CASCADE, null=True, blank=True,
+                                             related_name='+')
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='+', help_text="Row created for the raw name")
+    suggested_department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True,
+                                             related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.kind}: {self.raw_name} ({self.score:.2f})"
+    
+    class Meta:
+        ordering = ['-created_at']
+
+class ProfessorChange(models.Model):
+    """Append-only log of professor writes, read by the /api/changes/ feed in id order"""
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    # Not a foreign key: entries must outlive the professors they describe
+    professor_id = models.BigIntegerField(db_index=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"#{self.id} professor {self.professor_id} {self.action}"
+    
+    class Meta:
+        ordering = ['id']
@@ -0,0 +1,70 @@
+import re
+import unicodedata
+import zlib
+from typing import Iterable, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                   'gclid', 'fbclid', 'ref', 'source'}
+
+# Honorifics and degrees the LLM tends to put around names
+NAME_NOISE = {'dr', 'prof', 'professor', 'mr', 'mrs', 'ms', 'miss', 'sir', 'phd', 'md',
+              'assoc', 'associate', 'assistant', 'emeritus', 'jr', 'sr'}
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace to single spaces"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def normalize_person_name(name: str) -> str:
+    """'Dr. Jane A. Doe, PhD' -> 'jane a doe'"""
+    return ' '.join(token for token in normalize_text(name).split() if token not in NAME_NOISE)
+
+
+def surname_key(name: str) -> str:
+    """Normalized last name, the key professors are looked up by for deduplication"""
+    tokens = normalize_person_name(name).split()
+    return tokens[-1] if tokens else ''
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for deduplication: lowercase scheme and host, no
+    ``www.``, no fragment, no tracking parameters, sorted query, no trailing slash.
+    """
+    parts = urlsplit((url or '').strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+    ))
+    path = parts.path.rstrip('/') or '/'
+    scheme = 'https' if parts.scheme.lower() in ('http', 'https') else parts.scheme.lower()
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def _stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def shingles(text: str, size: int = 5) -> Set[int]:
+    """Hashed word n-grams of ``text``, for near-duplicate detection"""
+    words = normalize_text(text).split()
+    if len(words) < size:
+        return {_stable_hash(' '.join(words))} if words else set()
+    return {_stable_hash(' '.join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Iterable, b: Iterable) -> float:
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,403 @@
+"""
+Compressed, deduplicated store of pages fetched during searches.
+
+Pages live in their own SQLite file (not the Django database) so they can be
+copied around, deleted or grown without touching application data. Page bodies
+are keyed by content hash and compressed once, so the same page reached through
+different URLs or searches is stored once; ``pages`` maps canonical URLs to
+hashes and ``searches`` remembers which pages each search returned, in rank
+order, so extraction can be replayed later without calling Tavily again. Pages
+fetched directly (portfolio enrichment) also keep their ETag/Last-Modified
+validators for conditional requests.
+
+When the compressed bodies outgrow ``max_bytes`` the least recently used pages
+are evicted. zstd is used when the optional ``zstandard`` package is installed
+and selected; otherwise zlib.
+
+Searches are recorded off the request path: ``submit_search`` queues them for a
+per-process writer thread, which compresses and stores them in batches, one
+transaction per batch. When the queue is full the search is dropped (the
+store is a replay aid, not a system of record).
+"""
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.conf import settings
+
+from .normalize import canonicalize_url
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    snippet TEXT NOT NULL DEFAULT '',
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    etag TEXT NOT NULL DEFAULT '',
+    last_modified TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+CREATE INDEX IF NOT EXISTS pages_hash ON pages (hash);
+CREATE TABLE IF NOT EXISTS searches (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS search_pages (
+    search_id INTEGER NOT NULL REFERENCES searches (id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (search_id, rank)
+);
+"""
+
+PAGE_COLUMNS = 'p.url, p.title, p.snippet, p.fetched_at, p.etag, p.last_modified, b.codec, b.data'
+
+# Most pages deleted per eviction round
+EVICT_BATCH = 500
+# Eviction stops once the store is back under this fraction of max_bytes
+EVICT_LOW_WATER = 0.9
+# Searches waiting for the writer thread before new ones are dropped
+WRITE_QUEUE_SIZE = 256
+# Most searches stored per write transaction
+WRITE_BATCH = 32
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class PageStore:
+    """Content-addressed page bodies plus the URL and search indexes pointing at them"""
+
+    def __init__(self, path, max_bytes: int, codec: str = 'zlib'):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.codec = 'zstd' if codec == 'zstd' and zstandard else 'zlib'
+        self._local = threading.local()
+        # Running estimate of stored bytes; eviction recomputes the real total
+        self._approx_bytes = None
+        self._size_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._writer_pid = None
+        self._queue = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        # A connection inherited across fork() must not be used by the child
+        if connection is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA foreign_keys=ON')
+            connection.executescript(SCHEMA)
+            self._upgrade(connection)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _upgrade(connection):
+        """Add columns introduced after a store file was first created"""
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(pages)')}
+        for column in ('etag', 'last_modified'):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+
+    # Writes
+
+    def _put_page(self, connection, url: str, content: str, title: str, snippet: str, now: float,
+                  etag: str = '', last_modified: str = '') -> int:
+        """Store one page; returns the bytes added to the store (0 if the body was already there)"""
+        body = content.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        added = 0
+        if connection.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone() is None:
+            data = _compress(body, self.codec)
+            connection.execute(
+                'INSERT OR IGNORE INTO blobs (hash, codec, data, size, stored_size) VALUES (?, ?, ?, ?, ?)',
+                (digest, self.codec, data, len(body), len(data))
+            )
+            added = len(data)
+        connection.execute(
+            'INSERT INTO pages (url, hash, title, snippet, fetched_at, accessed_at, etag, last_modified) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (url) DO UPDATE SET hash = excluded.hash, title = excluded.title, '
+            'snippet = excluded.snippet, fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at, '
+            'etag = excluded.etag, last_modified = excluded.last_modified',
+            (url, digest, title, snippet, now, now, etag, last_modified)
+        )
+        return added
+
+    def _record_search(self, connection, query: str, params: Dict[str, Any], results: List[Dict[str, Any]],
+                       now: float):
+        """Insert one search and its pages inside the caller's transaction; returns (search id, bytes added)"""
+        added = 0
+        search_id = connection.execute(
+            'INSERT INTO searches (query, params, created_at) VALUES (?, ?, ?)',
+            (query, json.dumps(params, sort_keys=True), now)
+        ).lastrowid
+        for rank, result in enumerate(results):
+            url = canonicalize_url(result.get('url', ''))
+            if not url:
+                continue
+            content = result.get('raw_content') or result.get('content') or ''
+            added += self._put_page(
+                connection, url, content, result.get('title') or '', result.get('content') or '', now
+            )
+            connection.execute(
+                'INSERT INTO search_pages (search_id, rank, url) VALUES (?, ?, ?)', (search_id, rank, url)
+            )
+        return search_id, added
+
+    def record_search(self, query: str, params: Dict[str, Any], results: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Store the pages of one Tavily search and the order they came back in.
+        Returns the search id, or None if there was nothing to store.
+        """
+        if not results:
+            return None
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            search_id, added = self._record_search(connection, query, params, results, time.time())
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._account(added)
+        return search_id
+
+    def submit_search(self, query: str, params: Dict[str, Any], results: List[Dict[str, Any]]) -> bool:
+        """
+        Queue a search for the background writer instead of storing it on the
+        caller's thread. Returns False if it was dropped because the queue is full.
+        """
+        if not results:
+            return True
+        try:
+            self._writer_queue().put_nowait((query, params, results, time.time()))
+        except queue.Full:
+            print(f"Page store queue full, dropped search {query!r}")
+            return False
+        return True
+
+    def flush(self):
+        """Block until every queued search has been written"""
+        if self._queue is not None and self._writer_pid == os.getpid():
+            self._queue.join()
+
+    def _writer_queue(self) -> queue.Queue:
+        # Started per process: a writer thread does not survive fork(), so a forked
+        # worker gets its own queue and thread rather than the parent's
+        if self._writer_pid != os.getpid():
+            with self._writer_lock:
+                if self._writer_pid != os.getpid():
+                    self._queue = queue.Queue(WRITE_QUEUE_SIZE)
+                    threading.Thread(target=self._write_queued, args=(self._queue,),
+                                     name='pagestore-writer', daemon=True).start()
+                    self._writer_pid = os.getpid()
+        return self._queue
+
+    def _write_queued(self, pending: queue.Queue):
+        while True:
+            batch = [pending.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                connection = self._connection()
+                added = 0
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    for query, params, results, now in batch:
+                        added += self._record_search(connection, query, params, results, now)[1]
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                self._account(added)
+            except Exception as e:
+                print(f"Could not store {len(batch)} fetched searches: {e}")
+            finally:
+                for _ in batch:
+                    pending.task_done()
+
+    def put(self, url: str, content: str, title: str = '', snippet: str = '',
+            etag: str = '', last_modified: str = '') -> str:
+        """Store a single page outside of any search; returns its content hash"""
+        connection = self._connection()
+        url = canonicalize_url(url)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            added = self._put_page(connection, url, content, title, snippet, time.time(), etag, last_modified)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._account(added)
+        return connection.execute('SELECT hash FROM pages WHERE url = ?', (url,)).fetchone()[0]
+
+    # Reads
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """The stored page for ``url`` as a Tavily-shaped result, or None"""
+        connection = self._connection()
+        url = canonicalize_url(url)
+        row = connection.execute(
+            f'SELECT {PAGE_COLUMNS} FROM pages p JOIN blobs b ON b.hash = p.hash WHERE p.url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute('UPDATE pages SET accessed_at = ? WHERE url = ?', (time.time(), url))
+        return self._result(row)
+
+    def touch(self, url: str):
+        """Mark a page as just revalidated (e.g. after a 304 Not Modified)"""
+        now = time.time()
+        self._connection().execute(
+            'UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?', (now, now, canonicalize_url(url))
+        )
+
+    @staticmethod
+    def _result(row) -> Dict[str, Any]:
+        url, title, snippet, fetched_at, etag, last_modified, codec, data = row
+        return {
+            'url': url,
+            'title': title,
+            'content': snippet,
+            'raw_content': _decompress(data, codec).decode('utf-8'),
+            'fetched_at': fetched_at,
+            'etag': etag,
+            'last_modified': last_modified,
+        }
+
+    def searches(self, since: Optional[float] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Recorded searches (newest first) with their still-stored pages in rank order,
+        ready to hand to ``GroqLLMService.extract_professor_info``.
+        """
+        connection = self._connection()
+        rows = connection.execute(
+            'SELECT id, query, params, created_at FROM searches WHERE created_at >= ? '
+            'ORDER BY id DESC LIMIT ?', (since or 0, -1 if limit is None else limit)
+        ).fetchall()
+        for search_id, query, params, created_at in rows:
+            pages = connection.execute(
+                f'SELECT {PAGE_COLUMNS} FROM search_pages s '
+                'JOIN pages p ON p.url = s.url JOIN blobs b ON b.hash = p.hash '
+                'WHERE s.search_id = ? ORDER BY s.rank', (search_id,)
+            ).fetchall()
+            yield {
+                'id': search_id,
+                'query': query,
+                'params': json.loads(params),
+                'created_at': created_at,
+                'results': [self._result(page) for page in pages],
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        connection = self._connection()
+        blobs, raw, stored = connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs'
+        ).fetchone()
+        pages = connection.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        searches = connection.execute('SELECT COUNT(*) FROM searches').fetchone()[0]
+        return {
+            'pages': pages,
+            'unique_bodies': blobs,
+            'searches': searches,
+            'raw_bytes': raw,
+            'stored_bytes': stored,
+            'max_bytes': self.max_bytes,
+            'codec': self.codec,
+        }
+
+    # Eviction
+
+    def _stored_bytes(self, connection) -> int:
+        return connection.execute('SELECT COALESCE(SUM(stored_size), 0) FROM blobs').fetchone()[0]
+
+    def _account(self, added: int):
+        with self._size_lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._stored_bytes(self._connection())
+            else:
+                self._approx_bytes += added
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used pages until under the low-water mark; returns pages removed"""
+        connection = self._connection()
+        target = int(self.max_bytes * EVICT_LOW_WATER)
+        removed = 0
+        total = self._stored_bytes(connection)
+        while total > target:
+            # Oldest pages until their bodies add up to the excess (shared bodies may need another round)
+            urls, freed = [], 0
+            for url, stored_size in connection.execute(
+                    'SELECT p.url, b.stored_size FROM pages p JOIN blobs b ON b.hash = p.hash '
+                    'ORDER BY p.accessed_at LIMIT ?', (EVICT_BATCH,)):
+                urls.append((url,))
+                freed += stored_size
+                if freed >= total - target:
+                    break
+            if not urls:
+                break
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany('DELETE FROM pages WHERE url = ?', urls)
+                connection.execute('DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM pages)')
+                connection.execute(
+                    'DELETE FROM searches WHERE id NOT IN '
+                    '(SELECT s.search_id FROM search_pages s JOIN pages p ON p.url = s.url)'
+                )
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            removed += len(urls)
+            total = self._stored_bytes(connection)
+        with self._size_lock:
+            self._approx_bytes = total
+        if removed:
+            print(f"Page store evicted {removed} pages, {total} bytes stored")
+        return removed
+
+page_store = PageStore(settings.PAGE_STORE_PATH, settings.PAGE_STORE_MAX_MB * 1024 * 1024,
+                       settings.PAGE_STORE_CODEC)
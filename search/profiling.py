@@ -0,0 +1,81 @@
+import io
+import json
+import marshal
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+from django.conf import settings
+
+# Profile ids are generated by us; anything else in a download URL is rejected
+PROFILE_ID_RE = re.compile(r'^[0-9]{13}-[A-Za-z0-9_.:-]+$')
+
+
+class ProfileStore:
+    """Bounded on-disk ring of captured request profiles (.prof + .json per request)"""
+
+    def __init__(self, directory, max_profiles: int):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, profiler, request, response, view: str, elapsed: float, queries: List[dict]) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # The random part keeps concurrent captures of one view from sharing an id
+        profile_id = (f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}-"
+                      f"{re.sub(r'[^A-Za-z0-9_.:-]', '_', view)}")
+
+        profiler.create_stats()
+        with open(self.directory / f'{profile_id}.prof', 'xb') as handle:
+            handle.write(marshal.dumps(profiler.stats))
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+        details = {
+            'id': profile_id,
+            'path': request.get_full_path(),
+            'method': request.method,
+            'view': view,
+            'status': response.status_code,
+            'seconds': round(elapsed, 6),
+            'query_count': len(queries),
+            'query_seconds': round(sum(q['seconds'] for q in queries), 6),
+            'queries': [{**q, 'params': repr(q['params'])} for q in queries],
+            'top_functions': summary.getvalue(),
+        }
+        with open(self.directory / f'{profile_id}.json', 'x') as handle:
+            handle.write(json.dumps(details, indent=2, default=str))
+        self._trim()
+        return profile_id
+
+    def _trim(self):
+        profiles = sorted(self.directory.glob('*.json'))
+        for old in profiles[:max(0, len(profiles) - self.max_profiles)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix('.prof').unlink(missing_ok=True)
+
+    def list(self) -> List[dict]:
+        """Summaries of stored profiles, newest first"""
+        entries = []
+        for path in sorted(self.directory.glob('*.json'), reverse=True):
+            try:
+                details = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            details.pop('queries', None)
+            details.pop('top_functions', None)
+            entries.append(details)
+        return entries
+
+    def path(self, profile_id: str, suffix: str) -> Path:
+        if not PROFILE_ID_RE.match(profile_id) or suffix not in ('.prof', '.json'):
+            raise FileNotFoundError(profile_id)
+        path = self.directory / f'{profile_id}{suffix}'
+        if not path.exists():
+            raise FileNotFoundError(profile_id)
+        return path
+
+
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_PROFILES)
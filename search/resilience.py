@@ -0,0 +1,246 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+from .lazy import lazy_module
+from .metrics import metrics
+from .scheduler import INTERACTIVE, LaneScheduler
+
+requests = lazy_module('requests')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+class CallAbandoned(Exception):
+    """Raised by a guarded call that gave up before reaching the upstream; not a failure"""
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    Opens after ``failure_threshold`` consecutive failures or slow calls, rejects
+    calls while open, and after ``reset_timeout`` lets a limited number of
+    half-open probe calls through; a successful probe closes it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, slow_call_seconds: float = 20.0,
+                 reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self._lock = threading.Lock()
+
+    def _report(self, is_open: int):
+        metrics.set('upstream_circuit_open', 'Whether the upstream circuit breaker is open',
+                    is_open, upstream=self.name)
+        if is_open:
+            metrics.inc('upstream_circuit_opened_total', 'Times the upstream circuit breaker opened',
+                        upstream=self.name)
+
+    def _maybe_half_open(self):
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probes = 0
+
+    def is_open(self) -> bool:
+        """True if a call made now would be rejected"""
+        with self._lock:
+            self._maybe_half_open()
+            if self.state == self.OPEN:
+                return True
+            return self.state == self.HALF_OPEN and self.probes >= self.half_open_max_calls
+
+    def before_call(self):
+        with self._lock:
+            self._maybe_half_open()
+            if self.state == self.OPEN:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open, probe in flight")
+                self.probes += 1
+
+    def cancel_call(self):
+        """A call that never reached the upstream gives back its half-open probe"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.probes:
+                self.probes -= 1
+
+    def record_success(self, elapsed: float):
+        if elapsed >= self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"{self.name} circuit closed")
+                self._report(0)
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"{self.name} circuit opened after {self.failures} failures")
+                    self._report(1)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to pick the hedging delay"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """
+    Whether an exception says the upstream is unavailable: timeouts, connection
+    errors and 5xx/429 responses. Client errors (a bad key, a rejected request)
+    mean it answered, and don't count against the breaker.
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return response.status_code >= 500 or response.status_code == 429
+    return isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+
+def hedged_call(fn: Callable, hedge_after: float, acquire_spare: Callable[[], bool],
+                release_spare: Callable[[], None]):
+    """
+    Run ``fn``; if it has not finished after ``hedge_after`` seconds and
+    ``acquire_spare()`` grants a spare upstream slot, start a duplicate and
+    return whichever succeeds first. Each call gets its own thread rather than
+    a place in a shared pool, so the delay measures the upstream, not local
+    queueing.
+    """
+    outcomes = queue.Queue()
+
+    def run(release):
+        try:
+            outcome = (True, fn())
+        except BaseException as e:
+            outcome = (False, e)
+        if release:
+            release()
+        outcomes.put(outcome)
+
+    threading.Thread(target=run, args=(None,), name='upstream-call', daemon=True).start()
+    try:
+        succeeded, value = outcomes.get(timeout=hedge_after)
+    except queue.Empty:
+        if not acquire_spare():
+            succeeded, value = outcomes.get()
+        else:
+            threading.Thread(target=run, args=(release_spare,), name='upstream-hedge', daemon=True).start()
+            succeeded, value = outcomes.get()
+            if not succeeded:
+                # Either may still win; only the second outcome is final
+                succeeded, value = outcomes.get()
+    if succeeded:
+        return value
+    raise value
+
+
+class Upstream:
+    """
+    An upstream API guarded by a circuit breaker and a priority-lane scheduler,
+    with optional hedging. A hedge needs a slot of its own, taken only when one
+    is free and nothing is queued.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, scheduler: LaneScheduler,
+                 hedging: bool = False):
+        self.name = name
+        self.breaker = breaker
+        self.scheduler = scheduler
+        self.hedging = hedging
+        self.latency = LatencyTracker()
+
+    def call(self, fn: Callable, lane: str = INTERACTIVE, wait_timeout: Optional[float] = None):
+        """
+        Run ``fn`` once a slot is free in ``lane``. Raises CircuitOpenError without
+        queuing if the breaker is open, and QueueTimeout after ``wait_timeout``.
+        """
+        if self.breaker.is_open():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        with self.scheduler.slot(lane, wait_timeout):
+            self.breaker.before_call()
+            start = time.monotonic()
+            try:
+                hedge_after = self.latency.percentile(0.95) if self.hedging else None
+                if hedge_after:
+                    result = hedged_call(fn, hedge_after, lambda: self.scheduler.try_acquire(lane),
+                                         lambda: self.scheduler.release(lane))
+                else:
+                    result = fn()
+            except CallAbandoned:
+                self.breaker.cancel_call()
+                raise
+            except Exception as e:
+                if is_upstream_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    # It answered: as far as availability goes, that's a success
+                    self.breaker.record_success(time.monotonic() - start)
+                raise
+            elapsed = time.monotonic() - start
+        self.latency.add(elapsed)
+        self.breaker.record_success(elapsed)
+        return result
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """Return the process-wide guard for the named upstream ('tavily', 'groq')"""
+    with _upstreams_lock:
+        if name not in _upstreams:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=settings.UPSTREAM_BREAKER_FAILURES,
+                slow_call_seconds=settings.UPSTREAM_BREAKER_SLOW_CALL_SECONDS,
+                reset_timeout=settings.UPSTREAM_BREAKER_RESET_SECONDS,
+            )
+            scheduler = LaneScheduler(
+                name,
+                capacity=settings.UPSTREAM_MAX_CONCURRENCY,
+                reserved=settings.UPSTREAM_INTERACTIVE_RESERVED,
+                weights=settings.UPSTREAM_LANE_WEIGHTS,
+            )
+            _upstreams[name] = Upstream(name, breaker, scheduler, hedging=name in settings.UPSTREAM_HEDGING)
+        return _upstreams[name]
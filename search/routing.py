@@ -0,0 +1,103 @@
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# Groq models we route between, fastest first
+MODEL_CATALOG = {
+    'llama3-8b-8192': {'context_window': 8192},
+    'llama-3.1-8b-instant': {'context_window': 131072},
+    'llama3-70b-8192': {'context_window': 8192},
+    'llama-3.3-70b-versatile': {'context_window': 131072},
+}
+
+# Preferred models and output cap per latency tier, in order of preference
+LATENCY_TIERS = {
+    'fast': {
+        'models': ['llama3-8b-8192', 'llama-3.1-8b-instant'],
+        'max_tokens': 1500,
+    },
+    'balanced': {
+        'models': ['llama3-8b-8192', 'llama-3.1-8b-instant', 'llama3-70b-8192'],
+        'max_tokens': 2000,
+    },
+    'thorough': {
+        'models': ['llama3-70b-8192', 'llama-3.3-70b-versatile'],
+        'max_tokens': 4000,
+    },
+}
+
+# Never ask for fewer output tokens than this
+MIN_OUTPUT_TOKENS = 512
+# Tokens kept free for the chat template and system message
+CONTEXT_MARGIN = 256
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, deliberately pessimistic token estimate (~3 characters per token)"""
+    return len(text) // 3 + 1
+
+
+class ModelRouter:
+    """Pick a Groq model and ``max_tokens`` for a prompt size and latency tier"""
+
+    def route(self, prompt_tokens: int, tier: str,
+              exclude: Iterable[str] = ()) -> Optional[Tuple[str, int]]:
+        """
+        Return ``(model, max_tokens)`` for the first model of ``tier`` the prompt fits in.
+
+        Output is budgeted at roughly half the input size, clamped to the tier cap.
+        Larger-context models outside the tier are only used when the prompt does
+        not fit any model of the tier. Returns None when every candidate is excluded.
+        """
+        tier_config = LATENCY_TIERS[tier]
+        wanted = min(tier_config['max_tokens'], max(MIN_OUTPUT_TOKENS, prompt_tokens // 2))
+        needed = prompt_tokens + MIN_OUTPUT_TOKENS + CONTEXT_MARGIN
+
+        fallbacks = sorted(
+            (name for name in MODEL_CATALOG if name not in tier_config['models']),
+            key=lambda name: MODEL_CATALOG[name]['context_window'],
+        )
+        candidates = [name for name in tier_config['models'] + fallbacks if name not in exclude]
+        if not candidates:
+            return None
+
+        for name in candidates:
+            available = MODEL_CATALOG[name]['context_window'] - prompt_tokens - CONTEXT_MARGIN
+            if MODEL_CATALOG[name]['context_window'] >= needed:
+                return name, min(wanted, available)
+
+        # Nothing fits: use the largest context and let the API truncate the rest
+        name = max(candidates, key=lambda n: MODEL_CATALOG[n]['context_window'])
+        return name, MIN_OUTPUT_TOKENS
+
+
+class ModelStats:
+    """Per-model latency and outcome counters, shared across requests"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, latency: float, outcome: str):
+        """Record one call; ``outcome`` is 'success', 'parse_error' or 'error'"""
+        with self._lock:
+            stats = self._stats.setdefault(model, {
+                'calls': 0, 'success': 0, 'parse_error': 0, 'error': 0, 'total_latency': 0.0,
+            })
+            stats['calls'] += 1
+            stats[outcome] += 1
+            stats['total_latency'] += latency
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                model: {
+                    **stats,
+                    'avg_latency': stats['total_latency'] / stats['calls'],
+                    'success_rate': stats['success'] / stats['calls'],
+                }
+                for model, stats in self._stats.items()
+            }
+
+
+model_router = ModelRouter()
+model_stats = ModelStats()
@@ -0,0 +1,134 @@
+"""
+Priority lanes for upstream calls.
+
+Each upstream (Tavily, Groq) gets a ``LaneScheduler`` that caps how many calls
+this process has in flight. Waiting calls are queued per lane ('interactive'
+for user searches, 'bulk' for refreshes, replays and other background work) and
+dispatched by weighted fair queuing, so bulk work keeps moving but interactive
+requests get most of the turns. A number of slots is reserved for the
+interactive lane: bulk calls can never occupy them, so a big background job
+cannot make a user's search wait for a free slot.
+
+Limits are per process; with several workers the upstream sees up to
+workers x capacity concurrent calls.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from .metrics import metrics
+
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+LANES = (INTERACTIVE, BULK)
+
+
+class QueueTimeout(Exception):
+    """Raised when a call waited longer than allowed for an upstream slot"""
+
+
+class _Ticket:
+    __slots__ = ('granted', 'queued_at')
+
+    def __init__(self):
+        self.granted = False
+        self.queued_at = time.monotonic()
+
+
+class LaneScheduler:
+    """Concurrency slots for one upstream, shared by priority lanes"""
+
+    def __init__(self, name: str, capacity: int, reserved: int, weights: Dict[str, float]):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.reserved = min(max(0, reserved), self.capacity - 1)
+        self.weights = {lane: max(0.01, weights.get(lane, 1.0)) for lane in LANES}
+        self.in_use = {lane: 0 for lane in LANES}
+        self.waiting = {lane: deque() for lane in LANES}
+        # Weighted fair queuing: virtual finish tag per lane and the current virtual time
+        self.finish = {lane: 0.0 for lane in LANES}
+        self.virtual_time = 0.0
+        self._cond = threading.Condition()
+
+    def _has_room(self, lane: str) -> bool:
+        if sum(self.in_use.values()) >= self.capacity:
+            return False
+        if lane == INTERACTIVE:
+            return True
+        background = sum(count for other, count in self.in_use.items() if other != INTERACTIVE)
+        return background < self.capacity - self.reserved
+
+    def _dispatch(self):
+        """Grant free slots to queued tickets, lowest virtual finish tag first"""
+        while True:
+            lanes = [lane for lane in LANES if self.waiting[lane] and self._has_room(lane)]
+            if not lanes:
+                return
+            lane = min(lanes, key=lambda name: self.finish[name] + 1 / self.weights[name])
+            self.virtual_time = self.finish[lane]
+            self.finish[lane] += 1 / self.weights[lane]
+            ticket = self.waiting[lane].popleft()
+            ticket.granted = True
+            self.in_use[lane] += 1
+            self._report(lane)
+            self._cond.notify_all()
+
+    def _report(self, lane: str):
+        metrics.set('upstream_queue_depth', 'Calls waiting for an upstream slot',
+                    len(self.waiting[lane]), upstream=self.name, lane=lane)
+        metrics.set('upstream_in_flight', 'Upstream calls in progress',
+                    self.in_use[lane], upstream=self.name, lane=lane)
+
+    def acquire(self, lane: str, timeout: Optional[float] = None):
+        if lane not in self.waiting:
+            raise ValueError(f"Unknown lane {lane!r}; expected one of {', '.join(LANES)}")
+        ticket = _Ticket()
+        with self._cond:
+            if not self.waiting[lane]:
+                # A lane coming back from idle doesn't get credit for the time it was idle
+                self.finish[lane] = max(self.finish[lane], self.virtual_time)
+            self.waiting[lane].append(ticket)
+            self._report(lane)
+            self._dispatch()
+            expires_at = None if timeout is None else ticket.queued_at + timeout
+            while not ticket.granted:
+                remaining = None if expires_at is None else expires_at - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.waiting[lane].remove(ticket)
+                    self._report(lane)
+                    metrics.inc('upstream_queue_timeouts_total', 'Calls that gave up waiting for an upstream slot',
+                                upstream=self.name, lane=lane)
+                    raise QueueTimeout(f"{self.name} {lane} lane: no slot within {timeout:.1f}s")
+                self._cond.wait(remaining)
+        metrics.observe('upstream_queue_wait_seconds', 'Time spent waiting for an upstream slot',
+                        time.monotonic() - ticket.queued_at, upstream=self.name, lane=lane)
+
+    def try_acquire(self, lane: str) -> bool:
+        """Take a slot without waiting, only if one is free and no call is queued for it"""
+        with self._cond:
+            if any(self.waiting.values()) or not self._has_room(lane):
+                return False
+            self.in_use[lane] += 1
+            self._report(lane)
+            return True
+
+    def release(self, lane: str):
+        with self._cond:
+            self.in_use[lane] -= 1
+            self._report(lane)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, lane: str = INTERACTIVE, timeout: Optional[float] = None):
+        """Hold one upstream slot for the ``with`` block, waiting in ``lane``'s queue"""
+        self.acquire(lane, timeout)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            return {lane: {'waiting': len(self.waiting[lane]), 'in_flight': self.in_use[lane]} for lane in LANES}
@@ -1,26 +1,253 @@
 import os
-import requests
+import threading
+import time
 import json
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+from django.conf import settings
+
+from .lazy import lazy_module
+from .metrics import record_upstream_status, stage_timer
+from .normalize import canonicalize_url, jaccard, normalize_text, shingles
+from .resilience import CallAbandoned, CircuitOpenError, get_upstream
+from .scheduler import INTERACTIVE, QueueTimeout
+from .routing import estimate_tokens, model_router, model_stats
+
+# Models to try per extraction before giving up on unparseable answers
+MAX_MODEL_ATTEMPTS = 2
+
+# Pages whose content shingles overlap at least this much count as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Other names departments are commonly listed under, used by fan-out searches
+DEPARTMENT_ALIASES = {
+    'computer science': ['Computing', 'Informatics', 'EECS'],
+    'electrical engineering': ['EECS', 'Electrical and Computer Engineering'],
+    'mathematics': ['Math', 'Applied Mathematics'],
+    'statistics': ['Statistics and Data Science'],
+    'mechanical engineering': ['Mechanical and Aerospace Engineering'],
+    'biology': ['Biological Sciences', 'Life Sciences'],
+    'physics': ['Physics and Astronomy'],
+    'economics': ['Economics and Finance'],
+}
+
+# Below this many seconds there is no point starting another upstream call
+MIN_STAGE_SECONDS = 1.0
+
+requests = lazy_module('requests')
+
+# Keep-alive session per upstream, shared by every thread of the process
+_sessions: Dict[str, Any] = {}
+_sessions_lock = threading.Lock()
+
+
+def upstream_session(upstream: str) -> 'requests.Session':
+    """
+    Pooled HTTP session for an upstream. Threads share it (only the urllib3 pool
+    is mutated; these APIs set no cookies); a forked child builds its own.
+    """
+    pid = os.getpid()
+    entry = _sessions.get(upstream)
+    if entry is None or entry[0] != pid:
+        with _sessions_lock:
+            entry = _sessions.get(upstream)
+            if entry is None or entry[0] != pid:
+                session = requests.Session()
+                # Room for every concurrent call plus its hedge
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=1, pool_maxsize=settings.UPSTREAM_MAX_CONCURRENCY * 2
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                entry = _sessions[upstream] = (pid, session)
+    return entry[1]
+
+
+def _post_json(upstream: str, url: str, headers: Dict[str, str], payload: Dict[str, Any],
+               timeout: float) -> 'requests.Response':
+    """POST a JSON payload to an upstream API, recording latency and status metrics"""
+    with stage_timer(upstream):
+        try:
+            response = upstream_session(upstream).post(url, headers=headers, json=payload, timeout=timeout)
+        except requests.exceptions.Timeout:
+            record_upstream_status(upstream, 'timeout')
+            raise
+        except requests.exceptions.RequestException:
+            record_upstream_status(upstream, 'error')
+            raise
+    record_upstream_status(upstream, str(response.status_code))
+    response.raise_for_status()
+    return response
+
+
+class DeadlineExceeded(CallAbandoned):
+    """Raised when a search has used up its overall time budget"""
+
+
+class Deadline:
+    """Overall time budget for a single search request"""
+    
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+    
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def timeout(self, cap: float) -> float:
+        """
+        Return a timeout for the next stage, bounded by ``cap`` and the remaining budget
+        """
+        remaining = self.remaining()
+        if remaining < MIN_STAGE_SECONDS:
+            raise DeadlineExceeded(f"Only {remaining:.2f}s left of {self.seconds}s budget")
+        return min(cap, remaining)
+    
+    def queue_timeout(self) -> float:
+        """How long a stage may wait for an upstream slot and still have time to run"""
+        return max(0.0, self.remaining() - MIN_STAGE_SECONDS)
+
+
+def _call_upstream(name: str, post, lane: str, deadline: Optional[Deadline]):
+    """
+    Run ``post(timeout)`` through the named upstream's breaker and priority lane.
+    The HTTP timeout is taken once a slot is granted, so queue time counts
+    against the deadline; waiting past it, or being left with less than
+    MIN_STAGE_SECONDS, raises DeadlineExceeded.
+    """
+    try:
+        return get_upstream(name).call(
+            lambda: post(deadline.timeout(30) if deadline else 30),
+            lane=lane,
+            wait_timeout=deadline.queue_timeout() if deadline else None,
+        )
+    except QueueTimeout as e:
+        raise DeadlineExceeded(str(e))
+
 
 class TavilySearchService:
     """Service for searching academic profiles using Tavily API"""
     
-    def __init__(self):
+    def __init__(self, lane: str = INTERACTIVE):
         self.api_key = os.getenv('TAVILY_API_KEY')
-        self.base_url = "https://api.tavily.com/search"
+        self.base_url = settings.TAVILY_API_URL
+        # Scheduler lane for upstream calls ('interactive' or 'bulk')
+        self.lane = lane
+        self.last_fanout_stats = None
+        self.last_error = None
     
     def search_professors(self, country: str, city: str, university: str, 
-                         department: str, skills: str) -> List[Dict[str, Any]]:
+                         department: str, skills: str,
+                         deadline: Optional[Deadline] = None,
+                         fan_out: bool = False) -> List[Dict[str, Any]]:
         """
-        Search for professors using Tavily API
+        Search for professors using Tavily API.
+        
+        With ``fan_out`` several narrower queries (one per skill and per department
+        alias) run concurrently and are merged by canonical URL, dropping duplicate
+        and near-duplicate pages. Overlap details end up in ``self.last_fanout_stats``.
         """
         if not self.api_key:
             raise ValueError("TAVILY_API_KEY not found in environment variables")
         
+        self.last_fanout_stats = None
+        
         # Construct search query
         query = f"professors {skills} {department} {university} {city} {country} email portfolio site:.edu OR site:.ac"
         
+        queries = self.build_query_variants(country, city, university, department, skills) if fan_out else []
+        if len(queries) < 2:
+            results = self._search(query, deadline)
+        else:
+            with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+                variant_results = list(executor.map(lambda q: self._search(q, deadline), queries))
+            
+            results, self.last_fanout_stats = self._merge_variant_results(variant_results)
+            print(f"Tavily fan-out: {self.last_fanout_stats}")
+        
+        self._store_pages(query, {
+            'country': country, 'city': city, 'university': university,
+            'department': department, 'skills': skills, 'fan_out': fan_out,
+        }, results)
+        return results
+    
+    def _store_pages(self, query: str, params: Dict[str, Any], results: List[Dict[str, Any]]):
+        """Keep the fetched pages so extraction can be replayed without searching again"""
+        if not settings.PAGE_STORE_ENABLED or not results:
+            return
+        from .pagestore import page_store
+        
+        with stage_timer('page_store'):
+            page_store.submit_search(query, params, results)
+    
+    def build_query_variants(self, country: str, city: str, university: str,
+                             department: str, skills: str) -> List[str]:
+        """Narrower queries for a fan-out search: one per skill, then per department alias"""
+        skill_list = [skill.strip() for skill in skills.split(',') if skill.strip()] or [skills]
+        departments = [department] + DEPARTMENT_ALIASES.get(normalize_text(department), [])
+        
+        queries = []
+        for skill in skill_list:
+            queries.append(f"professors {skill} {department} {university} {city} {country} email portfolio site:.edu OR site:.ac")
+        for alias in departments[1:]:
+            queries.append(f"professors {skills} {alias} {university} {city} {country} email portfolio site:.edu OR site:.ac")
+        
+        return list(dict.fromkeys(queries))[:settings.TAVILY_FANOUT_MAX_VARIANTS]
+    
+    def _merge_variant_results(self, variant_results: List[List[Dict[str, Any]]]):
+        """
+        Merge per-variant results by canonical URL and drop near-duplicate content.
+        
+        Pages returned by more variants rank first. Returns ``(results, stats)``.
+        """
+        merged = {}
+        variant_urls = []
+        for results in variant_results:
+            urls = set()
+            for rank, result in enumerate(results):
+                url = canonicalize_url(result.get('url', ''))
+                urls.add(url)
+                if url in merged:
+                    merged[url]['hits'] += 1
+                    merged[url]['rank'] = min(merged[url]['rank'], rank)
+                else:
+                    merged[url] = {'result': result, 'hits': 1, 'rank': rank}
+            variant_urls.append(urls)
+        
+        ordered = sorted(merged.values(), key=lambda entry: (-entry['hits'], entry['rank']))
+        
+        kept, kept_shingles, near_duplicates = [], [], 0
+        for entry in ordered:
+            result = entry['result']
+            fingerprint = shingles(result.get('raw_content') or result.get('content', ''))
+            if fingerprint and any(jaccard(fingerprint, other) >= NEAR_DUPLICATE_THRESHOLD
+                                   for other in kept_shingles):
+                near_duplicates += 1
+                continue
+            kept.append(result)
+            kept_shingles.append(fingerprint)
+        
+        overlap = []
+        for i, urls in enumerate(variant_urls):
+            others = set().union(*(u for j, u in enumerate(variant_urls) if j != i))
+            overlap.append(round(len(urls & others) / len(urls), 2) if urls else 0.0)
+        
+        stats = {
+            'variants': len(variant_results),
+            'raw_results': sum(len(results) for results in variant_results),
+            'unique_urls': len(merged),
+            'near_duplicates': near_duplicates,
+            'kept': len(kept),
+            'overlap': overlap,
+        }
+        return kept, stats
+    
+    def _search(self, query: str, deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """Run a single Tavily query"""
         print(f"Tavily search query: {query}")
         
         headers = {
@@ -37,26 +264,40 @@ class TavilySearchService:
             "max_results": 10
         }
         
+        if deadline:
+            deadline.timeout(30)  # fail fast if the budget is already spent
+        
+        def post(timeout):
+            return _post_json('tavily', self.base_url, headers, payload, timeout)
+        
         try:
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
+            response = _call_upstream('tavily', post, self.lane, deadline)
             results = response.json().get('results', [])
             print(f"Tavily returned {len(results)} results")
             return results
         except requests.exceptions.RequestException as e:
             print(f"Tavily API error: {e}")
+            self.last_error = str(e)
             return []
 
 class GroqLLMService:
     """Service for processing search results using Groq LLM"""
     
-    def __init__(self):
+    def __init__(self, lane: str = INTERACTIVE):
         self.api_key = os.getenv('GROQ_API_KEY')
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.base_url = settings.GROQ_API_URL
+        # Scheduler lane for upstream calls ('interactive' or 'bulk')
+        self.lane = lane
+        self.last_error = None
     
-    def extract_professor_info(self, search_results: List[Dict], skills: str) -> List[Dict[str, str]]:
+    def extract_professor_info(self, search_results: List[Dict], skills: str,
+                               deadline: Optional[Deadline] = None,
+                               tier: str = 'balanced') -> List[Dict[str, str]]:
         """
-        Extract structured professor information from search results using Groq LLM
+        Extract structured professor information from search results using Groq LLM.
+        
+        The model and ``max_tokens`` are chosen from the prompt size and latency ``tier``
+        ('fast', 'balanced' or 'thorough').
         """
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
@@ -96,89 +337,169 @@ Return only the JSON array, no other text:
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": "llama3-8b-8192",  # Free tier model
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "You are a precise data extraction assistant. Return only valid JSON arrays with the exact structure requested."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.1,
-            "max_tokens": 2000
-        }
+        messages = [
+            {
+                "role": "system", 
+                "content": "You are a precise data extraction assistant. Return only valid JSON arrays with the exact structure requested."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        prompt_tokens = estimate_tokens(messages[0]['content'] + prompt)
         
-        try:
-            response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
+        # Route to a model for this prompt size; retry once on another model if
+        # the answer can't be parsed
+        tried = []
+        for _ in range(MAX_MODEL_ATTEMPTS):
+            route = model_router.route(prompt_tokens, tier, exclude=tried)
+            if route is None:
+                break
+            model, max_tokens = route
+            tried.append(model)
+            
+            payload = {
+                "model": model,
+                "messages": messages,
+                "temperature": 0.1,
+                "max_tokens": max_tokens
+            }
+            
+            if deadline:
+                deadline.timeout(30)  # fail fast if the budget is already spent
             
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
+            def post(timeout):
+                return _post_json('groq', self.base_url, headers, payload, timeout)
             
-            # Try to parse JSON response - handle cases where LLM adds extra text
+            print(f"Groq model: {model} (tier={tier}, ~{prompt_tokens} prompt tokens, max_tokens={max_tokens})")
+            started = time.monotonic()
             try:
-                # First try direct parsing
-                professors = json.loads(content)
-                if isinstance(professors, list):
-                    return professors
-                else:
-                    print(f"Expected list, got: {type(professors)}")
-                    return []
-            except json.JSONDecodeError:
-                # If direct parsing fails, try to extract JSON from the content
-                try:
-                    # Look for JSON array in the response
-                    start_idx = content.find('[')
-                    end_idx = content.rfind(']')
-                    
-                    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                        json_str = content[start_idx:end_idx + 1]
-                        professors = json.loads(json_str)
-                        if isinstance(professors, list):
-                            print(f"✓ Successfully extracted {len(professors)} professors from LLM response")
-                            return professors
-                    
-                    print(f"Could not extract JSON array from content")
-                    print(f"Raw content: {content}")
-                    return []
-                    
-                except json.JSONDecodeError as e:
-                    print(f"JSON parsing error: {e}")
-                    print(f"Raw content: {content}")
-                    return []
+                response = _call_upstream('groq', post, self.lane, deadline)
+                result = response.json()
+                content = result['choices'][0]['message']['content'].strip()
+            except requests.exceptions.RequestException as e:
+                model_stats.record(model, time.monotonic() - started, 'error')
+                print(f"Groq API error: {e}")
+                self.last_error = str(e)
+                return []
+            
+            with stage_timer('parse'):
+                professors = self._parse_professor_list(content)
+            if professors is not None:
+                model_stats.record(model, time.monotonic() - started, 'success')
+                return professors
+            model_stats.record(model, time.monotonic() - started, 'parse_error')
+        
+        return []
+    
+    def _parse_professor_list(self, content: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Parse the LLM answer into a list of professors, or None if it isn't usable
+        """
+        # Try to parse JSON response - handle cases where LLM adds extra text
+        try:
+            # First try direct parsing
+            professors = json.loads(content)
+            if isinstance(professors, list):
+                return professors
+            else:
+                print(f"Expected list, got: {type(professors)}")
+                return None
+        except json.JSONDecodeError:
+            # If direct parsing fails, try to extract JSON from the content
+            try:
+                # Look for JSON array in the response
+                start_idx = content.find('[')
+                end_idx = content.rfind(']')
                 
-        except requests.exceptions.RequestException as e:
-            print(f"Groq API error: {e}")
-            return []
+                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+                    json_str = content[start_idx:end_idx + 1]
+                    professors = json.loads(json_str)
+                    if isinstance(professors, list):
+                        print(f"✓ Successfully extracted {len(professors)} professors from LLM response")
+                        return professors
+                
+                print(f"Could not extract JSON array from content")
+                print(f"Raw content: {content}")
+                return None
+                
+            except json.JSONDecodeError as e:
+                print(f"JSON parsing error: {e}")
+                print(f"Raw content: {content}")
+                return None
 
 class ProfessorSearchService:
     """Main service combining Tavily search and Groq LLM processing"""
     
-    def __init__(self):
-        self.tavily = TavilySearchService()
-        self.groq = GroqLLMService()
+    def __init__(self, lane: str = INTERACTIVE):
+        # Background jobs pass lane='bulk' so they only use spare upstream capacity
+        self.tavily = TavilySearchService(lane)
+        self.groq = GroqLLMService(lane)
+        # Set when the last search ran out of budget before extraction finished
+        self.partial = False
+        # Set when the last search was skipped because an upstream circuit is open
+        self.degraded = False
+        # Overlap report from the last fan-out search, if any
+        self.fanout_stats = None
+        # Set when an upstream call failed, so an empty result is not a real "no match"
+        self.failed = False
     
     def search_and_extract_professors(self, country: str, city: str, university: str,
-                                    department: str, skills: str) -> List[Dict[str, str]]:
+                                    department: str, skills: str,
+                                    deadline: Optional[Deadline] = None,
+                                    tier: str = 'balanced',
+                                    fan_out: bool = False) -> List[Dict[str, str]]:
         """
-        Complete professor search workflow: search with Tavily and extract with Groq
+        Complete professor search workflow: search with Tavily and extract with Groq.
+        
+        When a ``deadline`` is given each stage only gets the remaining budget, and
+        ``self.partial`` is set if the budget runs out before the LLM finishes.
+        If Tavily or Groq is failing fast behind an open circuit breaker the search
+        is skipped and ``self.degraded`` (and ``self.partial``) are set instead.
         """
+        self.partial = False
+        self.degraded = False
+        self.fanout_stats = None
+        self.failed = False
+        self.tavily.last_error = self.groq.last_error = None
         try:
+            # Don't spend Tavily quota on results Groq can't process right now
+            if get_upstream('groq').breaker.is_open():
+                raise CircuitOpenError("groq circuit is open")
+            
             # Step 1: Search with Tavily
-            search_results = self.tavily.search_professors(country, city, university, department, skills)
+            search_results = self.tavily.search_professors(
+                country, city, university, department, skills, deadline=deadline, fan_out=fan_out
+            )
+            self.fanout_stats = self.tavily.last_fanout_stats
             
             if not search_results:
+                self.partial = bool(deadline and deadline.expired())
+                self.failed = bool(self.tavily.last_error)
                 return []
             
             # Step 2: Extract professor info with Groq
-            professors = self.groq.extract_professor_info(search_results, skills)
+            professors = self.groq.extract_professor_info(
+                search_results, skills, deadline=deadline, tier=tier
+            )
+            
+            if not professors and deadline and deadline.expired():
+                self.partial = True
             
+            self.failed = bool(self.tavily.last_error or self.groq.last_error)
             return professors
             
+        except DeadlineExceeded as e:
+            print(f"Search deadline exceeded: {e}")
+            self.partial = True
+            return []
+        except CircuitOpenError as e:
+            print(f"Upstream unavailable: {e}")
+            self.partial = True
+            self.degraded = True
+            return []
         except Exception as e:
             print(f"Search service error: {e}")
+            self.failed = True
             return []
@@ -0,0 +1,403 @@
+"""
+Django cache backend shared by every worker process, stored in a SQLite file.
+
+Workers open the same WAL-mode file, so a value cached by one worker is seen
+by all of them and survives restarts. Entries carry a namespace (the part of
+the key before the first ':', e.g. 'search' for 'search:empty:...') that
+statistics are kept by. The store is bounded by total bytes and entry count:
+when either limit is passed, expired entries and then the least recently used
+ones are evicted down to LOW_WATER of the limit. Triggers keep the running
+totals, so checking the limits costs one row read per write.
+
+``get_or_set`` with a callable is single-flight across processes: the first
+caller takes a short lease on the key and computes the value while the others
+wait for it instead of computing it too.
+
+Configure with::
+
+    CACHES = {'default': {
+        'BACKEND': 'search.sharedcache.SQLiteCache',
+        'LOCATION': '/path/to/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_BYTES': 256 * 1024 * 1024},
+    }}
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import record_cache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, entries, bytes) VALUES (1, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_resized AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 1;
+END;
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (namespace, stat)
+) WITHOUT ROWID;
+"""
+
+# Eviction frees space down to this fraction of MAX_BYTES / MAX_ENTRIES
+LOW_WATER = 0.9
+STATS = ('hits', 'misses', 'sets', 'evictions')
+
+
+def namespace_of(key: str) -> str:
+    return key.split(':', 1)[0] if ':' in key else 'default'
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = Path(location)
+        self.max_bytes = int(options.get('MAX_BYTES', 256 * 1024 * 1024))
+        # Larger values are not cached at all rather than evicting many small ones
+        self.max_value_bytes = int(options.get('MAX_VALUE_BYTES', 4 * 1024 * 1024))
+        # A hit only rewrites accessed_at if it is older than this, to keep reads read-only
+        self.access_resolution = float(options.get('ACCESS_RESOLUTION_SECONDS', 30))
+        self.lease_seconds = float(options.get('LEASE_SECONDS', 30))
+        self.lease_poll_seconds = float(options.get('LEASE_POLL_SECONDS', 0.05))
+        self.stats_flush_seconds = float(options.get('STATS_FLUSH_SECONDS', 10))
+        self._local = threading.local()
+        self._pending_stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._stats_flushed_at = time.monotonic()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        # A connection inherited across fork() must not be used by the child
+        if connection is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    # Encoding
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(data: bytes):
+        return pickle.loads(data)
+
+    # Statistics
+
+    def _count(self, namespace: str, stat: str, amount: int = 1):
+        if stat in ('hits', 'misses'):
+            record_cache(f'shared:{namespace}', stat == 'hits')
+        with self._stats_lock:
+            self._pending_stats[(namespace, stat)] += amount
+            due = time.monotonic() - self._stats_flushed_at >= self.stats_flush_seconds
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add this process's counters to the shared totals"""
+        with self._stats_lock:
+            pending, self._pending_stats = self._pending_stats, Counter()
+            self._stats_flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            self._connection().executemany(
+                'INSERT INTO stats (namespace, stat, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (namespace, stat) DO UPDATE SET value = value + excluded.value',
+                [(namespace, stat, amount) for (namespace, stat), amount in pending.items()]
+            )
+        except sqlite3.Error as e:
+            print(f"Could not write shared cache stats: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Entries, bytes, hits, misses, sets and evictions per namespace, over all processes"""
+        self.flush_stats()
+        connection = self._connection()
+        result = {}
+        for namespace, entries, size in connection.execute(
+            'SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace'
+        ):
+            result[namespace] = {'entries': entries, 'bytes': size}
+        for namespace, stat, value in connection.execute('SELECT namespace, stat, value FROM stats'):
+            result.setdefault(namespace, {'entries': 0, 'bytes': 0})[stat] = value
+        for counts in result.values():
+            for stat in STATS:
+                counts.setdefault(stat, 0)
+        return result
+
+    def totals(self) -> Dict[str, int]:
+        entries, size = self._connection().execute('SELECT entries, bytes FROM totals WHERE id = 1').fetchone()
+        return {'entries': entries, 'bytes': size, 'max_entries': self._max_entries, 'max_bytes': self.max_bytes}
+
+    # Eviction
+
+    def _over_limit(self, connection) -> bool:
+        entries, size = connection.execute('SELECT entries, bytes FROM totals WHERE id = 1').fetchone()
+        return entries > self._max_entries or size > self.max_bytes
+
+    def _cull(self, connection):
+        """Drop expired entries, then least recently used ones until below LOW_WATER"""
+        evicted = Counter()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            for namespace, count in connection.execute(
+                'SELECT namespace, COUNT(*) FROM entries WHERE expires_at <= ? GROUP BY namespace', (now,)
+            ).fetchall():
+                evicted[namespace] += count
+            connection.execute('DELETE FROM entries WHERE expires_at <= ?', (now,))
+            connection.execute('DELETE FROM leases WHERE expires_at <= ?', (now,))
+
+            entries, size = connection.execute('SELECT entries, bytes FROM totals WHERE id = 1').fetchone()
+            excess_entries = entries - int(self._max_entries * LOW_WATER)
+            excess_bytes = size - int(self.max_bytes * LOW_WATER)
+            if excess_entries > 0 or excess_bytes > 0:
+                victims = []
+                oldest = connection.execute('SELECT key, namespace, size FROM entries ORDER BY accessed_at')
+                for key, namespace, entry_size in oldest:
+                    if excess_entries <= 0 and excess_bytes <= 0:
+                        break
+                    victims.append((key,))
+                    evicted[namespace] += 1
+                    excess_entries -= 1
+                    excess_bytes -= entry_size
+                oldest.close()
+                connection.executemany('DELETE FROM entries WHERE key = ?', victims)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        for namespace, count in evicted.items():
+            self._count(namespace, 'evictions', count)
+
+    def _after_write(self, connection):
+        if self._over_limit(connection):
+            self._cull(connection)
+
+    # Cache API
+
+    def _lookup(self, internal_key: str, missing):
+        """Stored value for ``internal_key``, or ``missing``; not counted in stats"""
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT value, expires_at, accessed_at FROM entries WHERE key = ?', (internal_key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return missing
+        if now - row[2] >= self.access_resolution:
+            connection.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, internal_key))
+        return self._decode(row[0])
+
+    def get(self, key, default=None, version=None):
+        missing = object()
+        value = self._lookup(self.make_and_validate_key(key, version), missing)
+        self._count(namespace_of(key), 'misses' if value is missing else 'hits')
+        return default if value is missing else value
+
+    def get_many(self, keys, version=None):
+        internal_keys = {self.make_and_validate_key(key, version): key for key in keys}
+        if not internal_keys:
+            return {}
+        connection = self._connection()
+        placeholders = ', '.join('?' * len(internal_keys))
+        now = time.time()
+        found = {}
+        stale = []
+        for internal_key, value, expires_at, accessed_at in connection.execute(
+            f'SELECT key, value, expires_at, accessed_at FROM entries WHERE key IN ({placeholders})',
+            list(internal_keys)
+        ):
+            if expires_at is not None and expires_at <= now:
+                continue
+            found[internal_keys[internal_key]] = self._decode(value)
+            if now - accessed_at >= self.access_resolution:
+                stale.append((now, internal_key))
+        if stale:
+            connection.executemany('UPDATE entries SET accessed_at = ? WHERE key = ?', stale)
+        for key in internal_keys.values():
+            self._count(namespace_of(key), 'hits' if key in found else 'misses')
+        return found
+
+    def _write(self, key, value, timeout, version, only_if_missing: bool) -> bool:
+        internal_key = self.make_and_validate_key(key, version)
+        data = self._encode(value)
+        connection = self._connection()
+        if len(data) > self.max_value_bytes:
+            connection.execute('DELETE FROM entries WHERE key = ?', (internal_key,))
+            return False
+        now = time.time()
+        expires_at = self.get_backend_timeout(timeout)
+        sql = (
+            'INSERT INTO entries (key, namespace, value, size, expires_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+            'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at'
+        )
+        params = [internal_key, namespace_of(key), data, len(data), expires_at, now]
+        if only_if_missing:
+            # add(): only replace a row that has already expired
+            sql += ' WHERE entries.expires_at IS NOT NULL AND entries.expires_at <= ?'
+            params.append(now)
+        written = connection.execute(sql, params).rowcount > 0
+        if written:
+            self._count(namespace_of(key), 'sets')
+            self._after_write(connection)
+        return written
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(key, value, timeout, version, only_if_missing=False)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(key, value, timeout, version, only_if_missing=True)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self._write(key, value, timeout, version, only_if_missing=False)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        internal_key = self.make_and_validate_key(key, version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE entries SET expires_at = ?, accessed_at = ? '
+            'WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (self.get_backend_timeout(timeout), now, internal_key, now)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        internal_key = self.make_and_validate_key(key, version)
+        return self._connection().execute('DELETE FROM entries WHERE key = ?', (internal_key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            'DELETE FROM entries WHERE key = ?', [(self.make_and_validate_key(key, version),) for key in keys]
+        )
+
+    def has_key(self, key, version=None):
+        internal_key = self.make_and_validate_key(key, version)
+        return self._connection().execute(
+            'SELECT 1 FROM entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (internal_key, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Atomic across processes: the read and write share one write transaction"""
+        internal_key = self.make_and_validate_key(key, version)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                (internal_key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(row[0]) + delta
+            data = self._encode(value)
+            connection.execute(
+                'UPDATE entries SET value = ?, size = ?, accessed_at = ? WHERE key = ?',
+                (data, len(data), time.time(), internal_key)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def _acquire_lease(self, internal_key: str) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT INTO leases (key, expires_at) VALUES (?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at WHERE leases.expires_at <= ?',
+            (internal_key, now + self.lease_seconds, now)
+        )
+        return cursor.rowcount > 0
+
+    def _release_lease(self, internal_key: str):
+        self._connection().execute('DELETE FROM leases WHERE key = ?', (internal_key,))
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value, or store and return ``default``. A callable
+        default is computed by one caller at a time across all processes;
+        concurrent callers wait (up to LEASE_SECONDS) for its result.
+        """
+        missing = object()
+        value = self.get(key, missing, version)
+        if value is not missing:
+            return value
+        if not callable(default):
+            self.add(key, default, timeout, version)
+            return self.get(key, default, version)
+
+        internal_key = self.make_and_validate_key(key, version)
+        leased = self._acquire_lease(internal_key)
+        give_up_at = time.monotonic() + self.lease_seconds
+        while not leased and time.monotonic() < give_up_at:
+            time.sleep(self.lease_poll_seconds)
+            value = self.get(key, missing, version)
+            if value is not missing:
+                return value
+            leased = self._acquire_lease(internal_key)
+        try:
+            # Another caller may have finished between our miss and taking the lease
+            value = self._lookup(internal_key, missing) if leased else missing
+            if value is missing:
+                value = default()
+                self.set(key, value, timeout, version)
+            return value
+        finally:
+            if leased:
+                self._release_lease(internal_key)
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM entries')
+        connection.execute('DELETE FROM leases')
+
+    def close(self, **kwargs):
+        # Called at the end of every request; connections are kept for reuse
+        if time.monotonic() - self._stats_flushed_at >= self.stats_flush_seconds:
+            self.flush_stats()
@@ -0,0 +1,244 @@
+from collections import Counter
+from functools import partial
+from typing import Iterable, List
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .canonical import canonical_index
+from .changes import CREATED, DELETED, UPDATED, record_changes
+from .hierarchy import PARENT_FIELDS, hierarchy_cache
+from .listcache import bump_generation
+from .models import City, Country, Department, DepartmentAlias, Professor, University, UniversityAlias
+from .similarity import similarity_index
+from .suggest import suggest_index
+
+
+@receiver(post_save, sender=University)
+def university_saved(sender, instance, created, **kwargs):
+    if created:
+        canonical_index.add_university(instance.id, instance.name, instance.city_id)
+    else:
+        canonical_index.invalidate()
+
+
+@receiver(post_save, sender=Department)
+def department_saved(sender, instance, created, **kwargs):
+    if created:
+        canonical_index.add_department(instance.id, instance.name, instance.university_id)
+    else:
+        canonical_index.invalidate()
+
+
+@receiver(post_delete, sender=University)
+@receiver(post_delete, sender=Department)
+@receiver(post_save, sender=UniversityAlias)
+@receiver(post_delete, sender=UniversityAlias)
+@receiver(post_save, sender=DepartmentAlias)
+@receiver(post_delete, sender=DepartmentAlias)
+def canonical_names_changed(sender, **kwargs):
+    canonical_index.invalidate()
+
+
+@receiver(post_save, sender=Professor)
+def professor_saved(sender, instance, **kwargs):
+    try:
+        similarity_index.upsert(instance.id, instance.skills)
+    except Exception as e:
+        print(f"Similarity index update failed for professor {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Professor)
+def professor_deleted(sender, instance, **kwargs):
+    try:
+        similarity_index.remove(instance.id)
+    except Exception as e:
+        print(f"Similarity index update failed for professor {instance.id}: {e}")
+
+
+# How to reach the professors below each kind of location
+PROFESSOR_LOOKUPS = {
+    Country: 'department__university__city__country',
+    City: 'department__university__city',
+    University: 'department__university',
+    Department: 'department',
+}
+
+
+def _location_suggest_count(sender, instance) -> int:
+    """What a location contributes to its name's count: 1 for itself and 1 per professor"""
+    return Professor.objects.filter(**{PROFESSOR_LOOKUPS[sender]: instance}).count() + 1
+
+
+@receiver(pre_save, sender=Country)
+@receiver(pre_save, sender=City)
+@receiver(pre_save, sender=University)
+@receiver(pre_save, sender=Department)
+def location_saving_suggest(sender, instance, **kwargs):
+    # The stored name and parent, so post_save can tell a rename or a move
+    instance._suggest_previous = None
+    if instance.pk is None or not suggest_index.built:
+        return
+    parent = PARENT_FIELDS[sender.__name__.lower()]
+    instance._suggest_previous = sender.objects.filter(pk=instance.pk).values(
+        'name', *([parent] if parent else [])
+    ).first()
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Department)
+def location_saved_suggest(sender, instance, created, **kwargs):
+    field = sender.__name__.lower()
+    if created:
+        suggest_index.add(field, instance.name)
+        return
+    previous = getattr(instance, '_suggest_previous', None)
+    if previous is None or not suggest_index.built:
+        return
+    parent = PARENT_FIELDS[field]
+    if parent and getattr(instance, parent) != previous[parent]:
+        # Moved: every professor below now counts towards other parent names
+        suggest_index.invalidate()
+    elif instance.name != previous['name']:
+        count = _location_suggest_count(sender, instance)
+        suggest_index.discard(field, previous['name'], count)
+        suggest_index.add(field, instance.name, count)
+
+
+@receiver(post_delete, sender=Country)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=University)
+@receiver(post_delete, sender=Department)
+def location_deleted_suggest(sender, instance, **kwargs):
+    # Its professors were deleted first and discarded their own location terms
+    suggest_index.discard(sender.__name__.lower(), instance.name)
+
+
+# Professor fields whose values feed the typeahead index
+SUGGEST_SOURCE_FIELDS = ('name', 'skills', 'department_id')
+
+
+def _suggest_terms(name, skills, department_id) -> Counter:
+    """(field, value) pairs a professor adds to the typeahead index"""
+    terms = Counter({('name', name): 1})
+    terms.update(('skill', skill.strip()) for skill in (skills or '').split(',') if skill.strip())
+    location = hierarchy_cache.path(department_id)
+    if location:
+        terms.update(location.items())
+    return terms
+
+
+@receiver(pre_save, sender=Professor)
+def professor_saving_suggest(sender, instance, **kwargs):
+    # What the index counts for this professor now, so post_save can swap it for the new values
+    instance._suggest_previous = None
+    if instance.pk is None or not suggest_index.built:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if not all(field in loaded for field in SUGGEST_SOURCE_FIELDS):
+        loaded = Professor.objects.filter(pk=instance.pk).values(*SUGGEST_SOURCE_FIELDS).first()
+    if loaded:
+        instance._suggest_previous = _suggest_terms(*(loaded[field] for field in SUGGEST_SOURCE_FIELDS))
+
+
+@receiver(post_save, sender=Professor)
+def professor_saved_suggest(sender, instance, created, **kwargs):
+    current = {field: getattr(instance, field) for field in SUGGEST_SOURCE_FIELDS}
+    previous = Counter() if created else getattr(instance, '_suggest_previous', None)
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **current}
+    if previous is None or not suggest_index.built:
+        return
+    terms = _suggest_terms(*current.values())
+    for (field, value), count in (previous - terms).items():
+        suggest_index.discard(field, value, count)
+    for (field, value), count in (terms - previous).items():
+        suggest_index.add(field, value, count)
+
+
+@receiver(post_delete, sender=Professor)
+def professor_deleted_suggest(sender, instance, **kwargs):
+    terms = _suggest_terms(instance.name, instance.skills, instance.department_id)
+    for (field, value), count in terms.items():
+        suggest_index.discard(field, value, count)
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Department)
+def location_saved_hierarchy(sender, instance, created, using, **kwargs):
+    # Only after commit: the new version stamp makes other processes rebuild,
+    # and they must not rebuild from a database that doesn't show the change yet
+    level = sender.__name__.lower()
+    if created:
+        parent = PARENT_FIELDS[level]
+        update = partial(hierarchy_cache.add, level, instance.id, instance.name,
+                         getattr(instance, parent) if parent else None)
+    else:
+        # Renamed or moved: rebuild rather than patch every lookup
+        update = hierarchy_cache.invalidate
+    transaction.on_commit(update, using=using)
+
+
+@receiver(post_delete, sender=Country)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=University)
+@receiver(post_delete, sender=Department)
+def location_deleted_hierarchy(sender, using, **kwargs):
+    transaction.on_commit(hierarchy_cache.invalidate, using=using)
+
+
+@receiver(post_save, sender=Professor)
+@receiver(post_delete, sender=Professor)
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+@receiver(post_save, sender=University)
+@receiver(post_delete, sender=University)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def listed_data_changed(sender, using, **kwargs):
+    bump_generation(using)
+
+
+@receiver(post_save, sender=Professor)
+def professor_saved_change_log(sender, instance, created, **kwargs):
+    record_changes([instance.id], CREATED if created else UPDATED)
+
+
+@receiver(post_delete, sender=Professor)
+def professor_deleted_change_log(sender, instance, **kwargs):
+    record_changes([instance.id], DELETED)
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=University)
+@receiver(post_save, sender=Department)
+def location_renamed_change_log(sender, instance, created, **kwargs):
+    # Professors carry their location names, so a rename changes every professor below it
+    if created:
+        return
+    record_changes(Professor.objects.filter(**{PROFESSOR_LOOKUPS[sender]: instance}).values_list('id', flat=True))
+
+
+def bulk_update_professors(professors: List[Professor], fields: Iterable[str]):
+    """
+    ``Professor.objects.bulk_update`` plus what post_save would have done for
+    each row, since bulk_update sends no signals: similarity and typeahead
+    index updates, change log entries and a new list cache generation.
+    """
+    if not professors:
+        return
+    for professor in professors:
+        professor_saving_suggest(Professor, professor)
+    Professor.objects.bulk_update(professors, fields)
+    for professor in professors:
+        professor_saved(Professor, professor)
+        professor_saved_suggest(Professor, professor, created=False)
+    record_changes(professor.id for professor in professors)
+    bump_generation()
@@ -0,0 +1,271 @@
+"""
+Skill-similarity search over professors.
+
+Each professor's skills become a feature-hashed vector (whole skill
+phrases plus their words), L2-normalised and stored row by row in memory-mapped
+files, so every worker process maps the same pages. Rows are kept sorted by
+professor id, which makes lookups a binary search and lets new professors be
+appended as they are saved. Queries score rows in batches with a matrix-vector
+product; for large tables an optional random-hyperplane (LSH) signature narrows
+the rows that get scored.
+
+NumPy is an optional dependency: without it the index reports itself unavailable.
+"""
+import json
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from django.conf import settings
+
+from .lazy import lazy_module
+from .normalize import normalize_text
+
+# Optional dependency, imported on first use
+np = lazy_module('numpy', optional=True)
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are serialized
+    fcntl = None
+
+# Rows scored per matrix-vector product
+SCORE_CHUNK_ROWS = 65536
+# Below this many rows an exact scan is already fast enough
+APPROXIMATE_MIN_ROWS = 50000
+# LSH signature width in bits (stored as uint16)
+SIGNATURE_BITS = 16
+PHRASE_WEIGHT = 1.0
+WORD_WEIGHT = 0.5
+
+
+def _hash_feature(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode('utf-8')) % dim
+
+
+class _FileLock:
+    """Exclusive lock shared by all processes writing the index"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl:
+            self._handle = open(self.path, 'a')
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+        self._thread_lock.release()
+
+
+class SimilarityIndex:
+    """Memory-mapped matrix of professor skill vectors"""
+
+    def __init__(self, directory, dim: int):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.count = 0
+        self.capacity = 0
+        self.vectors = self.ids = self.signatures = None
+        self._meta_mtime = None
+        self._planes = None
+        self._popcount = None
+        self._lock = threading.Lock()
+        self._write_lock = _FileLock(self.directory / '.lock')
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def available(self) -> bool:
+        return np is not None and self._path('meta.json').exists()
+
+    def warm(self):
+        """Map the index files ahead of the first query"""
+        if self.available():
+            with self._lock:
+                self._open()
+
+    # Vectors
+
+    def vectorize(self, skills: str):
+        """
+        Feature-hashed, L2-normalised vector for a comma-separated skills string.
+        Hashing is unsigned so bucket collisions add noise but never cancel a real match.
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for phrase in (skills or '').split(','):
+            phrase = normalize_text(phrase)
+            if not phrase:
+                continue
+            vector[_hash_feature('p:' + phrase, self.dim)] += PHRASE_WEIGHT
+            for word in phrase.split():
+                vector[_hash_feature('w:' + word, self.dim)] += WORD_WEIGHT
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _signature(self, vectors):
+        if self._planes is None:
+            self._planes = np.random.default_rng(0).standard_normal((SIGNATURE_BITS, self.dim)).astype(np.float32)
+            self._popcount = np.array([bin(i).count('1') for i in range(1 << SIGNATURE_BITS)], dtype=np.uint8)
+        bits = (np.atleast_2d(vectors) @ self._planes.T) > 0
+        return (bits * (1 << np.arange(SIGNATURE_BITS))).sum(axis=1).astype(np.uint16)
+
+    # Storage
+
+    def _map(self, capacity: int, mode: str, suffix: str = ''):
+        return (
+            np.memmap(self._path('vectors.f32' + suffix), dtype=np.float32, mode=mode, shape=(capacity, self.dim)),
+            np.memmap(self._path('ids.i64' + suffix), dtype=np.int64, mode=mode, shape=(capacity,)),
+            np.memmap(self._path('lsh.u16' + suffix), dtype=np.uint16, mode=mode, shape=(capacity,)),
+        )
+
+    def _write_meta(self):
+        tmp = self._path('meta.json.tmp')
+        tmp.write_text(json.dumps({'count': self.count, 'capacity': self.capacity, 'dim': self.dim}))
+        os.replace(tmp, self._path('meta.json'))
+        self._meta_mtime = self._path('meta.json').stat().st_mtime_ns
+
+    def _open(self):
+        """(Re)map the files if another process changed them since we last looked"""
+        meta_path = self._path('meta.json')
+        mtime = meta_path.stat().st_mtime_ns
+        if mtime == self._meta_mtime:
+            return
+        meta = json.loads(meta_path.read_text())
+        if meta['dim'] != self.dim:
+            raise ValueError(f"Index has dim {meta['dim']}, settings say {self.dim}; rebuild it")
+        self.count, self.capacity = meta['count'], meta['capacity']
+        self.vectors, self.ids, self.signatures = self._map(self.capacity, 'r+')
+        self._meta_mtime = mtime
+
+    def rebuild(self, rows: Iterable[Tuple[int, str]], total: int):
+        """Write a fresh index from ``(professor_id, skills)`` rows ordered by id"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        capacity = max(1024, int(total * 1.25))
+        with self._write_lock, self._lock:
+            vectors, ids, signatures = self._map(capacity, 'w+', suffix='.tmp')
+            count = 0
+            for professor_id, skills in rows:
+                if count == capacity:
+                    break
+                vectors[count] = self.vectorize(skills)
+                ids[count] = professor_id
+                count += 1
+            for start in range(0, count, SCORE_CHUNK_ROWS):
+                end = min(count, start + SCORE_CHUNK_ROWS)
+                signatures[start:end] = self._signature(vectors[start:end])
+            for array in (vectors, ids, signatures):
+                array.flush()
+            del vectors, ids, signatures
+            for name in ('vectors.f32', 'ids.i64', 'lsh.u16'):
+                os.replace(self._path(name + '.tmp'), self._path(name))
+            self.count, self.capacity = count, capacity
+            self.vectors, self.ids, self.signatures = self._map(capacity, 'r+')
+            self._write_meta()
+        return count
+
+    def _grow(self):
+        for array in (self.vectors, self.ids, self.signatures):
+            array.flush()
+        new_capacity = self.capacity * 2
+        for name, itemsize in (('vectors.f32', 4 * self.dim), ('ids.i64', 8), ('lsh.u16', 2)):
+            with open(self._path(name), 'r+b') as handle:
+                handle.truncate(new_capacity * itemsize)
+        self.capacity = new_capacity
+        self.vectors, self.ids, self.signatures = self._map(new_capacity, 'r+')
+
+    def upsert(self, professor_id: int, skills: str):
+        """Add or refresh one professor's row, keeping rows sorted by id"""
+        if not self.available():
+            return
+        vector = self.vectorize(skills)
+        with self._write_lock, self._lock:
+            self._open()
+            position = int(np.searchsorted(self.ids[:self.count], professor_id))
+            if position < self.count and self.ids[position] == professor_id:
+                self.vectors[position] = vector
+                self.signatures[position] = self._signature(vector)[0]
+                return
+            if self.count == self.capacity:
+                self._grow()
+            if position < self.count:
+                # Out-of-order id: shift the tail right by one row
+                end = self.count
+                self.vectors[position + 1:end + 1] = self.vectors[position:end]
+                self.ids[position + 1:end + 1] = self.ids[position:end]
+                self.signatures[position + 1:end + 1] = self.signatures[position:end]
+            self.vectors[position] = vector
+            self.ids[position] = professor_id
+            self.signatures[position] = self._signature(vector)[0]
+            self.count += 1
+            self._write_meta()
+
+    def remove(self, professor_id: int):
+        """Blank a deleted professor's row; it scores 0 and is never returned"""
+        if not self.available():
+            return
+        with self._write_lock, self._lock:
+            self._open()
+            position = int(np.searchsorted(self.ids[:self.count], professor_id))
+            if position < self.count and self.ids[position] == professor_id:
+                self.vectors[position] = 0
+
+    # Queries
+
+    def query(self, vector, limit: int = 10, exclude_ids: Iterable[int] = (),
+              approximate: bool = False) -> List[Tuple[int, float]]:
+        """Return ``(professor_id, cosine score)`` of the most similar rows"""
+        with self._lock:
+            self._open()
+            count, vectors, ids, signatures = self.count, self.vectors, self.ids, self.signatures
+        exclude = set(exclude_ids)
+        wanted = limit + len(exclude)
+
+        if approximate and count >= APPROXIMATE_MIN_ROWS:
+            signature = self._signature(vector)[0]
+            distances = self._popcount[signatures[:count] ^ signature]
+            shortlist = min(count, max(wanted * 50, 2000))
+            rows = np.argpartition(distances, shortlist - 1)[:shortlist]
+            rows.sort()
+            best_rows, best_scores = rows, vectors[rows] @ vector
+        else:
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for start in range(0, count, SCORE_CHUNK_ROWS):
+                scores = vectors[start:min(count, start + SCORE_CHUNK_ROWS)] @ vector
+                if len(scores) > wanted:
+                    top = np.argpartition(scores, -wanted)[-wanted:]
+                else:
+                    top = np.arange(len(scores))
+                best_rows = np.concatenate([best_rows, top + start])
+                best_scores = np.concatenate([best_scores, scores[top]])
+
+        results = []
+        for position in np.argsort(-best_scores):
+            score = float(best_scores[position])
+            professor_id = int(ids[best_rows[position]])
+            if score <= 0 or len(results) == limit:
+                break
+            if professor_id not in exclude:
+                results.append((professor_id, score))
+        return results
+
+    def row_vector(self, professor_id: int):
+        """Stored vector for a professor, or None if the index doesn't have it"""
+        with self._lock:
+            self._open()
+            position = int(np.searchsorted(self.ids[:self.count], professor_id))
+            if position < self.count and self.ids[position] == professor_id:
+                return np.array(self.vectors[position])
+        return None
+
+
+similarity_index = SimilarityIndex(settings.SIMILARITY_INDEX_DIR, settings.SIMILARITY_DIM)
@@ -0,0 +1,169 @@
+"""
+Per-request SQL budgets and the slow-query log.
+
+SQLBudgetMiddleware counts and times every query a request issues. A request
+that goes over its view's budget (SQL_BUDGET_QUERIES queries or
+SQL_BUDGET_SECONDS of query time unless the view says otherwise with
+``@query_budget``), or that runs a single query slower than
+SQL_SLOW_QUERY_SECONDS, is written to the slow-query log: one JSON line with
+the queries grouped by normalized SQL and EXPLAIN QUERY PLAN output for the
+most expensive groups. Within budget only per-statement counts and times are
+kept; full queries and their parameters are captured from the point a request
+goes over budget (and for slow queries), and they supply each group's example
+and plan. With SQL_BUDGET_STRICT the middleware raises
+SQLBudgetExceeded instead of only logging, so tests fail on a regression.
+"""
+import json
+import logging
+import logging.handlers
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?|-?\d+(?:\.\d+)?)\s*,?)+\)', re.IGNORECASE)
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+# Longest repr of example parameters kept per query group
+PARAMS_REPR_CHARS = 300
+
+
+class SQLBudgetExceeded(Exception):
+    """Raised in strict mode when a request goes over its SQL budget"""
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL with literals and parameter lists replaced, so repeats of one statement group together"""
+    sql = _STRING.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _NUMBER.sub('?', sql.replace('%s', '?'))
+    return _SPACE.sub(' ', sql).strip()
+
+
+def query_budget(queries: Optional[int] = None, seconds: Optional[float] = None):
+    """
+    Give a view its own SQL budget instead of the SQL_BUDGET_* defaults. Apply
+    it outermost so the attribute ends up on the function the URLconf routes to.
+    """
+    def decorator(view):
+        view.sql_budget = (queries, seconds)
+        return view
+    return decorator
+
+
+def budget_for(request) -> Tuple[int, float]:
+    """(max queries, max query seconds) for the view that handled ``request``"""
+    queries, seconds = settings.SQL_BUDGET_QUERIES, settings.SQL_BUDGET_SECONDS
+    match = getattr(request, 'resolver_match', None)
+    override = getattr(match.func, 'sql_budget', None) if match else None
+    if override:
+        queries = override[0] if override[0] is not None else queries
+        seconds = override[1] if override[1] is not None else seconds
+    return queries, seconds
+
+
+def explain(alias: str, sql: str, params) -> List[str]:
+    """Query plan lines for a SELECT, or an empty list when it can't be explained"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        return [f'EXPLAIN failed: {e}']
+
+
+def group_queries(statements: Dict[Tuple[str, str], List], queries: List[dict]) -> List[Dict]:
+    """
+    Per-statement ``[count, seconds, max seconds]`` grouped by normalized SQL,
+    most total time first. The slowest of the captured ``queries`` in a group is
+    its example (None if none of its queries were captured).
+    """
+    groups: Dict[Tuple[str, str], Dict] = {}
+    for (alias, sql), (count, seconds, max_seconds) in statements.items():
+        key = (alias, normalize_sql(sql))
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'alias': alias, 'sql': key[1], 'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'example': None,
+            }
+        group['count'] += count
+        group['seconds'] += seconds
+        group['max_seconds'] = max(group['max_seconds'], max_seconds)
+    for query in queries:
+        group = groups[(query['alias'], normalize_sql(query['sql']))]
+        if group['example'] is None or query['seconds'] > group['example']['seconds']:
+            group['example'] = query
+    return sorted(groups.values(), key=lambda group: group['seconds'], reverse=True)
+
+
+class SlowQueryLog:
+    """JSON-lines log of over-budget requests, rotated by size"""
+
+    def __init__(self, path, max_bytes: int, backups: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def _get_logger(self) -> logging.Logger:
+        with self._lock:
+            if self._logger is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8'
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger = logging.getLogger('search.slow_queries')
+                logger.handlers = [handler]
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                self._logger = logger
+        return self._logger
+
+    def record(self, request, response, view: str, statements: Dict[Tuple[str, str], List], queries: List[dict],
+               budget: Tuple[int, float], reasons: List[str]) -> Dict:
+        groups = group_queries(statements, queries)
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': view,
+            'status': response.status_code if response is not None else None,
+            'reasons': reasons,
+            'query_count': sum(count for count, _, _ in statements.values()),
+            'query_seconds': round(sum(seconds for _, seconds, _ in statements.values()), 6),
+            'budget': {'queries': budget[0], 'seconds': budget[1]},
+            'groups': [],
+        }
+        for index, group in enumerate(groups):
+            example = group['example']
+            entry['groups'].append({
+                'alias': group['alias'],
+                'sql': group['sql'],
+                'count': group['count'],
+                'seconds': round(group['seconds'], 6),
+                'max_seconds': round(group['max_seconds'], 6),
+                'example_params': repr(example['params'])[:PARAMS_REPR_CHARS] if example else None,
+                'plan': (explain(group['alias'], example['sql'], example['params'])
+                         if example and index < settings.SQL_SLOW_LOG_EXPLAIN and not example['many'] else []),
+            })
+        try:
+            self._get_logger().info(json.dumps(entry, default=str))
+        except OSError as e:
+            print(f"Could not write slow-query log: {e}")
+        return entry
+
+
+slow_query_log = SlowQueryLog(settings.SQL_SLOW_LOG_PATH, settings.SQL_SLOW_LOG_MAX_MB * 1024 * 1024,
+                              settings.SQL_SLOW_LOG_BACKUPS)
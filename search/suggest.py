@@ -0,0 +1,155 @@
+import bisect
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+from django.db.models import Count
+
+from .models import City, Country, Department, Professor, University
+from .normalize import normalize_text
+
+SUGGEST_FIELDS = ('country', 'city', 'university', 'department', 'skill', 'name')
+
+# Prefixes matching more keys than this get their ranked answer memoized
+MEMO_MIN_RANGE = 256
+# Memoized up front after a bulk load, since one-letter prefixes span the most keys
+WARM_PREFIXES = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+
+class PrefixIndex:
+    """
+    Sorted array of normalized keys with frequency counts for one field.
+
+    Every word start of a term is a key ("institute of technology" finds
+    "Massachusetts Institute of Technology"); a prefix query is a binary search
+    for the key range followed by a top-k by count.
+    """
+
+    def __init__(self):
+        self.keys: List[tuple] = []          # sorted (key, term)
+        self.counts: Dict[str, int] = {}     # term -> frequency
+        self.display: Dict[str, str] = {}    # term -> original spelling
+        self._memo: Dict[str, List[str]] = {}
+
+    @staticmethod
+    def _keys_for(term: str):
+        words = term.split()
+        return [(' '.join(words[i:]), term) for i in range(len(words))]
+
+    def load(self, counts: Dict[str, int]):
+        """Bulk-build from ``{display value: count}``"""
+        for value, count in counts.items():
+            term = normalize_text(value)
+            if not term:
+                continue
+            if term not in self.counts:
+                self.display[term] = value
+                self.keys.extend(self._keys_for(term))
+            self.counts[term] = self.counts.get(term, 0) + count
+        self.keys.sort()
+        self._memo.clear()
+        for prefix in WARM_PREFIXES:
+            self.suggest(prefix)
+
+    def _forget(self, term: str):
+        """Drop memoized answers for prefixes that ``term`` falls under"""
+        keys = [key for key, _ in self._keys_for(term)]
+        for prefix in [p for p in self._memo if any(key.startswith(p) for key in keys)]:
+            del self._memo[prefix]
+
+    def add(self, value: str, count: int = 1):
+        term = normalize_text(value)
+        if not term:
+            return
+        if term not in self.counts:
+            self.display[term] = value
+            self.counts[term] = 0
+            for key in self._keys_for(term):
+                bisect.insort(self.keys, key)
+        self.counts[term] += count
+        self._forget(term)
+
+    def discard(self, value: str, count: int = 1):
+        term = normalize_text(value)
+        if term in self.counts:
+            self.counts[term] = max(0, self.counts[term] - count)
+            self._forget(term)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(self.keys, (prefix,))
+        hi = bisect.bisect_left(self.keys, (prefix + '\uffff',), lo)
+
+        ranked = self._memo.get(prefix)
+        if ranked is None or len(ranked) < limit:
+            terms = {term for _, term in self.keys[lo:hi] if self.counts.get(term)}
+            ranked = heapq.nlargest(limit, terms, key=lambda term: (self.counts[term], term))
+            if hi - lo >= MEMO_MIN_RANGE:
+                self._memo[prefix] = ranked
+        return [{'value': self.display[term], 'count': self.counts[term]} for term in ranked[:limit]]
+
+
+class SuggestIndex:
+    """Prefix indexes for all typeahead fields, built on first use and updated by signals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fields: Optional[Dict[str, PrefixIndex]] = None
+
+    def _build(self) -> Dict[str, PrefixIndex]:
+        fields = {field: PrefixIndex() for field in SUGGEST_FIELDS}
+        location_counts = (
+            ('country', Country, 'cities__universities__departments__professors'),
+            ('city', City, 'universities__departments__professors'),
+            ('university', University, 'departments__professors'),
+            ('department', Department, 'professors'),
+        )
+        for field, model, professors_path in location_counts:
+            counts = Counter()
+            for name, count in model.objects.values_list('name').annotate(n=Count(professors_path)):
+                # Once for the location itself, as signals count it, so ones with no professors
+                # yet still get suggested; then once per professor
+                counts[name] += count + 1
+            fields[field].load(counts)
+
+        skills, names = Counter(), Counter()
+        for name, skill_string in Professor.objects.values_list('name', 'skills').iterator(chunk_size=5000):
+            names[name] += 1
+            skills.update(skill.strip() for skill in skill_string.split(',') if skill.strip())
+        fields['skill'].load(skills)
+        fields['name'].load(names)
+        return fields
+
+    def warm(self):
+        with self._lock:
+            if self._fields is None:
+                self._fields = self._build()
+
+    def suggest(self, field: str, prefix: str, limit: int = 10) -> List[dict]:
+        self.warm()
+        with self._lock:
+            return self._fields[field].suggest(prefix, limit)
+
+    def add(self, field: str, value: str, count: int = 1):
+        with self._lock:
+            if self._fields is not None:
+                self._fields[field].add(value, count)
+
+    def discard(self, field: str, value: str, count: int = 1):
+        with self._lock:
+            if self._fields is not None:
+                self._fields[field].discard(value, count)
+
+    def invalidate(self):
+        with self._lock:
+            self._fields = None
+
+    @property
+    def built(self) -> bool:
+        return self._fields is not None
+
+
+suggest_index = SuggestIndex()
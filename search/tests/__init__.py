@@ -0,0 +1,52 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from search.canonical import canonical_index
+from search.hierarchy import hierarchy_cache
+from search.models import City, Country, Department, University
+from search.similarity import _FileLock, similarity_index
+from search.suggest import suggest_index
+
+# Keeps tests out of the shared on-disk cache (CACHE_PATH)
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_department(department='Computer Science', university='Example University', city='Springfield',
+                      country='Freedonia', code='FRE'):
+    """A department with its whole location chain, reusing rows that already exist"""
+    country_obj, _ = Country.objects.get_or_create(name=country, defaults={'code': code})
+    city_obj, _ = City.objects.get_or_create(name=city, country=country_obj)
+    university_obj, _ = University.objects.get_or_create(name=university, city=city_obj)
+    department_obj, _ = Department.objects.get_or_create(name=department, university=university_obj)
+    return department_obj
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SearchTestCase(TestCase):
+    """
+    TestCase whose process-wide indexes and cache start empty and whose on-disk
+    state (similarity index, hierarchy version stamp) lives in a scratch directory
+    """
+
+    def setUp(self):
+        super().setUp()
+        scratch = tempfile.TemporaryDirectory()
+        self.addCleanup(scratch.cleanup)
+        self.scratch = Path(scratch.name)
+        for target, attribute, value in (
+            (similarity_index, 'directory', self.scratch / 'similarity'),
+            (similarity_index, '_write_lock', _FileLock(self.scratch / 'similarity.lock')),
+            (hierarchy_cache, 'stamp_path', self.scratch / 'hierarchy.version'),
+        ):
+            patcher = mock.patch.object(target, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for index in (canonical_index, hierarchy_cache, suggest_index):
+            index.invalidate()
+            self.addCleanup(index.invalidate)
+        cache.clear()
+        self.addCleanup(cache.clear)
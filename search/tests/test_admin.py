@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+
+from search.admin import EstimatedCountPaginator
+from search.models import CanonicalNameReview, Department, DepartmentAlias, Professor
+
+from . import SearchTestCase, create_department
+
+
+class AdminTestCase(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.edu', 'password'))
+
+
+class CanonicalNameReviewActionTests(AdminTestCase):
+    URL = '/admin/search/canonicalnamereview/'
+
+    def setUp(self):
+        super().setUp()
+        self.target = create_department('Computer Science')
+        self.duplicate = create_department('Comp. Sci.')
+        self.professor = Professor.objects.create(name='Richard Roe', department=self.duplicate)
+        self.review = CanonicalNameReview.objects.create(
+            kind='department', raw_name='Comp. Sci.', score=0.7,
+            department=self.duplicate, suggested_department=self.target,
+        )
+        self.decided = CanonicalNameReview.objects.create(
+            kind='department', raw_name='CS', score=0.6, status='rejected',
+            department=create_department('CS'), suggested_department=self.target,
+        )
+
+    def act(self, action, *reviews):
+        return self.client.post(self.URL, {'action': action, '_selected_action': [r.id for r in reviews]},
+                                follow=True)
+
+    def test_approve_merges_pending_reviews_only(self):
+        response = self.act('approve', self.review, self.decided)
+        self.assertContains(response, 'Approved 1 reviews')
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'approved')
+        self.assertFalse(Department.objects.filter(id=self.duplicate.id).exists())
+        self.professor.refresh_from_db()
+        self.assertEqual(self.professor.department, self.target)
+        self.assertTrue(DepartmentAlias.objects.filter(department=self.target).exists())
+
+        self.decided.refresh_from_db()
+        self.assertEqual(self.decided.status, 'rejected')
+        self.assertTrue(Department.objects.filter(name='CS').exists())
+
+    def test_reject_keeps_the_row(self):
+        approved = CanonicalNameReview.objects.create(kind='department', raw_name='C.S.', score=0.6,
+                                                      status='approved', suggested_department=self.target)
+        response = self.act('reject', self.review, approved)
+        self.assertContains(response, 'Rejected 1 reviews')
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.status, 'rejected')
+        self.assertTrue(Department.objects.filter(id=self.duplicate.id).exists())
+        approved.refresh_from_db()
+        self.assertEqual(approved.status, 'approved')
+
+
+class ChangeListTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        example = create_department()
+        other = create_department('Physics', university='Other University', country='Ruritania', code='RUR')
+        self.professors = [
+            Professor.objects.create(name=f'Researcher {number}', department=example if number % 2 else other)
+            for number in range(6)
+        ]
+
+    def test_unfiltered_count_is_the_table_estimate(self):
+        # MAX(pk) on SQLite: deleted rows below the top id still count
+        Professor.objects.filter(id__in=[p.id for p in self.professors[:3]]).delete()
+        paginator = EstimatedCountPaginator(Professor.objects.all(), 20)
+        self.assertEqual(paginator.count, self.professors[-1].id)
+
+    def test_filtered_count_stops_at_the_cap(self):
+        filtered = Professor.objects.filter(name__startswith='Researcher')
+        self.assertEqual(EstimatedCountPaginator(filtered, 20).count, 6)
+        with mock.patch('search.admin.COUNT_CAP', 2):
+            self.assertEqual(EstimatedCountPaginator(filtered, 20).count, 3)
+
+    def test_name_filters(self):
+        response = self.client.get('/admin/search/professor/', {'university': 'other', 'country': 'rur'})
+        self.assertEqual(response.status_code, 200)
+        names = sorted(p.name for p in response.context['cl'].result_list)
+        self.assertEqual(names, ['Researcher 0', 'Researcher 2', 'Researcher 4'])
+        # The text boxes keep the other active filter as a hidden field
+        self.assertContains(response, '<input type="hidden" name="country" value="rur">')
+
+        response = self.client.get('/admin/search/department/', {'university': 'Example'})
+        self.assertEqual([d.name for d in response.context['cl'].result_list], ['Computer Science'])
@@ -0,0 +1,105 @@
+from search.canonical import ACRONYM, EXACT, FUZZY, SIMILAR, NameIndex, approve_review, resolve_university
+from search.models import (
+    CanonicalNameReview, City, Department, DepartmentAlias, Professor, University, UniversityAlias,
+)
+
+from . import SearchTestCase, create_department
+
+
+class NameIndexTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = NameIndex()
+        self.index.add(1, 'Massachusetts Institute of Technology')
+        self.index.add(2, 'University of Washington')
+
+    def test_match_kinds(self):
+        self.assertEqual(self.index.match('massachusetts institute of technology'), (1, 1.0, EXACT))
+        self.assertEqual(self.index.match('M.I.T.'), (1, 0.9, ACRONYM))
+        self.assertEqual(self.index.match('University of Washingtn')[::2], (2, FUZZY))
+
+    def test_reordered_words_are_only_similar(self):
+        row_id, score, how = self.index.match('Washington University')
+        self.assertEqual((row_id, how), (2, SIMILAR))
+        self.assertGreater(score, 0.85)
+
+
+class ResolveUniversityTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.seattle = create_department(university='University of Washington', city='Seattle').university
+        self.mit = create_department(university='Massachusetts Institute of Technology',
+                                     city='Cambridge').university
+
+    def test_acronym_and_typo_resolve_within_city(self):
+        self.assertEqual(resolve_university('MIT', self.mit.city), self.mit)
+        self.assertEqual(resolve_university('University of Washingtn', self.seattle.city), self.seattle)
+
+    def test_other_city_never_matches(self):
+        other_city = City.objects.create(name='Manipal', country=self.mit.city.country)
+        university = resolve_university('MIT', other_city)
+        self.assertNotEqual(university, self.mit)
+        self.assertEqual(university.city, other_city)
+
+    def test_reordered_name_goes_to_review(self):
+        university = resolve_university('Washington University', self.seattle.city)
+        self.assertNotEqual(university, self.seattle)
+        review = CanonicalNameReview.objects.get(university=university)
+        self.assertEqual(review.suggested_university, self.seattle)
+
+
+class ApproveReviewTests(SearchTestCase):
+    def test_university_merge_merges_departments_and_professors(self):
+        target_cs = create_department('Computer Science', university='University of Washington')
+        target = target_cs.university
+        jane = Professor.objects.create(name='Jane Doe', department=target_cs, skills='AI')
+        duplicate_cs = create_department('Computer Science', university='Univ. of Washington')
+        duplicate = duplicate_cs.university
+        physics = create_department('Physics', university='Univ. of Washington')
+        Professor.objects.create(name='Dr. Jane Doe', department=duplicate_cs, skills='Robotics',
+                                 email='jdoe@uw.edu', portfolio_link='https://uw.edu/~jdoe')
+        roe = Professor.objects.create(name='Richard Roe', department=duplicate_cs, skills='Systems')
+        DepartmentAlias.objects.create(alias='phys', department=physics, university=duplicate)
+        review = CanonicalNameReview.objects.create(
+            kind='university', raw_name=duplicate.name, score=0.8,
+            university=duplicate, suggested_university=target,
+        )
+
+        approve_review(review)
+
+        self.assertFalse(University.objects.filter(id=duplicate.id).exists())
+        self.assertEqual(list(target.departments.filter(name='Computer Science')), [target_cs])
+        physics.refresh_from_db()
+        self.assertEqual(physics.university, target)
+        self.assertEqual(DepartmentAlias.objects.get(alias='phys').university, target)
+        self.assertTrue(UniversityAlias.objects.filter(university=target).exists())
+
+        professors = Professor.objects.filter(department=target_cs)
+        self.assertEqual(sorted(p.id for p in professors), sorted([jane.id, roe.id]))
+        jane.refresh_from_db()
+        self.assertEqual(jane.email, 'jdoe@uw.edu')
+        self.assertEqual(jane.portfolio_link, 'https://uw.edu/~jdoe')
+        self.assertEqual(jane.skills, 'AI, Robotics')
+        review.refresh_from_db()
+        self.assertEqual(review.status, 'approved')
+
+    def test_department_merge_keeps_colliding_professor_details(self):
+        target = create_department('Computer Science')
+        duplicate = create_department('Comp. Sci.')
+        jane = Professor.objects.create(name='Jane Doe', department=target, skills='AI')
+        Professor.objects.create(name='Jane Doe', department=duplicate, skills='Vision', email='jdoe@example.edu')
+        Professor.objects.create(name='Prof. Jane Doe', department=duplicate, skills='Graphics')
+        roe = Professor.objects.create(name='Richard Roe', department=duplicate, skills='Systems')
+        review = CanonicalNameReview.objects.create(
+            kind='department', raw_name='Comp. Sci.', score=0.7,
+            department=duplicate, suggested_department=target,
+        )
+
+        approve_review(review)
+
+        self.assertFalse(Department.objects.filter(id=duplicate.id).exists())
+        self.assertEqual(sorted(target.professors.values_list('id', flat=True)), sorted([jane.id, roe.id]))
+        jane.refresh_from_db()
+        self.assertEqual(jane.email, 'jdoe@example.edu')
+        self.assertEqual(jane.skills, 'AI, Vision, Graphics')
+        self.assertTrue(DepartmentAlias.objects.filter(department=target).exists())
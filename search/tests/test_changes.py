@@ -0,0 +1,109 @@
+from django.core import signing
+from django.test import SimpleTestCase
+
+from search.changes import (CREATED, CURSOR_SALT, DELETED, UPDATED, InvalidCursor, decode_cursor, encode_cursor,
+                            latest_position)
+from search.models import Professor, ProfessorChange
+
+from . import SearchTestCase, create_department
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(42)), 42)
+        self.assertEqual(decode_cursor(None), 0)
+        self.assertEqual(decode_cursor(''), 0)
+
+    def test_rejects_tampered_and_foreign_cursors(self):
+        cursor = encode_cursor(42)
+        value, signature = cursor.rsplit(':', 1)
+        for bad in (
+            f'{signing.dumps(4200, salt=CURSOR_SALT).rsplit(":", 1)[0]}:{signature}',
+            f'{value}:{signature[:-1]}x',
+            signing.dumps(42, salt='another.salt'),
+            signing.dumps(-1, salt=CURSOR_SALT),
+            signing.dumps('42', salt=CURSOR_SALT),
+            'not-a-cursor',
+        ):
+            with self.assertRaises(InvalidCursor, msg=bad):
+                decode_cursor(bad)
+
+
+class ChangeFeedTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department = create_department()
+        ProfessorChange.objects.all().delete()
+
+    def feed(self, cursor=None, limit=None):
+        params = {key: value for key, value in (('cursor', cursor), ('limit', limit)) if value is not None}
+        return self.client.get('/api/changes/', params)
+
+    def create(self, name):
+        return Professor.objects.create(name=name, department=self.department, skills='AI')
+
+    def test_changes_collapse_within_a_page(self):
+        jane = self.create('Jane Doe')
+        jane.skills = 'AI, Robotics'
+        jane.save()
+        richard = self.create('Richard Roe')
+        wei = self.create('Wei Li')
+        wei_id = wei.id
+        wei.delete()
+        richard.name = 'Richard Roe Jr'
+        richard.save()
+
+        data = self.feed().json()
+        self.assertEqual([(change['id'], change['action']) for change in data['changes']],
+                         [(jane.id, CREATED), (wei_id, DELETED), (richard.id, CREATED)])
+        self.assertEqual(data['changes'][0]['professor']['skills'], 'AI, Robotics')
+        self.assertIsNone(data['changes'][1]['professor'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(decode_cursor(data['next_cursor']), latest_position())
+
+        # Nothing new: same cursor back, nothing to apply
+        again = self.feed(data['next_cursor']).json()
+        self.assertEqual((again['changes'], again['next_cursor']), ([], data['next_cursor']))
+
+        jane.name = 'Jane Doe-Smith'
+        jane.save()
+        later = self.feed(data['next_cursor']).json()
+        self.assertEqual([(change['id'], change['action']) for change in later['changes']], [(jane.id, UPDATED)])
+
+    def test_pages_follow_the_cursor(self):
+        ids = [self.create(name).id for name in ('Jane Doe', 'Richard Roe', 'Wei Li')]
+        first = self.feed(limit=2).json()
+        self.assertTrue(first['has_more'])
+        second = self.feed(first['next_cursor'], limit=2).json()
+        self.assertFalse(second['has_more'])
+        self.assertEqual([change['id'] for change in first['changes'] + second['changes']], ids)
+
+    def test_invalid_cursor(self):
+        response = self.feed('tampered:cursor')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+    def test_expired_cursor_asks_for_resync(self):
+        self.create('Jane Doe')
+        stale = self.feed().json()['next_cursor']
+        self.create('Richard Roe')
+        self.create('Wei Li')
+        # Pruning removes everything up to and including the first change after the stale cursor
+        first_unread = ProfessorChange.objects.filter(id__gt=decode_cursor(stale)).order_by('id').first()
+        ProfessorChange.objects.filter(id__lte=first_unread.id).delete()
+
+        response = self.feed(stale)
+        self.assertEqual(response.status_code, 410)
+        resync = response.json()['resync_cursor']
+        self.assertEqual(decode_cursor(resync), latest_position())
+
+        self.create('Ana Silva')
+        data = self.feed(resync).json()
+        self.assertEqual([change['action'] for change in data['changes']], [CREATED])
+
+    def test_cursor_at_oldest_retained_entry_is_not_expired(self):
+        self.create('Jane Doe')
+        cursor = self.feed().json()['next_cursor']
+        self.create('Richard Roe')
+        ProfessorChange.objects.filter(id__lte=decode_cursor(cursor)).delete()
+        self.assertEqual(self.feed(cursor).status_code, 200)
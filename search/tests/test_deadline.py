@@ -0,0 +1,27 @@
+from django.test import SimpleTestCase
+
+from search.resilience import get_upstream
+from search.services import Deadline, DeadlineExceeded, MIN_STAGE_SECONDS, _call_upstream
+from search.views import _deadline_seconds
+
+
+class DeadlineTests(SimpleTestCase):
+    def test_upstream_call_refused_when_budget_nearly_spent(self):
+        calls = []
+        failures = get_upstream('tavily').breaker.failures
+        with self.assertRaises(DeadlineExceeded):
+            _call_upstream('tavily', calls.append, 'interactive', Deadline(MIN_STAGE_SECONDS / 2))
+        self.assertEqual(calls, [])
+        # Running out of time is not the upstream's fault
+        self.assertEqual(get_upstream('tavily').breaker.failures, failures)
+
+    def test_upstream_timeout_bounded_by_deadline(self):
+        timeout = _call_upstream('tavily', lambda seconds: seconds, 'interactive', Deadline(5))
+        self.assertLessEqual(timeout, 5)
+        self.assertEqual(_call_upstream('tavily', lambda seconds: seconds, 'interactive', None), 30)
+
+    def test_client_timeout_must_be_finite_and_positive(self):
+        for value in ('nan', 'inf', '-inf', '0', '-3'):
+            with self.assertRaises(ValueError):
+                _deadline_seconds(value)
+        self.assertEqual(_deadline_seconds('5'), 5.0)
@@ -0,0 +1,105 @@
+from django.test import SimpleTestCase
+
+from search.changes import UPDATED
+from search.dedup import Candidate, find_duplicate_groups, find_matching_professor, merge_groups, score_pair
+from search.models import Professor, ProfessorChange
+
+from . import SearchTestCase, create_department
+
+THRESHOLD = 0.85
+
+
+def candidate(id, name, email='', department_id=1, department_name='Computer Science', university_id=1):
+    return Candidate(id, name, email, department_id, department_name, university_id)
+
+
+class ScorePairTests(SimpleTestCase):
+    def test_personal_email_with_matching_name(self):
+        a = candidate(1, 'Dr. Jane Doe', 'jdoe@uni.edu')
+        b = candidate(2, 'Jane Doe, PhD', 'JDoe@uni.edu', department_id=2, department_name='Biology')
+        self.assertEqual(score_pair(a, b), 1.0)
+
+    def test_shared_email_without_name_match(self):
+        a = candidate(1, 'Jane Doe', 'jdoe@uni.edu')
+        self.assertEqual(score_pair(a, candidate(2, 'Richard Roe', 'jdoe@uni.edu')), 0.0)
+        self.assertLess(score_pair(a, candidate(3, 'John Doe', 'jdoe@uni.edu')), THRESHOLD)
+
+    def test_role_address_carries_no_weight(self):
+        a = candidate(1, 'Jane Doe', 'cs-office@uni.edu')
+        b = candidate(2, 'Jane Doe', 'cs-office@uni.edu', department_id=2, department_name='History')
+        self.assertEqual(a.email, '')
+        self.assertLess(score_pair(a, b), THRESHOLD)
+        self.assertLess(score_pair(candidate(3, 'Jane Smith', 'info@uni.edu'),
+                                   candidate(4, 'Jane Doe', 'info@uni.edu')), THRESHOLD)
+
+    def test_namesakes_in_unrelated_departments(self):
+        a = candidate(1, 'John Smith', department_id=1, department_name='Chemistry')
+        b = candidate(2, 'John Smith', department_id=2, department_name='History')
+        self.assertLess(score_pair(a, b), THRESHOLD)
+
+    def test_same_name_in_related_department(self):
+        a = candidate(1, 'John Smith', department_id=1, department_name='Computer Science')
+        b = candidate(2, 'Prof. John Smith', department_id=2, department_name='Computer Science and Engineering')
+        self.assertGreaterEqual(score_pair(a, b), THRESHOLD)
+
+    def test_initial_alone_is_not_enough(self):
+        self.assertLess(score_pair(candidate(1, 'J. Doe'), candidate(2, 'Jane Doe')), THRESHOLD)
+
+    def test_groups_do_not_chain_through_role_address(self):
+        candidates = [
+            candidate(1, 'Jane Doe', 'cs-office@uni.edu'),
+            candidate(2, 'Richard Roe', 'cs-office@uni.edu'),
+            candidate(3, 'Dr. Richard Roe', 'rroe@uni.edu'),
+        ]
+        self.assertEqual(find_duplicate_groups(candidates, THRESHOLD), [[2, 3]])
+
+
+class MatchAndMergeTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department = create_department()
+
+    def test_surname_key_is_maintained(self):
+        professor = Professor.objects.create(name='Dr. Wei Li, PhD', department=self.department, skills='ai')
+        self.assertEqual(professor.surname_key, 'li')
+        professor.name = 'Wei Zhang'
+        professor.save(update_fields=['name'])
+        professor.refresh_from_db()
+        self.assertEqual(professor.surname_key, 'zhang')
+
+    def test_match_uses_surname_not_substring(self):
+        Professor.objects.create(name='Oliver Smith', department=self.department, skills='ai')
+        self.assertIsNone(find_matching_professor('Li Oliver', '', self.department, THRESHOLD))
+        self.assertIsNone(find_matching_professor('Wei Li', '', self.department, THRESHOLD))
+
+        li = Professor.objects.create(name='Wei Li', department=self.department, skills='ai')
+        self.assertEqual(find_matching_professor('Dr. Wei Li', '', self.department, THRESHOLD), li)
+
+    def test_match_ignores_shared_role_address(self):
+        Professor.objects.create(name='Jane Doe', email='cs-office@example.edu', department=self.department,
+                                 skills='ai')
+        self.assertIsNone(find_matching_professor('Richard Roe', 'cs-office@example.edu', self.department,
+                                                  THRESHOLD))
+
+    def test_merge_keeps_oldest_and_fills_gaps(self):
+        survivor = Professor.objects.create(name='Jane Doe', department=self.department, skills='AI, Robotics')
+        other = create_department('Robotics Institute')
+        duplicate = Professor.objects.create(
+            name='Dr. Jane Doe', department=other, email='jdoe@example.edu',
+            portfolio_link='https://example.edu/~jdoe', skills='robotics, Vision',
+        )
+        ProfessorChange.objects.all().delete()
+
+        self.assertEqual(merge_groups([[survivor.id, duplicate.id]]), 1)
+
+        survivor.refresh_from_db()
+        self.assertFalse(Professor.objects.filter(id=duplicate.id).exists())
+        self.assertEqual(survivor.email, 'jdoe@example.edu')
+        self.assertEqual(survivor.portfolio_link, 'https://example.edu/~jdoe')
+        self.assertEqual(survivor.skills, 'AI, Robotics, Vision')
+        self.assertTrue(ProfessorChange.objects.filter(professor_id=survivor.id, action=UPDATED).exists())
+
+    def test_merge_skips_groups_already_gone(self):
+        professor = Professor.objects.create(name='Jane Doe', department=self.department, skills='ai')
+        self.assertEqual(merge_groups([[professor.id, professor.id + 1000]]), 0)
+        self.assertEqual(merge_groups([]), 0)
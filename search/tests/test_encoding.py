@@ -0,0 +1,108 @@
+import gzip
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from search import encoding
+from search.encoding import negotiate
+from search.middleware import CompressionMiddleware
+from search.models import Professor
+from search.views import COMPACT_FIELDS, LOCATION_FIELDS
+
+from . import SearchTestCase, create_department
+
+FAKE_BROTLI = SimpleNamespace(compress=lambda body, quality: b'br:' + body[:10])
+
+
+class NegotiateTests(SimpleTestCase):
+    def test_with_brotli_available(self):
+        with mock.patch.object(encoding, 'brotli', FAKE_BROTLI):
+            for header, expected in (('gzip, deflate, br', 'br'), ('br;q=0, gzip', 'gzip'),
+                                     ('br;q=0.5, gzip;q=0.8', 'gzip'), ('gzip;q=0.5, br;q=0.5', 'br'),
+                                     ('*', 'br'), ('*;q=0.5, br;q=0', 'gzip'), ('BR', 'br')):
+                self.assertEqual(negotiate(header), expected, header)
+
+    def test_without_brotli(self):
+        with mock.patch.object(encoding, 'brotli', None):
+            for header, expected in (('br', None), ('gzip, br', 'gzip'), ('*', 'gzip'), ('gzip ; q=0.3', 'gzip')):
+                self.assertEqual(negotiate(header), expected, header)
+
+    def test_identity_and_refusals(self):
+        for header in ('', 'identity', 'gzip;q=0', 'gzip;q=0.000', '*;q=0', 'gzip;q=bogus', 'deflate'):
+            self.assertIsNone(negotiate(header), header)
+
+
+@override_settings(RESPONSE_COMPRESSION_ENABLED=True, RESPONSE_COMPRESSION_MIN_BYTES=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def respond(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/api/professors/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        with mock.patch.object(encoding, 'brotli', None):
+            return CompressionMiddleware(lambda request: response)(request)
+
+    def json(self, size):
+        return JsonResponse({'data': 'x' * size})
+
+    def test_large_json_is_gzipped(self):
+        original = self.json(1000)
+        body = original.content
+        original['ETag'] = '"abc"'
+        response = self.respond(original)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_small_bodies_are_sent_as_they_are_but_still_vary(self):
+        response = self.respond(self.json(10))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content), {'data': 'x' * 10})
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_identity_or_refused_encoding(self):
+        for accept_encoding in ('', 'identity', 'gzip;q=0', 'br'):
+            response = self.respond(self.json(1000), accept_encoding)
+            self.assertFalse(response.has_header('Content-Encoding'), accept_encoding)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_already_encoded_streaming_and_non_json_are_untouched(self):
+        encoded = self.json(1000)
+        encoded['Content-Encoding'] = 'br'
+        streaming = StreamingHttpResponse(iter([b'{}'] * 100), content_type='application/json')
+        html = HttpResponse('<p>' + 'x' * 1000 + '</p>')
+        for original in (encoded, streaming, html):
+            response = self.respond(original)
+            self.assertIs(response, original)
+            self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(encoded['Content-Encoding'], 'br')
+        self.assertFalse(streaming.has_header('Content-Encoding'))
+
+    def test_no_transform_is_respected(self):
+        original = self.json(1000)
+        original['Cache-Control'] = 'no-transform'
+        self.assertFalse(self.respond(original).has_header('Content-Encoding'))
+
+
+class CompactFormatTests(SearchTestCase):
+    def test_compact_round_trips_to_the_same_records(self):
+        cs = create_department()
+        physics = create_department('Physics', university='Other University', city='Shelbyville')
+        for name, department in (('Jane Doe', cs), ('Richard Roe', physics), ('Wei Li', cs)):
+            Professor.objects.create(name=name, department=department, skills='AI', email=f'{name[:3]}@x.edu')
+
+        objects = self.client.get('/api/professors/', {'page_size': 10}).json()
+        compact = self.client.get('/api/professors/', {'page_size': 10, 'format': 'compact'}).json()
+
+        columns, dictionaries = compact['columns'], compact['dictionaries']
+        rows = [
+            {**{field: columns[field][i] for field in COMPACT_FIELDS},
+             **{field: dictionaries[field][columns[field][i]] for field in LOCATION_FIELDS}}
+            for i in range(len(columns['id']))
+        ]
+        self.assertEqual(rows, objects['professors'])
+        self.assertEqual(compact['total_count'], objects['total_count'])
+        self.assertEqual(dictionaries['country'], ['Freedonia'])
+        self.assertEqual(sorted(dictionaries['university']), ['Example University', 'Other University'])
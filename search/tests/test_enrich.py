@@ -0,0 +1,184 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from search import enrich
+from search.enrich import PortfolioFetcher, enrich_professors, extract_details, is_public_host, pick_email
+from search.models import Professor
+from search.pagestore import PageStore
+
+from . import SearchTestCase, create_department
+
+ROBOTS = 'User-agent: *\nDisallow: /private/\n'
+ETAG = '"v1"'
+LAST_MODIFIED = 'Mon, 06 Jan 2025 10:00:00 GMT'
+
+
+def portfolio(name):
+    slug = name.split()[-1].lower()
+    return (f'<html><head><meta name="keywords" content="Robotics, Computer Vision"></head>'
+            f'<body><h1>{name}</h1><p>Contact: {slug} [at] example [dot] edu</p></body></html>')
+
+
+class PortfolioHandler(BaseHTTPRequestHandler):
+    """Serves robots.txt and portfolio pages with validators; records what it was asked for"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        try:
+            time.sleep(server.latency)
+            if self.path == '/robots.txt':
+                self._send(200, ROBOTS, 'text/plain')
+            elif self.path == '/redirect-home':
+                self.send_response(302)
+                self.send_header('Location', 'http://169.254.169.254/latest/meta-data/')
+                self.end_headers()
+            elif self.path.startswith('/~'):
+                if self.headers.get('If-None-Match') == ETAG:
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    self._send(200, portfolio(self.path[2:].replace('-', ' ').title()), 'text/html',
+                               ETag=ETAG, **{'Last-Modified': LAST_MODIFIED})
+            else:
+                self._send(404, 'not found', 'text/plain')
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body, content_type, **headers):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalSiteMixin:
+    """A local portfolio site and a scratch page store for the fetcher"""
+
+    def start_site(self, latency=0.0):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PortfolioHandler)
+        server.lock = threading.Lock()
+        server.requests, server.in_flight, server.peak, server.latency = [], 0, 0, latency
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+        self.base = f'http://127.0.0.1:{server.server_address[1]}'
+
+        patcher = mock.patch.object(enrich, 'page_store', PageStore(self.scratch / 'pages.sqlite3', 1024 * 1024))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetcher(self, **options):
+        return PortfolioFetcher(**{'per_host': 1, 'delay': 0, 'timeout': 5, 'allow_private': True,
+                                   'respect_robots': True, **options})
+
+
+class ExtractTests(SimpleTestCase):
+    def test_obfuscated_email_and_keywords(self):
+        details = extract_details(portfolio('Jane Doe'), 'https://example.edu/~jane', 'Dr. Jane Doe')
+        self.assertEqual(details, {'email': 'doe@example.edu', 'skills': 'Robotics, Computer Vision'})
+
+    def test_pick_email_by_name_then_site(self):
+        emails = ['office@cs.example.edu', 'jdoe@gmail.com']
+        self.assertEqual(pick_email(emails, 'Dr. Jane Doe', 'https://cs.example.edu/~jane'), 'jdoe@gmail.com')
+        self.assertEqual(pick_email(['contact@ox.ac.uk'], 'Jane Doe', 'https://cs.ox.ac.uk/people'), 'contact@ox.ac.uk')
+        self.assertEqual(pick_email(['lab@www.example.edu'], 'Jane Doe', 'https://www.example.edu/'),
+                         'lab@www.example.edu')
+
+    def test_pick_email_rejects_other_sites(self):
+        for emails, page_url in ((['office@cam.ac.uk'], 'https://cs.ox.ac.uk/people'),
+                                 (['office@ac.uk'], 'https://cs.ox.ac.uk/people'),
+                                 (['lab@mail.cs.example.edu'], 'https://example.edu/'),
+                                 (['smith@other.edu', 'webmaster@notexample.edu'], 'https://example.edu/'),
+                                 ([], 'https://example.edu/')):
+            self.assertEqual(pick_email(emails, 'Jane Doe', page_url), '', emails)
+
+    def test_non_public_hosts(self):
+        for host in ('localhost', '127.0.0.1', '10.1.2.3', '192.168.0.1', '169.254.169.254', '::1',
+                     '::ffff:127.0.0.1', 'fe80::1', '0.0.0.0', 'no-such-host.invalid'):
+            self.assertFalse(is_public_host(host), host)
+        self.assertTrue(is_public_host('8.8.8.8'))
+
+
+class PortfolioFetcherTests(LocalSiteMixin, SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start_site()
+
+    def test_revalidates_with_etag_and_reuses_on_304(self):
+        fetcher = self.fetcher(cache_hours=0)
+        html, outcome = fetcher.fetch(f'{self.base}/~jane-doe')
+        self.assertEqual(outcome, 'fetched')
+        self.assertEqual(enrich.page_store.get(f'{self.base}/~jane-doe')['last_modified'], LAST_MODIFIED)
+
+        again, outcome = fetcher.fetch(f'{self.base}/~jane-doe')
+        self.assertEqual((again, outcome), (html, 'not_modified'))
+        page_requests = [r for r in self.server.requests if r[0] == '/~jane-doe']
+        self.assertEqual(page_requests, [('/~jane-doe', None), ('/~jane-doe', ETAG)])
+        # robots.txt is fetched once per origin
+        self.assertEqual(sum(path == '/robots.txt' for path, _ in self.server.requests), 1)
+
+    def test_recent_page_is_not_refetched(self):
+        fetcher = self.fetcher()
+        fetcher.fetch(f'{self.base}/~jane-doe')
+        self.assertEqual(fetcher.fetch(f'{self.base}/~jane-doe')[1], 'cached')
+        self.assertEqual(sum(path == '/~jane-doe' for path, _ in self.server.requests), 1)
+
+    def test_robots_disallow(self):
+        self.assertEqual(self.fetcher().fetch(f'{self.base}/private/~jane-doe'), (None, 'robots'))
+        self.assertNotIn('/private/~jane-doe', [path for path, _ in self.server.requests])
+
+    def test_private_hosts_and_redirects_are_refused(self):
+        self.assertEqual(self.fetcher(allow_private=False).fetch(f'{self.base}/~jane-doe'), (None, 'blocked'))
+        self.assertEqual(self.server.requests, [])
+
+        with mock.patch.object(enrich, 'is_public_host', side_effect=lambda host: host == '127.0.0.1'):
+            html, outcome = self.fetcher(allow_private=False).fetch(f'{self.base}/redirect-home')
+        self.assertEqual((html, outcome), (None, 'blocked'))
+
+
+class EnrichProfessorsTests(LocalSiteMixin, SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start_site(latency=0.05)
+        department = create_department()
+        self.professors = [
+            Professor.objects.create(name=name, department=department, skills='AI',
+                                     portfolio_link=f"{self.base}/~{name.lower().replace(' ', '-')}")
+            for name in ('Jane Doe', 'Richard Roe', 'Wei Li', 'Ana Silva', 'Omar Haddad')
+        ]
+
+    def test_per_host_limit_and_batched_updates(self):
+        batches = []
+
+        def bulk_update(professors, fields):
+            batches.append(len(professors))
+            real_bulk_update(professors, fields)
+
+        real_bulk_update = enrich.bulk_update_professors
+        with mock.patch.object(enrich, 'bulk_update_professors', bulk_update):
+            stats = enrich_professors(self.professors, concurrency=5, batch_size=2,
+                                      fetcher=self.fetcher(per_host=2))
+
+        self.assertEqual(self.server.peak, 2)
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual((stats['fetched'], stats['updated'], stats['emails']), (5, 5, 5))
+        wei = Professor.objects.get(name='Wei Li')
+        self.assertEqual(wei.email, 'li@example.edu')
+        self.assertEqual(wei.skills, 'AI, Robotics, Computer Vision')
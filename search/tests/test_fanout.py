@@ -0,0 +1,78 @@
+from django.test import SimpleTestCase, override_settings
+
+from search.services import TavilySearchService
+from search.views import _flag
+
+PAGE = 'Jane Doe is a professor of computer science working on robotics and computer vision at Example University'
+
+
+def result(url, content=''):
+    return {'url': url, 'title': url, 'content': content}
+
+
+class QueryVariantTests(SimpleTestCase):
+    def setUp(self):
+        self.service = TavilySearchService()
+
+    @override_settings(TAVILY_FANOUT_MAX_VARIANTS=10)
+    def test_one_query_per_skill_then_per_department_alias(self):
+        queries = self.service.build_query_variants('US', 'Cambridge', 'MIT', 'Computer Science', 'AI, Robotics, AI')
+        self.assertEqual(len(queries), 2 + 3)
+        self.assertIn('professors AI Computer Science MIT', queries[0])
+        self.assertIn('professors Robotics Computer Science MIT', queries[1])
+        self.assertEqual([q.split(' MIT')[0] for q in queries[2:]],
+                         ['professors AI, Robotics, AI Computing', 'professors AI, Robotics, AI Informatics',
+                          'professors AI, Robotics, AI EECS'])
+
+    @override_settings(TAVILY_FANOUT_MAX_VARIANTS=2)
+    def test_capped(self):
+        self.assertEqual(len(self.service.build_query_variants('US', 'Cambridge', 'MIT', 'Computer Science', 'AI')), 2)
+
+    def test_single_query_without_skills_or_aliases(self):
+        self.assertEqual(len(self.service.build_query_variants('US', 'Cambridge', 'MIT', 'History', 'Rome')), 1)
+
+
+class MergeVariantTests(SimpleTestCase):
+    def setUp(self):
+        self.service = TavilySearchService()
+
+    def test_merges_by_canonical_url_and_ranks_by_hits(self):
+        kept, stats = self.service._merge_variant_results([
+            [result('https://example.edu/~solo'), result('https://www.example.edu/~jane/?utm_source=x#bio')],
+            [result('http://example.edu/~jane')],
+        ])
+        self.assertEqual([r['url'] for r in kept],
+                         ['https://www.example.edu/~jane/?utm_source=x#bio', 'https://example.edu/~solo'])
+        self.assertEqual(stats, {'variants': 2, 'raw_results': 3, 'unique_urls': 2,
+                                 'near_duplicates': 0, 'kept': 2, 'overlap': [0.5, 1.0]})
+
+    def test_drops_near_duplicate_content(self):
+        kept, stats = self.service._merge_variant_results([
+            [result('https://example.edu/people/jane', PAGE)],
+            [result('https://mirror.example.org/jane', PAGE + ' today'),
+             result('https://example.edu/people/richard', 'Richard Roe teaches databases and distributed systems here')],
+        ])
+        self.assertEqual([r['url'] for r in kept],
+                         ['https://example.edu/people/jane', 'https://example.edu/people/richard'])
+        self.assertEqual((stats['unique_urls'], stats['near_duplicates'], stats['kept']), (3, 1, 2))
+
+    def test_pages_without_content_are_kept(self):
+        kept, stats = self.service._merge_variant_results([
+            [result('https://a.example.edu/')], [result('https://b.example.edu/')],
+        ])
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(stats['near_duplicates'], 0)
+
+
+class FlagTests(SimpleTestCase):
+    def test_strict_booleans(self):
+        for value, expected in ((True, True), (False, False), (1, True), (0, False), ('true', True),
+                                ('False', False), ('0', False), ('1', True), (' off ', False), ('yes', True)):
+            self.assertIs(_flag({'fan_out': value}, 'fan_out', not expected), expected, value)
+        self.assertTrue(_flag({}, 'fan_out', True))
+        self.assertFalse(_flag({'fan_out': None}, 'fan_out', False))
+
+    def test_rejects_anything_else(self):
+        for value in ('', 'maybe', 2, 0.5, [], {}):
+            with self.assertRaises(ValueError):
+                _flag({'fan_out': value}, 'fan_out', False)
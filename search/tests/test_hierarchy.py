@@ -0,0 +1,74 @@
+from unittest import mock
+
+from search.hierarchy import hierarchy_cache
+from search.models import Department, Professor
+from search.views import _filter_professors
+
+from . import SearchTestCase, create_department
+
+
+class HierarchyCacheTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department = create_department()
+        hierarchy_cache.warm()
+
+    def stamp(self):
+        return hierarchy_cache._read_stamp()
+
+    def test_new_rows_are_added_only_after_commit(self):
+        university_id = self.department.university_id
+        stamp = self.stamp()
+        with self.captureOnCommitCallbacks() as callbacks:
+            physics = create_department('Physics')
+            # Nothing is published while the transaction is open
+            self.assertIsNone(hierarchy_cache.lookup('department', 'physics', university_id))
+            self.assertEqual(self.stamp(), stamp)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(hierarchy_cache.lookup('department', 'physics', university_id), physics.id)
+        self.assertNotEqual(self.stamp(), stamp)
+        self.assertEqual(hierarchy_cache.version, self.stamp())
+
+    def test_rename_and_delete_invalidate_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.department.name = 'Computing'
+            self.department.save()
+        self.assertEqual(hierarchy_cache.path(self.department.id)['department'], 'Computing')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.department.delete()
+        self.assertIsNone(hierarchy_cache.path(self.department.id))
+
+    def test_other_processes_changes_are_picked_up_on_the_next_stamp_check(self):
+        # A change made elsewhere: no signal here, only a new stamp on disk
+        Department.objects.filter(id=self.department.id).update(name='Informatics')
+        hierarchy_cache.stamp_path.write_text('another-process')
+
+        with mock.patch.object(hierarchy_cache, 'check_seconds', 3600):
+            self.assertEqual(hierarchy_cache.path(self.department.id)['department'], 'Computer Science')
+        with mock.patch.object(hierarchy_cache, 'check_seconds', 0):
+            self.assertEqual(hierarchy_cache.path(self.department.id)['department'], 'Informatics')
+        self.assertEqual(hierarchy_cache.version, 'another-process')
+
+    def test_unchanged_stamp_keeps_the_cached_tree(self):
+        Department.objects.filter(id=self.department.id).update(name='Informatics')
+        with mock.patch.object(hierarchy_cache, 'check_seconds', 0):
+            self.assertEqual(hierarchy_cache.path(self.department.id)['department'], 'Computer Science')
+
+    def test_broad_filters_fall_back_to_joins(self):
+        other = create_department('Physics', university='Other University')
+        hierarchy_cache.invalidate()
+        for name, department in (('Jane Doe', self.department), ('Richard Roe', other)):
+            Professor.objects.create(name=name, department=department)
+
+        with mock.patch('search.hierarchy.MAX_DEPARTMENT_IDS', 1):
+            self.assertIsNone(hierarchy_cache.department_ids(country='Freedonia'))
+            professors = _filter_professors(Professor.objects.all(), country='freedonia')
+            self.assertIn('JOIN', str(professors.query))
+            self.assertEqual(sorted(p.name for p in professors), ['Jane Doe', 'Richard Roe'])
+            self.assertEqual([p.name for p in _filter_professors(Professor.objects.all(), university='other')],
+                             ['Richard Roe'])
+
+        self.assertEqual(hierarchy_cache.department_ids(university='other'), [other.id])
+        self.assertNotIn('JOIN', str(_filter_professors(Professor.objects.all(), university='other').query))
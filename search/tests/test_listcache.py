@@ -0,0 +1,46 @@
+from unittest import mock
+
+from search import views
+from search.listcache import batched_bumps, generation
+from search.models import Professor
+
+from . import SearchTestCase, create_department
+
+
+class GenerationTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department = create_department()
+        self.before = generation()
+
+    def test_bumped_only_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Professor.objects.create(name='Jane Doe', department=self.department)
+            self.assertEqual(generation(), self.before)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(generation(), self.before + 1)
+
+    def test_batched_writes_bump_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with batched_bumps():
+                for name in ('Jane Doe', 'Richard Roe', 'Wei Li'):
+                    Professor.objects.create(name=name, department=self.department)
+                with batched_bumps():
+                    Professor.objects.filter(name='Wei Li').delete()
+                self.assertEqual(generation(), self.before)
+        self.assertEqual(generation(), self.before + 1)
+
+    def test_search_bumps_once_per_request(self):
+        results = [{'name': f'Researcher {number}', 'email': '', 'portfolio_link': '', 'skills': 'Robotics'}
+                   for number in range(3)]
+        body = {'country': 'Freedonia', 'city': 'Springfield', 'university': 'Example University',
+                'department': 'Computer Science', 'skills': 'Robotics', 'local_first': False}
+        with mock.patch.object(views, 'ProfessorSearchService') as service, \
+                self.captureOnCommitCallbacks(execute=True):
+            service.return_value.search_and_extract_professors.return_value = results
+            service.return_value.partial = service.return_value.failed = service.return_value.degraded = False
+            service.return_value.fanout_stats = None
+            response = self.client.post('/api/search/', body, content_type='application/json')
+        self.assertEqual(response.json()['results_found'], 3)
+        self.assertEqual(generation(), self.before + 1)
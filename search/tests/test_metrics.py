@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from search import views
+from search.metrics import Registry
+
+
+class RegistryTests(SimpleTestCase):
+    def test_label_values_and_help_are_escaped(self):
+        registry = Registry()
+        registry.inc('errors_total', 'Errors by path\\kind\nsecond line', path='C:\\tmp\\"x"\nnext')
+        registry.observe('latency_seconds', 'Latency', 0.2, buckets=(0.1, 1.0), view='a"b')
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP errors_total Errors by path\\\\kind\\nsecond line',
+            '# TYPE errors_total counter',
+            'errors_total{path="C:\\\\tmp\\\\\\"x\\"\\nnext"} 1',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{view="a\\"b",le="0.1"} 0',
+            'latency_seconds_bucket{view="a\\"b",le="1.0"} 1',
+            'latency_seconds_bucket{view="a\\"b",le="+Inf"} 1',
+            'latency_seconds_sum{view="a\\"b"} 0.2',
+            'latency_seconds_count{view="a\\"b"} 1',
+        ])
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    @override_settings(METRICS_ENABLED=True)
+    def test_exposition(self):
+        registry = Registry()
+        registry.inc('upstream_responses_total', 'Upstream API responses by status', upstream='tavily', status='200')
+        with mock.patch.object(views, 'metrics', registry), \
+                mock.patch.object(views.model_stats, 'snapshot', return_value={
+                    'llama "fast"': {'success': 2, 'parse_error': 1, 'error': 0, 'avg_latency': 0.5}}):
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        self.assertIn('upstream_responses_total{status="200",upstream="tavily"} 1', lines)
+        self.assertIn('groq_model_calls{model="llama \\"fast\\"",outcome="parse_error"} 1', lines)
+        self.assertIn('groq_model_avg_latency_seconds{model="llama \\"fast\\""} 0.5', lines)
+        self.assertIn('# TYPE groq_model_calls gauge', lines)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
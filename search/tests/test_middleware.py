@@ -0,0 +1,37 @@
+from django.db import OperationalError, connection
+from django.http import JsonResponse
+from django.test import RequestFactory, override_settings
+
+from search.metrics import metrics
+from search.middleware import LOCKED_HEADER, MetricsMiddleware
+from search.models import Professor
+
+from . import SearchTestCase
+
+
+def locked(execute, sql, params, many, context):
+    raise OperationalError('database is locked')
+
+
+@override_settings(METRICS_ENABLED=True)
+class LockErrorTests(SearchTestCase):
+    def test_lock_error_handled_by_view_is_still_reported(self):
+        def view(request):
+            try:
+                with connection.execute_wrapper(locked):
+                    Professor.objects.count()
+            except OperationalError:
+                return JsonResponse({'error': 'Internal error'}, status=500)
+            return JsonResponse({})
+
+        response = MetricsMiddleware(view)(RequestFactory().get('/api/professors/'))
+        self.assertEqual(response[LOCKED_HEADER], '1')
+        self.assertIn('db_locked_errors_total{view="unresolved"}', metrics.render())
+
+    def test_no_header_without_lock_errors(self):
+        def view(request):
+            Professor.objects.count()
+            return JsonResponse({})
+
+        response = MetricsMiddleware(view)(RequestFactory().get('/api/professors/'))
+        self.assertNotIn(LOCKED_HEADER, response)
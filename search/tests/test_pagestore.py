@@ -0,0 +1,45 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from search.pagestore import PageStore
+
+
+def result(url, content):
+    return {'url': url, 'title': url, 'content': content[:20], 'raw_content': content}
+
+
+class PageStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = PageStore(Path(directory.name) / 'pages.sqlite3', 10 * 1024 * 1024)
+
+    def test_submitted_searches_are_written_in_background(self):
+        for number in range(5):
+            self.assertTrue(self.store.submit_search(f'query {number}', {'fan_out': False}, [
+                result('https://example.edu/shared', 'Same body on every search'),
+                result(f'https://example.edu/{number}', f'Page {number}'),
+            ]))
+        self.store.flush()
+
+        stats = self.store.stats()
+        self.assertEqual((stats['searches'], stats['pages'], stats['unique_bodies']), (5, 6, 6))
+        latest = next(self.store.searches(limit=1))
+        self.assertEqual([page['url'] for page in latest['results']],
+                         ['https://example.edu/shared', 'https://example.edu/4'])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        with mock.patch('search.pagestore.WRITE_QUEUE_SIZE', 1), \
+                mock.patch.object(PageStore, '_write_queued'):
+            self.assertTrue(self.store.submit_search('first', {}, [result('https://example.edu/a', 'a')]))
+            self.assertFalse(self.store.submit_search('second', {}, [result('https://example.edu/b', 'b')]))
+
+    def test_forked_process_opens_its_own_connection(self):
+        self.store.put('https://example.edu/a', 'body')
+        inherited = self.store._connection()
+        with mock.patch('search.pagestore.os.getpid', return_value=-1):
+            self.assertIsNot(self.store._connection(), inherited)
+            self.assertEqual(self.store.get('https://example.edu/a')['raw_content'], 'body')
@@ -0,0 +1,38 @@
+import cProfile
+import tempfile
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from search.profiling import ProfileStore
+
+
+class ProfileStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ProfileStore(directory.name, max_profiles=3)
+
+    def capture(self):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        profiler.disable()
+        return self.store.save(profiler, RequestFactory().get('/api/professors/'), HttpResponse(),
+                               'search:list_professors_api', 0.01, [])
+
+    def test_same_view_same_millisecond_gets_distinct_ids(self):
+        with mock.patch('search.profiling.time.time', return_value=1700000000.0):
+            first, second = self.capture(), self.capture()
+        self.assertNotEqual(first, second)
+        self.assertEqual({entry['id'] for entry in self.store.list()}, {first, second})
+        for profile_id in (first, second):
+            self.assertTrue(self.store.path(profile_id, '.prof').exists())
+
+    def test_ring_keeps_newest_and_rejects_foreign_ids(self):
+        ids = [self.capture() for _ in range(5)]
+        self.assertEqual(len(self.store.list()), 3)
+        with self.assertRaises(FileNotFoundError):
+            self.store.path('../../etc/passwd', '.json')
+        with self.assertRaises(FileNotFoundError):
+            self.store.path(ids[-1], '.py')
@@ -0,0 +1,70 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from search.changes import UPDATED
+from search.listcache import generation
+from search.models import Professor, ProfessorChange
+from search.similarity import np, similarity_index
+from search.suggest import suggest_index
+
+from . import SearchTestCase, create_department
+
+
+class RefreshStaleProfessorsTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        department = create_department()
+        self.found = Professor.objects.create(name='Jane Doe', department=department, skills='Robotics')
+        self.missing = Professor.objects.create(name='Richard Roe', department=department, skills='Robotics')
+        long_ago = timezone.now() - timedelta(days=400)
+        Professor.objects.update(created_at=long_ago, updated_at=long_ago)
+        ProfessorChange.objects.all().delete()
+
+    def refresh(self, results, failed=False, degraded=False):
+        with mock.patch('search.management.commands.refresh_stale_professors.ProfessorSearchService') as service, \
+                self.captureOnCommitCallbacks(execute=True):
+            service.return_value.search_and_extract_professors.return_value = results
+            service.return_value.failed, service.return_value.degraded = failed, degraded
+            call_command('refresh_stale_professors', '--concurrency', '1', stdout=StringIO())
+        return service.return_value.search_and_extract_professors.call_count
+
+    def test_refresh_updates_indexes_cache_and_change_log(self):
+        if np is not None:
+            similarity_index.rebuild(iter(Professor.objects.order_by('id').values_list('id', 'skills')), 2)
+        suggest_index.warm()
+        before = generation()
+
+        self.refresh([{'name': 'Dr. Jane Doe', 'email': 'jdoe@example.edu', 'skills': 'Computer Vision'}])
+
+        self.found.refresh_from_db()
+        self.assertEqual(self.found.email, 'jdoe@example.edu')
+        self.assertEqual(self.found.skills, 'Robotics, Computer Vision')
+        self.assertIsNotNone(self.found.last_verified_at)
+        self.assertEqual(list(ProfessorChange.objects.values_list('professor_id', 'action')),
+                         [(self.found.id, UPDATED)])
+        self.assertNotEqual(generation(), before)
+        self.assertEqual([entry['value'] for entry in suggest_index.suggest('skill', 'vision')], ['Computer Vision'])
+        if np is not None:
+            top = similarity_index.query(similarity_index.vectorize('computer vision'), limit=1)
+            self.assertEqual(top[0][0], self.found.id)
+
+    def test_unmatched_professor_backs_off_without_looking_updated(self):
+        self.refresh([])
+        self.missing.refresh_from_db()
+        self.assertIsNotNone(self.missing.refresh_attempted_at)
+        self.assertLess(self.missing.updated_at, timezone.now() - timedelta(days=300))
+        self.assertFalse(ProfessorChange.objects.exists())
+
+        # Searched for moments ago: nothing is stale enough to retry yet
+        self.assertEqual(self.refresh([]), 0)
+
+    def test_failed_or_degraded_search_is_retried_next_run(self):
+        for outcome in ({'failed': True}, {'degraded': True}):
+            self.assertEqual(self.refresh([{'name': 'Jane Doe', 'email': 'jdoe@example.edu'}], **outcome), 1)
+            self.assertFalse(Professor.objects.filter(refresh_attempted_at__isnull=False).exists())
+            self.assertFalse(Professor.objects.filter(last_verified_at__isnull=False).exists())
+            self.assertFalse(ProfessorChange.objects.exists())
@@ -0,0 +1,158 @@
+import threading
+import time
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+
+from search.resilience import CircuitBreaker, CircuitOpenError, Upstream
+from search.scheduler import INTERACTIVE, LaneScheduler
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f'{status} error', response=response)
+
+
+def failing(error):
+    def call():
+        raise error
+    return call
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('search.resilience.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=3, slow_call_seconds=5, reset_timeout=30)
+
+    def test_closed_open_half_open_closed(self):
+        for _ in range(2):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+        self.now += 30
+        self.assertFalse(self.breaker.is_open())
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        # One probe at a time
+        self.assertTrue(self.breaker.is_open())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+        self.breaker.record_success(0.1)
+        self.assertEqual((self.breaker.state, self.breaker.failures), (CircuitBreaker.CLOSED, 0))
+
+    def test_failed_probe_reopens(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 30
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.now += 29
+        self.assertTrue(self.breaker.is_open())
+
+    def test_slow_success_counts_as_failure(self):
+        for _ in range(3):
+            self.breaker.record_success(5)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_success_resets_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success(0.1)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class UpstreamTests(SimpleTestCase):
+    def upstream(self, capacity=4, hedging=False):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+        scheduler = LaneScheduler('test', capacity=capacity, reserved=0, weights={})
+        upstream = Upstream('test', breaker, scheduler, hedging=hedging)
+        for _ in range(upstream.latency.min_samples):
+            upstream.latency.add(0.02)
+        return upstream
+
+    def test_only_availability_errors_open_the_circuit(self):
+        upstream = self.upstream()
+        for status in (400, 401, 404, 400):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                upstream.call(failing(http_error(status)))
+        self.assertEqual(upstream.breaker.state, CircuitBreaker.CLOSED)
+
+        for error in (http_error(503), requests.exceptions.ConnectTimeout()):
+            with self.assertRaises(type(error)):
+                upstream.call(failing(error))
+        self.assertEqual(upstream.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            upstream.call(lambda: 'unreachable')
+
+    def test_rate_limit_and_connection_errors_are_failures(self):
+        upstream = self.upstream()
+        for error in (http_error(429), requests.exceptions.ConnectionError()):
+            with self.assertRaises(type(error)):
+                upstream.call(failing(error))
+        self.assertEqual(upstream.breaker.state, CircuitBreaker.OPEN)
+
+    def test_slow_call_is_hedged_with_a_spare_slot(self):
+        upstream = self.upstream(hedging=True)
+        calls, lock = [], threading.Lock()
+
+        def call():
+            with lock:
+                calls.append(threading.current_thread().name)
+                first = len(calls) == 1
+            time.sleep(1.0 if first else 0)
+            return 'slow' if first else 'hedge'
+
+        started = time.monotonic()
+        self.assertEqual(upstream.call(call), 'hedge')
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual(calls, ['upstream-call', 'upstream-hedge'])
+        # The hedge's slot is given back; the primary's is released with the call
+        self.assertEqual(upstream.scheduler.snapshot()[INTERACTIVE]['in_flight'], 0)
+
+    def test_fast_call_is_not_hedged(self):
+        upstream = self.upstream(hedging=True)
+        calls = []
+        self.assertEqual(upstream.call(lambda: calls.append(1) or 'done'), 'done')
+        self.assertEqual(calls, [1])
+
+    def test_no_hedge_without_a_spare_slot(self):
+        upstream = self.upstream(capacity=1, hedging=True)
+        calls = []
+
+        def call():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'primary'
+
+        self.assertEqual(upstream.call(call), 'primary')
+        self.assertEqual(calls, [1])
+
+    def test_hedge_failure_falls_back_to_primary(self):
+        upstream = self.upstream(hedging=True)
+        calls, lock = [], threading.Lock()
+
+        def call():
+            with lock:
+                calls.append(1)
+                first = len(calls) == 1
+            if first:
+                time.sleep(0.2)
+                return 'primary'
+            raise http_error(502)
+
+        self.assertEqual(upstream.call(call), 'primary')
+        self.assertEqual(len(calls), 2)
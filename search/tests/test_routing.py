@@ -0,0 +1,98 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from search.routing import CONTEXT_MARGIN, MIN_OUTPUT_TOKENS, ModelRouter, ModelStats
+from search.services import MAX_MODEL_ATTEMPTS, GroqLLMService
+
+# Largest prompt an 8192-token model still takes with room for the minimum output
+SMALL_CONTEXT_LIMIT = 8192 - MIN_OUTPUT_TOKENS - CONTEXT_MARGIN
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ModelRouter()
+
+    def test_small_prompt_gets_fastest_model_and_minimum_output(self):
+        self.assertEqual(self.router.route(100, 'fast'), ('llama3-8b-8192', MIN_OUTPUT_TOKENS))
+
+    def test_output_is_half_the_prompt_up_to_the_tier_cap(self):
+        self.assertEqual(self.router.route(2000, 'balanced'), ('llama3-8b-8192', 1000))
+        self.assertEqual(self.router.route(5000, 'balanced'), ('llama3-8b-8192', 2000))
+        self.assertEqual(self.router.route(5000, 'fast'), ('llama3-8b-8192', 1500))
+
+    def test_context_window_boundary(self):
+        # Fits exactly: output shrinks to what the window has left
+        self.assertEqual(self.router.route(SMALL_CONTEXT_LIMIT, 'fast'), ('llama3-8b-8192', MIN_OUTPUT_TOKENS))
+        self.assertEqual(self.router.route(SMALL_CONTEXT_LIMIT + 1, 'fast'), ('llama-3.1-8b-instant', 1500))
+        self.assertEqual(self.router.route(SMALL_CONTEXT_LIMIT, 'thorough'), ('llama3-70b-8192', MIN_OUTPUT_TOKENS))
+        self.assertEqual(self.router.route(SMALL_CONTEXT_LIMIT + 1, 'thorough'),
+                         ('llama-3.3-70b-versatile', 3712))
+
+    def test_falls_back_outside_the_tier(self):
+        excluded = ['llama3-8b-8192', 'llama-3.1-8b-instant']
+        # Smallest-context fallback first, the fast tier's own cap still applies
+        self.assertEqual(self.router.route(100, 'fast', exclude=excluded), ('llama3-70b-8192', MIN_OUTPUT_TOKENS))
+        self.assertEqual(self.router.route(SMALL_CONTEXT_LIMIT + 1, 'fast', exclude=excluded),
+                         ('llama-3.3-70b-versatile', 1500))
+
+    def test_oversized_prompt_uses_largest_context(self):
+        self.assertEqual(self.router.route(200000, 'balanced'), ('llama-3.1-8b-instant', MIN_OUTPUT_TOKENS))
+
+    def test_everything_excluded(self):
+        self.assertIsNone(self.router.route(100, 'fast', exclude=[
+            'llama3-8b-8192', 'llama-3.1-8b-instant', 'llama3-70b-8192', 'llama-3.3-70b-versatile',
+        ]))
+
+
+class ModelStatsTests(SimpleTestCase):
+    def test_snapshot(self):
+        stats = ModelStats()
+        stats.record('a', 1.0, 'success')
+        stats.record('a', 3.0, 'parse_error')
+        snapshot = stats.snapshot()['a']
+        self.assertEqual((snapshot['calls'], snapshot['avg_latency'], snapshot['success_rate']), (2, 2.0, 0.5))
+
+
+class GroqResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return {'choices': [{'message': {'content': self.content}}]}
+
+
+@mock.patch.dict('os.environ', {'GROQ_API_KEY': 'test'})
+class ModelRetryTests(SimpleTestCase):
+    RESULTS = [{'title': 'Jane Doe', 'content': 'Professor of robotics', 'url': 'https://example.edu/jane'}]
+
+    def extract(self, *answers):
+        models = []
+
+        def post_json(upstream, url, headers, payload, timeout):
+            models.append(payload['model'])
+            return GroqResponse(answers[len(models) - 1])
+
+        stats = ModelStats()
+        with mock.patch('search.services._post_json', side_effect=post_json), \
+                mock.patch('search.services.model_stats', stats):
+            professors = GroqLLMService().extract_professor_info(self.RESULTS, 'robotics', tier='fast')
+        return professors, models, stats.snapshot()
+
+    def test_unparseable_answer_is_retried_on_another_model(self):
+        professors, models, stats = self.extract('Sorry, I cannot help.', json.dumps([{'name': 'Jane Doe'}]))
+        self.assertEqual(professors, [{'name': 'Jane Doe'}])
+        self.assertEqual(models, ['llama3-8b-8192', 'llama-3.1-8b-instant'])
+        self.assertEqual(stats['llama3-8b-8192']['parse_error'], 1)
+        self.assertEqual(stats['llama-3.1-8b-instant']['success'], 1)
+
+    def test_json_wrapped_in_text_is_accepted(self):
+        professors, models, _ = self.extract('Here you go: [{"name": "Jane Doe"}] Hope it helps')
+        self.assertEqual((professors, len(models)), ([{'name': 'Jane Doe'}], 1))
+
+    def test_gives_up_after_max_attempts(self):
+        professors, models, _ = self.extract(*['not json'] * (MAX_MODEL_ATTEMPTS + 1))
+        self.assertEqual(professors, [])
+        self.assertEqual(len(models), MAX_MODEL_ATTEMPTS)
+        self.assertEqual(len(set(models)), MAX_MODEL_ATTEMPTS)
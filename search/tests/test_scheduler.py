@@ -0,0 +1,82 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from search.scheduler import BULK, INTERACTIVE, LaneScheduler, QueueTimeout
+
+
+class LaneSchedulerTests(SimpleTestCase):
+    def wait_for(self, scheduler, lane, waiting):
+        deadline = time.monotonic() + 5
+        while scheduler.snapshot()[lane]['waiting'] != waiting:
+            self.assertLess(time.monotonic(), deadline, f'{lane} queue never reached {waiting}')
+            time.sleep(0.001)
+
+    def test_bulk_cannot_take_reserved_slots(self):
+        scheduler = LaneScheduler('test', capacity=3, reserved=1, weights={})
+        scheduler.acquire(BULK)
+        scheduler.acquire(BULK)
+        with self.assertRaises(QueueTimeout):
+            scheduler.acquire(BULK, timeout=0.05)
+        self.assertEqual(scheduler.snapshot()[BULK], {'waiting': 0, 'in_flight': 2})
+
+        # The reserved slot is still there for a user's search
+        with scheduler.slot(INTERACTIVE, timeout=0.05):
+            self.assertEqual(scheduler.snapshot()[INTERACTIVE]['in_flight'], 1)
+            with self.assertRaises(QueueTimeout):
+                scheduler.acquire(INTERACTIVE, timeout=0.05)
+
+    def test_interactive_can_use_every_slot(self):
+        scheduler = LaneScheduler('test', capacity=2, reserved=1, weights={})
+        scheduler.acquire(INTERACTIVE)
+        scheduler.acquire(INTERACTIVE, timeout=0.05)
+        self.assertEqual(scheduler.snapshot()[INTERACTIVE]['in_flight'], 2)
+
+    def test_weighted_fair_order(self):
+        scheduler = LaneScheduler('test', capacity=1, reserved=0, weights={INTERACTIVE: 3, BULK: 1})
+        granted = []
+
+        def call(lane):
+            with scheduler.slot(lane, timeout=5):
+                granted.append(lane)
+
+        scheduler.acquire(INTERACTIVE)
+        threads = []
+        for lane, count in ((BULK, 4), (INTERACTIVE, 12)):
+            for _ in range(count):
+                thread = threading.Thread(target=call, args=(lane,))
+                thread.start()
+                threads.append(thread)
+            self.wait_for(scheduler, lane, count)
+        scheduler.release(INTERACTIVE)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(granted), 16)
+        # Three interactive turns per bulk turn while both lanes are queued, and bulk is never starved
+        for start in range(0, 16, 4):
+            self.assertEqual(granted[start:start + 4].count(BULK), 1, granted)
+
+    def test_idle_lane_gets_no_credit(self):
+        scheduler = LaneScheduler('test', capacity=1, reserved=0, weights={INTERACTIVE: 1, BULK: 1})
+        granted = []
+
+        def call(lane):
+            with scheduler.slot(lane, timeout=5):
+                granted.append(lane)
+
+        # Interactive runs alone for a while; bulk then arrives and must not get a burst of turns
+        for _ in range(10):
+            call(INTERACTIVE)
+        scheduler.acquire(INTERACTIVE)
+        threads = [threading.Thread(target=call, args=(lane,)) for lane in (BULK,) * 3 + (INTERACTIVE,) * 3]
+        for number, thread in enumerate(threads):
+            thread.start()
+            lane = BULK if number < 3 else INTERACTIVE
+            self.wait_for(scheduler, lane, number % 3 + 1)
+        scheduler.release(INTERACTIVE)
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(granted[10:], [BULK, INTERACTIVE, BULK, INTERACTIVE, BULK, INTERACTIVE])
@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from search import views
+from search.models import Professor
+
+from . import SearchTestCase, create_department
+
+BODY = {'country': 'Freedonia', 'city': 'Springfield', 'university': 'Example University',
+        'department': 'Computer Science', 'skills': 'Robotics'}
+
+
+@override_settings(SEARCH_LOCAL_FIRST=False, SEARCH_LOCAL_MIN_RESULTS=2, SEARCH_NEGATIVE_CACHE_TTL=600)
+class SearchApiTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(views, 'ProfessorSearchService')
+        self.service_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        service = self.service_class.return_value
+        service.search_and_extract_professors.return_value = []
+        service.partial = service.failed = service.degraded = False
+        service.fanout_stats = None
+
+    def search(self, **fields):
+        response = self.client.post('/api/search/', {**BODY, **fields}, content_type='application/json')
+        return response.status_code, response.json()
+
+    def upstream_calls(self):
+        return self.service_class.return_value.search_and_extract_professors.call_count
+
+    def test_empty_outcome_is_negatively_cached_until_it_expires(self):
+        self.assertEqual(self.search()[1]['source'], 'upstream')
+        status, data = self.search()
+        self.assertEqual((status, data['source']), (200, 'negative_cache'))
+        self.assertEqual(self.upstream_calls(), 1)
+
+        later = time.time() + 601
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.search()[1]['source'], 'upstream')
+        self.assertEqual(self.upstream_calls(), 2)
+
+    def test_failed_upstream_is_not_negatively_cached(self):
+        self.service_class.return_value.failed = True
+        self.search()
+        self.assertEqual(self.search()[1]['source'], 'upstream')
+        self.assertEqual(self.upstream_calls(), 2)
+
+    def test_local_first_answers_from_fresh_stored_professors(self):
+        department = create_department()
+        for name in ('Jane Doe', 'Richard Roe'):
+            Professor.objects.create(name=name, department=department, skills='Robotics',
+                                     last_verified_at=timezone.now())
+        status, data = self.search(local_first='true')
+        self.assertEqual((status, data['source'], data['results_found']), (200, 'local', 2))
+        self.assertEqual(self.upstream_calls(), 0)
+
+    def test_local_first_goes_upstream_when_stored_professors_are_stale(self):
+        department = create_department()
+        for name in ('Jane Doe', 'Richard Roe'):
+            Professor.objects.create(name=name, department=department, skills='Robotics',
+                                     last_verified_at=timezone.now() - timedelta(days=365))
+        self.assertEqual(self.search(local_first=True)[1]['source'], 'upstream')
+        self.assertEqual(self.upstream_calls(), 1)
+
+    def test_false_strings_do_not_enable_options(self):
+        department = create_department()
+        for name in ('Jane Doe', 'Richard Roe'):
+            Professor.objects.create(name=name, department=department, skills='Robotics',
+                                     last_verified_at=timezone.now())
+        self.assertEqual(self.search(local_first='false', fan_out='0')[1]['source'], 'upstream')
+        self.assertIs(self.service_class.return_value.search_and_extract_professors.call_args.kwargs['fan_out'], False)
+
+        status, data = self.search(local_first='sometimes')
+        self.assertEqual((status, data['error']), (400, 'local_first must be true or false'))
@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from search.sharedcache import SQLiteCache
+
+WORKERS = 4
+INCREMENTS = 150
+
+
+def open_cache(path, **options):
+    return SQLiteCache(path, {'OPTIONS': {'LEASE_POLL_SECONDS': 0.01, **options}})
+
+
+def increment(cache):
+    for _ in range(INCREMENTS):
+        cache.incr('counter')
+
+
+def compute_once(args):
+    path, log = args
+    cache = open_cache(path)
+
+    def compute():
+        with open(log, 'a') as handle:
+            handle.write(f'{os.getpid()}\n')
+        time.sleep(0.5)
+        return f'computed by {os.getpid()}'
+
+    return cache.get_or_set('report', compute, timeout=60)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.path = str(self.directory / 'cache.sqlite3')
+        # fork, like a pre-forking server: children inherit the parent's cache object and connection
+        self.context = multiprocessing.get_context('fork')
+
+    def test_incr_is_atomic_across_processes(self):
+        cache = open_cache(self.path)
+        cache.set('counter', 0)
+        processes = [self.context.Process(target=increment, args=(cache,)) for _ in range(WORKERS)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(cache.get('counter'), WORKERS * INCREMENTS)
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            open_cache(self.path).incr('missing')
+
+    def test_get_or_set_computes_once_across_processes(self):
+        log = self.directory / 'computed.log'
+        open_cache(self.path).clear()
+        with self.context.Pool(WORKERS) as pool:
+            values = pool.map(compute_once, [(self.path, str(log))] * WORKERS)
+
+        computed_by = log.read_text().split()
+        self.assertEqual(len(computed_by), 1)
+        self.assertEqual(set(values), {f'computed by {computed_by[0]}'})
+
+    def test_lease_of_crashed_holder_expires(self):
+        cache = open_cache(self.path, LEASE_SECONDS=0.2)
+        internal_key = cache.make_and_validate_key('report')
+        self.assertTrue(cache._acquire_lease(internal_key))
+        self.assertFalse(cache._acquire_lease(internal_key))
+
+        started = time.monotonic()
+        self.assertEqual(cache.get_or_set('report', lambda: 'fresh'), 'fresh')
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(cache.get('report'), 'fresh')
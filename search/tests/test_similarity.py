@@ -0,0 +1,78 @@
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from search.similarity import SimilarityIndex, np
+
+SKILLS = ['machine learning', 'computer vision', 'robotics', 'databases', 'distributed systems',
+          'compilers', 'cryptography', 'graph theory', 'bioinformatics', 'natural language processing',
+          'reinforcement learning', 'computer graphics', 'operating systems', 'quantum computing',
+          'human computer interaction', 'signal processing', 'control theory', 'optimization',
+          'statistics', 'information retrieval', 'networking', 'programming languages', 'security',
+          'data mining', 'algorithms', 'formal methods', 'software engineering', 'game theory']
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class SimilarityIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.index = SimilarityIndex(self.directory, 256)
+
+    def test_rebuild_and_query(self):
+        rows = [(1, 'Machine Learning, Robotics'), (2, 'Databases'), (3, 'machine learning, computer vision')]
+        self.assertEqual(self.index.rebuild(iter(rows), len(rows)), 3)
+
+        results = self.index.query(self.index.vectorize('machine learning'), limit=2)
+        self.assertEqual({professor_id for professor_id, _ in results}, {1, 3})
+        self.assertEqual(self.index.query(self.index.row_vector(2), limit=1)[0][0], 2)
+        self.assertNotIn(1, [p for p, _ in self.index.query(self.index.vectorize('robotics'), exclude_ids=[1])])
+
+    def test_upsert_keeps_rows_sorted_and_grows(self):
+        self.index.rebuild(iter([(10, 'robotics')]), 1)
+        capacity = self.index.capacity
+        for professor_id in range(capacity + 20, 10, -1):
+            self.index.upsert(professor_id, SKILLS[professor_id % len(SKILLS)])
+        self.index.upsert(5, 'cryptography')
+        self.index.upsert(10, 'databases')
+
+        self.assertGreater(self.index.capacity, capacity)
+        ids = list(self.index.ids[:self.index.count])
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertAlmostEqual(self.index.query(self.index.vectorize('databases'), limit=1)[0][1], 1.0, places=5)
+        self.assertAlmostEqual(float(self.index.row_vector(10) @ self.index.vectorize('databases')), 1.0, places=5)
+
+    def test_remove_and_other_process_sees_changes(self):
+        self.index.rebuild(iter([(1, 'robotics'), (2, 'compilers')]), 2)
+        other = SimilarityIndex(self.directory, 256)
+        self.assertEqual(other.query(other.vectorize('compilers'), limit=1)[0][0], 2)
+
+        self.index.upsert(3, 'compilers, security')
+        self.index.remove(2)
+        self.assertEqual([p for p, _ in other.query(other.vectorize('compilers'))], [3])
+
+    def test_dimension_mismatch_requires_rebuild(self):
+        self.index.rebuild(iter([(1, 'robotics')]), 1)
+        with self.assertRaises(ValueError):
+            SimilarityIndex(self.directory, 128).query(np.zeros(128, dtype=np.float32))
+
+    def test_approximate_recall(self):
+        rng = random.Random(0)
+        rows = [(professor_id, ', '.join(rng.sample(SKILLS, rng.randint(1, 4))))
+                for professor_id in range(1, 6001)]
+        self.index.rebuild(iter(rows), len(rows))
+
+        recalls = []
+        with mock.patch('search.similarity.APPROXIMATE_MIN_ROWS', 0):
+            for _ in range(20):
+                vector = self.index.vectorize(', '.join(rng.sample(SKILLS, 2)))
+                exact = {score for _, score in self.index.query(vector, limit=10)}
+                approximate = {score for _, score in self.index.query(vector, limit=10, approximate=True)}
+                # Compare scores, not ids: many rows tie with identical skill sets
+                recalls.append(len(exact & approximate) / len(exact))
+        self.assertGreaterEqual(sum(recalls) / len(recalls), 0.9)
@@ -0,0 +1,90 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from search import views
+from search.middleware import BudgetCollector
+from search.models import Professor
+from search.sqlbudget import SQLBudgetExceeded, normalize_sql, slow_query_log
+
+from . import SearchTestCase, create_department
+
+STRICT = {'SQL_BUDGET_ENABLED': True, 'SQL_BUDGET_STRICT': True, 'SQL_SLOW_QUERY_SECONDS': 60}
+
+
+class NormalizeSQLTests(SimpleTestCase):
+    def test_literals_and_lists_fold_together(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 5 AND b IN (%s, %s, %s) AND c = 'x'"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ?',
+        )
+
+
+class SQLBudgetTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department = create_department()
+        for name in ('Jane Doe', 'Richard Roe', 'Wei Li'):
+            Professor.objects.create(name=name, department=self.department, skills='Robotics')
+        for attribute, value in (('path', self.scratch / 'slow_queries.log'), ('_logger', None)):
+            patcher = mock.patch.object(slow_query_log, attribute, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def log_entries(self):
+        if not slow_query_log.path.exists():
+            return []
+        return [json.loads(line) for line in slow_query_log.path.read_text().splitlines()]
+
+    @override_settings(SQL_BUDGET_QUERIES=1, **STRICT)
+    def test_strict_list_over_budget_raises(self):
+        with self.assertRaisesMessage(SQLBudgetExceeded, 'search:list_professors_api'):
+            self.client.get('/api/professors/')
+        entry, = self.log_entries()
+        self.assertGreater(entry['query_count'], 1)
+        self.assertTrue(any(group['plan'] for group in entry['groups']))
+
+    @override_settings(SQL_BUDGET_QUERIES=50, **STRICT)
+    def test_strict_list_within_budget(self):
+        self.assertEqual(self.client.get('/api/professors/').status_code, 200)
+        self.assertEqual(self.log_entries(), [])
+
+    @override_settings(**STRICT)
+    def test_strict_search_over_its_own_budget_raises(self):
+        results = [{'name': f'Researcher {number}', 'email': '', 'portfolio_link': '',
+                    'department': 'Computer Science', 'university': 'Example University', 'skills': 'Robotics'}
+                   for number in range(3)]
+        body = {'country': 'Freedonia', 'city': 'Springfield', 'university': 'Example University',
+                'department': 'Computer Science', 'skills': 'Robotics', 'local_first': False}
+        with mock.patch.object(views, 'ProfessorSearchService') as service, \
+                mock.patch.object(views.search_professors_api, 'sql_budget', (5, None)):
+            service.return_value.search_and_extract_professors.return_value = results
+            service.return_value.partial = service.return_value.failed = False
+            service.return_value.fanout_stats = None
+            with self.assertRaisesMessage(SQLBudgetExceeded, 'search:search_api'):
+                self.client.post('/api/search/', body, content_type='application/json')
+        self.assertEqual(Professor.objects.filter(name__startswith='Researcher').count(), 3)
+
+    @override_settings(SQL_BUDGET_QUERIES=2, SQL_BUDGET_SECONDS=60, SQL_SLOW_QUERY_SECONDS=60)
+    def test_sql_is_captured_only_past_the_budget(self):
+        request = RequestFactory().get('/api/professors/')
+        collector = BudgetCollector(request)
+        with connection.execute_wrapper(collector):
+            Professor.objects.count()
+            Professor.objects.count()
+            self.assertEqual((collector.count, collector.queries), (2, []))
+            professors = list(Professor.objects.all())
+            for professor in professors:
+                professor.department
+        self.assertTrue(collector.over_budget)
+        self.assertEqual(len(collector.queries), 4)
+        self.assertEqual(sum(count for count, _, _ in collector.statements.values()), 6)
+
+        entry = slow_query_log.record(request, None, 'test', collector.statements, collector.queries,
+                                      collector.budget(), ['over budget'])
+        counts = sorted(group['count'] for group in entry['groups'])
+        self.assertEqual((entry['query_count'], counts), (6, [1, 2, 3]))
+        count_group = next(group for group in entry['groups'] if group['count'] == 2)
+        self.assertEqual((count_group['example_params'], count_group['plan']), (None, []))
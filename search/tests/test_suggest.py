@@ -0,0 +1,92 @@
+from search.canonical import approve_review
+from search.models import CanonicalNameReview, Department, Professor
+from search.suggest import suggest_index
+
+from . import SearchTestCase, create_department
+
+
+def counts(field, prefix):
+    return {entry['value']: entry['count'] for entry in suggest_index.suggest(field, prefix)}
+
+
+class SuggestSignalTests(SearchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.department = create_department('Computer Science', university='Example University')
+        self.physics = create_department('Physics', university='Example University')
+        suggest_index.warm()
+
+    def test_create_and_delete_mirror_each_other(self):
+        before = counts('department', 'computer')
+        professor = Professor.objects.create(name='Jane Doe', department=self.department, skills='Robotics, AI')
+        self.assertEqual(counts('skill', 'robot'), {'Robotics': 1})
+        self.assertEqual(counts('name', 'jane'), {'Jane Doe': 1})
+        self.assertEqual(counts('department', 'computer'), {'Computer Science': before['Computer Science'] + 1})
+
+        professor.delete()
+        self.assertEqual(counts('skill', 'robot'), {})
+        self.assertEqual(counts('name', 'jane'), {})
+        self.assertEqual(counts('department', 'computer'), before)
+
+    def test_update_swaps_old_terms_for_new(self):
+        professor = Professor.objects.create(name='Jane Doe', department=self.department, skills='Robotics, AI')
+        professor = Professor.objects.get(id=professor.id)
+        professor.skills = 'Robotics, Vision'
+        professor.name = 'Jane Q. Doe'
+        professor.department = self.physics
+        professor.save()
+
+        self.assertEqual(counts('skill', 'ai'), {})
+        self.assertEqual(counts('skill', 'vision'), {'Vision': 1})
+        self.assertEqual(counts('skill', 'robot'), {'Robotics': 1})
+        self.assertEqual(counts('name', 'jane'), {'Jane Q. Doe': 1})
+        self.assertEqual(counts('department', 'physics'), {'Physics': 2})
+
+        # Saving again without changes, or from an instance that wasn't loaded, counts nothing twice
+        professor.save()
+        Professor(id=professor.id, name=professor.name, department=self.physics, skills=professor.skills,
+                  created_at=professor.created_at).save()
+        self.assertEqual(counts('skill', 'vision'), {'Vision': 1})
+        self.assertEqual(counts('department', 'physics'), {'Physics': 2})
+
+    def test_location_rename_moves_its_count(self):
+        Professor.objects.create(name='Jane Doe', department=self.department, skills='AI')
+        Professor.objects.create(name='Richard Roe', department=self.physics, skills='AI')
+        self.assertEqual(counts('university', 'example'), {'Example University': 3})
+
+        university = self.department.university
+        university.name = 'Sample University'
+        university.save()
+        self.assertEqual(counts('university', 'example'), {})
+        self.assertEqual(counts('university', 'sample'), {'Sample University': 3})
+
+        # Saving without a rename changes nothing
+        university.save()
+        self.assertEqual(counts('university', 'sample'), {'Sample University': 3})
+
+    def test_location_delete_discards_it(self):
+        Professor.objects.create(name='Jane Doe', department=self.physics, skills='AI')
+        self.physics.delete()
+        self.assertEqual(counts('department', 'physics'), {})
+        self.assertEqual(counts('name', 'jane'), {})
+        self.assertEqual(counts('department', 'computer'), {'Computer Science': 1})
+
+    def test_location_move_rebuilds(self):
+        other = create_department('History', university='Other University')
+        department = Department.objects.get(id=self.physics.id)
+        department.university = other.university
+        department.save()
+        self.assertFalse(suggest_index.built)
+        self.assertEqual(counts('university', 'other'), {'Other University': 1})
+
+    def test_department_merge_rebuilds_after_commit(self):
+        duplicate = create_department('Comp. Sci.')
+        Professor.objects.create(name='Jane Doe', department=duplicate, skills='AI')
+        review = CanonicalNameReview.objects.create(
+            kind='department', raw_name='Comp. Sci.', score=0.7,
+            department=duplicate, suggested_department=self.department,
+        )
+        suggest_index.warm()
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_review(review)
+        self.assertEqual(counts('department', 'comp'), {'Computer Science': 2})
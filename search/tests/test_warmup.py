@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.core.signals import request_started
+from django.test import SimpleTestCase, override_settings
+
+from search import warmup
+
+
+@override_settings(WARMUP_ENABLED=True, WARMUP_UPSTREAM_CONNECTIONS=True)
+class WarmUpTests(SimpleTestCase):
+    def setUp(self):
+        for name in ('_import_views', '_prime_queries', '_build_indexes', '_close_connections',
+                     '_open_upstream_connections'):
+            patcher = mock.patch.object(warmup, name)
+            setattr(self, name.strip('_'), patcher.start())
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(warmup, '_process_warmed', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(request_started.disconnect, dispatch_uid='search.warmup')
+
+    def test_closes_connections_and_defers_upstream_to_first_request(self):
+        timings = warmup.warm_up(import_seconds=0.5)
+
+        self.assertEqual(set(timings), {'import', 'views', 'database', 'indexes'})
+        self.close_connections.assert_called_once_with()
+        self.open_upstream_connections.assert_not_called()
+
+        with mock.patch.object(warmup.threading, 'Thread') as thread:
+            request_started.send(sender=None)
+            request_started.send(sender=None)
+            self.assertEqual(thread.call_count, 1)
+            # A forked worker starts its own
+            with mock.patch.object(warmup.os, 'getpid', return_value=-1):
+                request_started.send(sender=None)
+            self.assertEqual(thread.call_count, 2)
+
+    def test_failed_phase_does_not_stop_warm_up(self):
+        self.prime_queries.side_effect = RuntimeError('no database')
+        self.assertIn('indexes', warmup.warm_up())
+        self.close_connections.assert_called_once_with()
@@ -1,11 +1,207 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import render
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+import hashlib
 import json
+import math
 
+from .canonical import resolve_department, resolve_university
+from .changes import (
+    DELETED, CursorExpired, InvalidCursor, changes_since, decode_cursor, encode_cursor, latest_position
+)
+from .dedup import find_matching_professor
+from .encoding import json_response
+from .freshness import REFRESHED_FIELDS, apply_fresh_details, fresh_filter
+from .hierarchy import hierarchy_cache
+from .listcache import batched_bumps, cached_list
+from .metrics import COUNT_BUCKETS, metrics, record_cache, stage_timer
 from .models import Country, City, University, Department, Professor
-from .services import ProfessorSearchService
+from .normalize import normalize_text
+from .routing import LATENCY_TIERS, model_stats
+from .services import Deadline, ProfessorSearchService
+from .similarity import similarity_index
+from .sqlbudget import query_budget
+from .suggest import SUGGEST_FIELDS, suggest_index
 
+
+def _filter_professors(professors, country=None, city=None, university=None,
+                       department=None, skills=None):
+    """Apply the optional location/skills filters shared by the list and search APIs"""
+    if country or city or university or department:
+        # Resolve location names in memory to a plain department_id filter
+        department_ids = hierarchy_cache.department_ids(country, city, university, department)
+        if department_ids is not None:
+            professors = professors.filter(department_id__in=department_ids)
+        else:
+            professors = _filter_locations_by_join(professors, country, city, university, department)
+    if skills:
+        professors = professors.filter(skills__icontains=skills)
+    return professors
+
+
+def _filter_locations_by_join(professors, country, city, university, department):
+    """Location name filters as SQL joins, for filters too broad to list by id"""
+    if country:
+        professors = professors.filter(
+            department__university__city__country__name__icontains=country
+        )
+    if city:
+        professors = professors.filter(
+            department__university__city__name__icontains=city
+        )
+    if university:
+        professors = professors.filter(
+            department__university__name__icontains=university
+        )
+    if department:
+        professors = professors.filter(
+            department__name__icontains=department
+        )
+    return professors
+
+
+def _department_location(department):
+    """Location names of a department, read through its relations"""
+    return {
+        'department': department.name,
+        'university': department.university.name,
+        'city': department.university.city.name,
+        'country': department.university.city.country.name,
+    }
+
+
+def _location(department_id):
+    """Location names of a department id, from the hierarchy cache when possible"""
+    location = hierarchy_cache.path(department_id)
+    if location is None:
+        location = _department_location(
+            Department.objects.select_related('university__city__country').get(pk=department_id)
+        )
+    return location
+
+
+def _serialize_professor(professor):
+    """Return the JSON representation of a professor used by the APIs"""
+    location = hierarchy_cache.path(professor.department_id)
+    if location is None:
+        location = _department_location(professor.department)
+    return {
+        'id': professor.id,
+        'name': professor.name,
+        'email': professor.email,
+        'portfolio_link': professor.portfolio_link,
+        'skills': professor.skills,
+        'department': location['department'],
+        'university': location['university'],
+        'city': location['city'],
+        'country': location['country'],
+    }
+
+
+COMPACT_FIELDS = ('id', 'name', 'email', 'portfolio_link', 'skills')
+LOCATION_FIELDS = ('department', 'university', 'city', 'country')
+
+
+def _compact_professors(professors):
+    """
+    Columnar form of a professor queryset: one array per field, with the
+    location names dictionary-encoded. ``dictionaries[field]`` lists each
+    distinct department/university/city/country once and the matching column
+    holds indexes into it, so row i of the page is::
+
+        {f: columns[f][i] for f in COMPACT_FIELDS} |
+        {f: dictionaries[f][columns[f][i]] for f in LOCATION_FIELDS}
+    """
+    columns = {field: [] for field in COMPACT_FIELDS + LOCATION_FIELDS}
+    dictionaries = {field: [] for field in LOCATION_FIELDS}
+    codes = {field: {} for field in LOCATION_FIELDS}
+    locations = {}
+    for row in professors.values_list(*COMPACT_FIELDS, 'department_id'):
+        for field, value in zip(COMPACT_FIELDS, row):
+            columns[field].append(value)
+        department_id = row[-1]
+        if department_id not in locations:
+            location = _location(department_id)
+            encoded = []
+            for field in LOCATION_FIELDS:
+                code = codes[field].get(location[field])
+                if code is None:
+                    code = codes[field][location[field]] = len(dictionaries[field])
+                    dictionaries[field].append(location[field])
+                encoded.append(code)
+            locations[department_id] = encoded
+        for field, code in zip(LOCATION_FIELDS, locations[department_id]):
+            columns[field].append(code)
+    return {'fields': COMPACT_FIELDS + LOCATION_FIELDS, 'columns': columns, 'dictionaries': dictionaries}
+
+
+def _local_matches(country, city, university, department, skills,
+                   exclude_ids=(), fresh_only=False, limit=20):
+    """Stored professors matching a search, optionally only recently verified ones"""
+    professors = _filter_professors(
+        Professor.objects.all(), country, city, university, department, skills
+    ).exclude(id__in=exclude_ids)
+    if fresh_only:
+        professors = professors.filter(fresh_filter(settings.SEARCH_LOCAL_MAX_AGE_DAYS))
+    return list(professors[:limit])
+
+
+def _negative_cache_key(country, city, university, department, skills):
+    """Cache key for a search whose upstream outcome was empty"""
+    normalized = '|'.join(normalize_text(value) for value in (country, city, university, department, skills))
+    return 'search:empty:' + hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _deadline_seconds(requested):
+    """Clamp a client-supplied search timeout to the configured limits"""
+    if requested in (None, ''):
+        return settings.SEARCH_DEFAULT_DEADLINE_SECONDS
+    seconds = float(requested)
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError('timeout must be a positive number of seconds')
+    return min(seconds, settings.SEARCH_MAX_DEADLINE_SECONDS)
+
+
+def _flag(data, key, default: bool) -> bool:
+    """
+    A boolean request field. JSON booleans, 0/1 and the strings true/false,
+    1/0, yes/no and on/off are accepted; anything else raises ValueError, so
+    "false" can't switch an option on just by being a non-empty string.
+    """
+    value = data.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ('true', '1', 'yes', 'on'):
+            return True
+        if text in ('false', '0', 'no', 'off'):
+            return False
+    raise ValueError(f'{key} must be true or false')
+
+
+def _local_search_response(professors, source):
+    """Search API response built only from stored professors"""
+    return JsonResponse({
+        'success': True,
+        'partial': False,
+        'degraded': False,
+        'source': source,
+        'results_found': len(professors),
+        'professors': [{**_serialize_professor(p), 'created': False} for p in professors]
+    })
+
+# Saving each upstream result takes a handful of lookups and writes
+@query_budget(queries=400, seconds=2.0)
 @csrf_exempt
 @require_http_methods(["POST"])
 def search_professors_api(request):
@@ -26,69 +222,137 @@ def search_professors_api(request):
                 'error': 'Missing required fields: country, city, university, skills'
             }, status=400)
         
+        try:
+            deadline = Deadline(_deadline_seconds(data.get('timeout')))
+        except (TypeError, ValueError):
+            return JsonResponse({
+                'error': 'timeout must be a positive number of seconds'
+            }, status=400)
+        
+        tier = data.get('tier') or settings.GROQ_DEFAULT_TIER
+        if tier not in LATENCY_TIERS:
+            return JsonResponse({
+                'error': f"tier must be one of: {', '.join(LATENCY_TIERS)}"
+            }, status=400)
+        
+        try:
+            fan_out = _flag(data, 'fan_out', settings.TAVILY_FAN_OUT)
+            local_first = _flag(data, 'local_first', settings.SEARCH_LOCAL_FIRST)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        # Local-first: answer from stored professors when we have enough fresh ones
+        if local_first:
+            local_professors = _local_matches(
+                country, city, university, department, skills, fresh_only=True
+            )
+            enough = len(local_professors) >= settings.SEARCH_LOCAL_MIN_RESULTS
+            record_cache('search_local_first', enough)
+            if enough:
+                return _local_search_response(local_professors, 'local')
+        
+        # A recent identical search found nothing upstream; don't pay for it again
+        empty_key = _negative_cache_key(country, city, university, department, skills)
+        known_empty = bool(cache.get(empty_key))
+        record_cache('search_negative', known_empty)
+        if known_empty:
+            return _local_search_response(
+                _local_matches(country, city, university, department, skills), 'negative_cache'
+            )
+        
         # Perform search
         search_service = ProfessorSearchService()
         professors_data = search_service.search_and_extract_professors(
-            country, city, university, department, skills
+            country, city, university, department, skills,
+            deadline=deadline, tier=tier, fan_out=fan_out
         )
+        partial = search_service.partial
+        
+        # Remember genuinely empty outcomes (not timeouts or outages) for a short while
+        if not professors_data and not partial and not search_service.failed:
+            cache.set(empty_key, True, settings.SEARCH_NEGATIVE_CACHE_TTL)
         
         # Save results to database
         saved_professors = []
-        for prof_data in professors_data:
-            try:
-                # Get or create the location hierarchy
-                country_obj, _ = Country.objects.get_or_create(
-                    name=country,
-                    defaults={'code': country[:3].upper()}
-                )
+        # One list cache bump for the whole batch rather than one per saved row
+        with stage_timer('save'), batched_bumps():
+            for prof_data in professors_data:
+                if deadline.expired():
+                    print(f"Search deadline reached, skipping {len(professors_data) - len(saved_professors)} unsaved results")
+                    partial = True
+                    break
+                try:
+                    # Get or create the location hierarchy (ids come from the in-memory cache)
+                    city_id = hierarchy_cache.city_id(city, hierarchy_cache.country_id(country))
+                    # A city created inside an open transaction isn't cached until it commits
+                    city_obj = hierarchy_cache.instance('city', city_id) or City.objects.get(id=city_id)
                 
-                city_obj, _ = City.objects.get_or_create(
-                    name=city,
-                    country=country_obj
-                )
+                    # Map LLM spellings ("M.I.T.", "MIT") to canonical rows
+                    university_obj = resolve_university(
+                        prof_data.get('university') or university, city_obj
+                    )
                 
-                university_obj, _ = University.objects.get_or_create(
-                    name=prof_data.get('university', university),
-                    city=city_obj
-                )
+                    department_obj = resolve_department(
+                        prof_data.get('department') or department, university_obj
+                    )
                 
-                department_obj, _ = Department.objects.get_or_create(
-                    name=prof_data.get('department', department),
-                    university=university_obj
-                )
+                    # Reuse an existing row for the same person ("Dr. Jane Doe" vs "Jane Doe")
+                    professor = find_matching_professor(
+                        prof_data.get('name', ''), prof_data.get('email', ''),
+                        department_obj, settings.DEDUP_MATCH_THRESHOLD
+                    )
+                    created = False
+                    if professor is None:
+                        # Create or get professor
+                        professor, created = Professor.objects.get_or_create(
+                            name=prof_data.get('name', ''),
+                            department=department_obj,
+                            defaults={
+                                'email': prof_data.get('email', ''),
+                                'portfolio_link': prof_data.get('portfolio_link', ''),
+                                'skills': prof_data.get('skills', ''),
+                                'last_verified_at': timezone.now(),
+                            }
+                        )
+                    if not created:
+                        # Existing row: take the newer contact details and mark it verified
+                        apply_fresh_details(professor, prof_data)
+                        professor.save(update_fields=REFRESHED_FIELDS)
                 
-                # Create or get professor
-                professor, created = Professor.objects.get_or_create(
-                    name=prof_data.get('name', ''),
-                    department=department_obj,
-                    defaults={
-                        'email': prof_data.get('email', ''),
-                        'portfolio_link': prof_data.get('portfolio_link', ''),
-                        'skills': prof_data.get('skills', ''),
-                    }
-                )
+                    saved_professors.append({
+                        **_serialize_professor(professor),
+                        'created': created
+                    })
                 
+                except Exception as e:
+                    print(f"Error saving professor {prof_data.get('name', 'Unknown')}: {e}")
+        
+        # Out of budget or upstream down: fill in with professors we already know about
+        if partial:
+            known_ids = {p['id'] for p in saved_professors}
+            local_professors = _local_matches(
+                country, city, university, department, skills, exclude_ids=known_ids
+            )
+            for professor in local_professors:
                 saved_professors.append({
-                    'id': professor.id,
-                    'name': professor.name,
-                    'email': professor.email,
-                    'portfolio_link': professor.portfolio_link,
-                    'skills': professor.skills,
-                    'department': professor.department.name,
-                    'university': professor.department.university.name,
-                    'city': professor.department.university.city.name,
-                    'country': professor.department.university.city.country.name,
-                    'created': created
+                    **_serialize_professor(professor),
+                    'created': False
                 })
-                
-            except Exception as e:
-                print(f"Error saving professor {prof_data.get('name', 'Unknown')}: {e}")
         
-        return JsonResponse({
+        metrics.observe('search_results_per_request', 'Professors returned per upstream search',
+                        len(saved_professors), buckets=COUNT_BUCKETS, partial=partial)
+        
+        response_data = {
             'success': True,
+            'partial': partial,
+            'degraded': search_service.degraded,
+            'source': 'upstream',
             'results_found': len(saved_professors),
             'professors': saved_professors
-        })
+        }
+        if search_service.fanout_stats:
+            response_data['fan_out'] = search_service.fanout_stats
+        return JsonResponse(response_data)
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON data'}, status=400)
@@ -105,28 +369,10 @@ def list_professors_api(request):
         university = request.GET.get('university')
         department = request.GET.get('department')
         skills = request.GET.get('skills')
-        
-        professors = Professor.objects.all()
-        
-        # Apply filters
-        if country:
-            professors = professors.filter(
-                department__university__city__country__name__icontains=country
-            )
-        if city:
-            professors = professors.filter(
-                department__university__city__name__icontains=city
-            )
-        if university:
-            professors = professors.filter(
-                department__university__name__icontains=university
-            )
-        if department:
-            professors = professors.filter(
-                department__name__icontains=department
-            )
-        if skills:
-            professors = professors.filter(skills__icontains=skills)
+        # "compact" returns columnar arrays instead of one object per professor
+        response_format = request.GET.get('format', 'objects')
+        if response_format not in ('objects', 'compact'):
+            return JsonResponse({'error': 'format must be "objects" or "compact"'}, status=400)
         
         # Pagination
         page = int(request.GET.get('page', 1))
@@ -134,40 +380,155 @@ def list_professors_api(request):
         start = (page - 1) * page_size
         end = start + page_size
         
-        total_count = professors.count()
-        professors_page = professors[start:end]
-        
-        professors_data = []
-        for professor in professors_page:
-            professors_data.append({
-                'id': professor.id,
-                'name': professor.name,
-                'email': professor.email,
-                'portfolio_link': professor.portfolio_link,
-                'skills': professor.skills,
-                'department': professor.department.name,
-                'university': professor.department.university.name,
-                'city': professor.department.university.city.name,
-                'country': professor.department.university.city.country.name,
-            })
+        def build():
+            professors = _filter_professors(
+                Professor.objects.all(), country, city, university, department, skills
+            )
+            total_count = professors.count()
+            professors_page = professors[start:end]
+            
+            if response_format == 'compact':
+                return {
+                    'success': True,
+                    'total_count': total_count,
+                    'page': page,
+                    'page_size': page_size,
+                    'format': 'compact',
+                    **_compact_professors(professors_page),
+                }
+            
+            return {
+                'success': True,
+                'total_count': total_count,
+                'page': page,
+                'page_size': page_size,
+                'professors': [_serialize_professor(professor) for professor in professors_page]
+            }
+        
+        params = [country, city, university, department, skills, response_format, page, page_size]
+        return json_response(cached_list('list', params, build))
+        
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def changes_api(request):
+    """REST API endpoint for professors created, updated or deleted since a cursor"""
+    try:
+        try:
+            position = decode_cursor(request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        limit = int(request.GET.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+        limit = min(max(limit, 1), settings.CHANGE_FEED_MAX_PAGE_SIZE)
+        
+        try:
+            entries, position, has_more = changes_since(position, limit)
+        except CursorExpired as e:
+            # Too old to catch up from the log: re-read the list API, then follow resync_cursor
+            return JsonResponse({
+                'error': str(e),
+                'resync_cursor': encode_cursor(latest_position())
+            }, status=410)
+        
+        professors = Professor.objects.in_bulk(
+            [entry['professor_id'] for entry in entries if entry['action'] != DELETED]
+        )
+        changes = []
+        for entry in entries:
+            professor = professors.get(entry['professor_id'])
+            if professor is None:
+                # Deleted since this change was logged; the delete is later in the log
+                changes.append({'id': entry['professor_id'], 'action': DELETED, 'professor': None})
+            else:
+                changes.append({
+                    'id': entry['professor_id'],
+                    'action': entry['action'],
+                    'professor': _serialize_professor(professor)
+                })
+        
+        return json_response({
+            'success': True,
+            'changes': changes,
+            'next_cursor': encode_cursor(position),
+            'has_more': has_more
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def similar_professors_api(request):
+    """REST API endpoint for professors with similar skills to a professor or free-text skills"""
+    try:
+        professor_id = request.GET.get('professor_id')
+        skills = request.GET.get('skills')
+        limit = min(int(request.GET.get('limit', 10)), 100)
+        approximate = request.GET.get('approximate', '').lower() in ('1', 'true')
+        
+        if not professor_id and not skills:
+            return JsonResponse({'error': 'Provide professor_id or skills'}, status=400)
+        
+        if not similarity_index.available():
+            return JsonResponse({
+                'error': 'Similarity index not available; install numpy and run manage.py build_similarity_index'
+            }, status=503)
+        
+        exclude_ids = []
+        if professor_id:
+            professor = Professor.objects.filter(id=professor_id).first()
+            if professor is None:
+                return JsonResponse({'error': 'Professor not found'}, status=404)
+            vector = similarity_index.row_vector(professor.id)
+            if vector is None:
+                vector = similarity_index.vectorize(professor.skills)
+            exclude_ids.append(professor.id)
+        else:
+            vector = similarity_index.vectorize(skills)
+        
+        matches = similarity_index.query(vector, limit, exclude_ids=exclude_ids, approximate=approximate)
+        professors = Professor.objects.in_bulk([professor_id for professor_id, _ in matches])
+        
+        professors_data = [
+            {**_serialize_professor(professors[match_id]), 'score': round(score, 4)}
+            for match_id, score in matches if match_id in professors
+        ]
         
         return JsonResponse({
             'success': True,
-            'total_count': total_count,
-            'page': page,
-            'page_size': page_size,
             'professors': professors_data
         })
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@require_http_methods(["GET"])
+def suggest_api(request):
+    """REST API endpoint for typeahead suggestions, served from an in-memory prefix index"""
+    try:
+        field = request.GET.get('field', '')
+        prefix = request.GET.get('q', '')
+        limit = min(int(request.GET.get('limit', 10)), 50)
+        
+        if field not in SUGGEST_FIELDS:
+            return JsonResponse({
+                'error': f"field must be one of: {', '.join(SUGGEST_FIELDS)}"
+            }, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'field': field,
+            'suggestions': suggest_index.suggest(field, prefix, limit)
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 @require_http_methods(["GET"])
 def list_countries_api(request):
     """REST API endpoint to list all countries"""
     try:
-        countries = Country.objects.all().order_by('name')
-        countries_data = [{'id': c.id, 'name': c.name, 'code': c.code} for c in countries]
+        countries_data = cached_list('locations', ['countries'], lambda: [
+            {'id': c.id, 'name': c.name, 'code': c.code} for c in Country.objects.all().order_by('name')
+        ])
         
         return JsonResponse({
             'success': True,
@@ -180,8 +541,9 @@ def list_countries_api(request):
 def list_cities_api(request, country_id):
     """REST API endpoint to list cities by country"""
     try:
-        cities = City.objects.filter(country_id=country_id).order_by('name')
-        cities_data = [{'id': c.id, 'name': c.name} for c in cities]
+        cities_data = cached_list('locations', ['cities', country_id], lambda: [
+            {'id': c.id, 'name': c.name} for c in City.objects.filter(country_id=country_id).order_by('name')
+        ])
         
         return JsonResponse({
             'success': True,
@@ -194,8 +556,9 @@ def list_cities_api(request, country_id):
 def list_universities_api(request, city_id):
     """REST API endpoint to list universities by city"""
     try:
-        universities = University.objects.filter(city_id=city_id).order_by('name')
-        universities_data = [{'id': u.id, 'name': u.name} for u in universities]
+        universities_data = cached_list('locations', ['universities', city_id], lambda: [
+            {'id': u.id, 'name': u.name} for u in University.objects.filter(city_id=city_id).order_by('name')
+        ])
         
         return JsonResponse({
             'success': True,
@@ -208,8 +571,9 @@ def list_universities_api(request, city_id):
 def list_departments_api(request, university_id):
     """REST API endpoint to list departments by university"""
     try:
-        departments = Department.objects.filter(university_id=university_id).order_by('name')
-        departments_data = [{'id': d.id, 'name': d.name} for d in departments]
+        departments_data = cached_list('locations', ['departments', university_id], lambda: [
+            {'id': d.id, 'name': d.name} for d in Department.objects.filter(university_id=university_id).order_by('name')
+        ])
         
         return JsonResponse({
             'success': True,
@@ -217,3 +581,42 @@ def list_departments_api(request, university_id):
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
+
+@require_http_methods(["GET"])
+def metrics_api(request):
+    """Prometheus text-format metrics for this process"""
+    if not settings.METRICS_ENABLED:
+        raise Http404('Metrics are disabled')
+    for model, stats in model_stats.snapshot().items():
+        for outcome in ('success', 'parse_error', 'error'):
+            metrics.set('groq_model_calls', 'Groq calls by routed model and outcome',
+                        stats[outcome], model=model, outcome=outcome)
+        metrics.set('groq_model_avg_latency_seconds', 'Mean Groq latency by routed model',
+                    stats['avg_latency'], model=model)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def profiles_admin(request):
+    """Staff page listing captured request profiles"""
+    from .profiling import profile_store
+
+    return render(request, 'admin/search/profiles.html', {
+        'title': 'Request profiles',
+        'profiles': profile_store.list(),
+        'enabled': settings.PROFILING_ENABLED,
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def profile_download(request, profile_id, kind):
+    """Download a profile as pstats data (.prof) or SQL + summary (.json)"""
+    from .profiling import profile_store
+
+    try:
+        path = profile_store.path(profile_id, '.' + kind)
+    except FileNotFoundError:
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,154 @@
+"""
+Worker warm-up.
+
+Serving processes call ``warm_up()`` from wsgi.py / asgi.py once Django is set
+up (not from AppConfig.ready(), which every management command runs too), so
+the first requests a worker serves don't pay for:
+
+- importing the URLconf, the views and the libraries they load lazily;
+- running the list and location queries once so the database pages they read
+  are cached;
+- building the in-process indexes (hierarchy, canonical names, suggestions,
+  similarity vectors);
+- TLS handshakes with the upstream APIs, done on a background thread so a slow
+  or unreachable upstream never delays startup.
+
+Servers that load the application once and then fork workers (gunicorn
+--preload) run the import-time phases in the parent. So nothing that can't
+cross fork() is left behind: the database connections are closed again once
+the queries have run, leaving SQLite's pages in the OS cache, and the upstream
+connections are opened per process, by a background thread started on that
+process's first request.
+
+Durations are exported as ``worker_startup_seconds{phase=...}``; the latency of
+a worker's first request is recorded by MetricsMiddleware.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.signals import request_started
+
+from .metrics import metrics
+
+
+def _timed(timings: Dict[str, float], phase: str, step: Callable[[], None]):
+    started = time.perf_counter()
+    try:
+        step()
+    except Exception as e:
+        # A cold start is slower, not broken: keep serving
+        print(f"Warm-up phase {phase} failed: {e}")
+    timings[phase] = time.perf_counter() - started
+    metrics.set('worker_startup_seconds', 'Worker startup time by phase', timings[phase], phase=phase)
+
+
+def _import_views():
+    from django.urls import get_resolver
+
+    from .services import requests
+    from .similarity import np
+
+    get_resolver().url_patterns
+    requests.load()
+    if np is not None:
+        np.load()
+
+
+def _prime_queries():
+    from django.core.cache import caches
+    from django.db import connections
+
+    from .changes import latest_position
+    from .models import Country, Professor
+
+    for alias in settings.DATABASES:
+        connections[alias].ensure_connection()
+    Professor.objects.count()
+    list(Professor.objects.all()[:20])
+    list(Country.objects.order_by('name'))
+    latest_position()
+    caches['default'].get('warmup:probe')
+
+
+def _build_indexes():
+    from .canonical import canonical_index
+    from .hierarchy import hierarchy_cache
+    from .similarity import similarity_index
+    from .suggest import suggest_index
+
+    hierarchy_cache.warm()
+    canonical_index.warm()
+    suggest_index.warm()
+    similarity_index.warm()
+
+
+def _close_connections():
+    from django.db import connections
+
+    connections.close_all()
+
+
+def _open_upstream_connections():
+    """HEAD each configured upstream so its pooled session holds an open connection"""
+    from .services import upstream_session
+
+    upstreams = (
+        ('tavily', settings.TAVILY_API_URL, os.getenv('TAVILY_API_KEY')),
+        ('groq', settings.GROQ_API_URL, os.getenv('GROQ_API_KEY')),
+    )
+    for name, url, key in upstreams:
+        if not key:
+            continue
+        parts = urlsplit(url)
+        started = time.perf_counter()
+        try:
+            upstream_session(name).head(f'{parts.scheme}://{parts.netloc}/',
+                                        timeout=settings.WARMUP_CONNECT_TIMEOUT_SECONDS)
+        except Exception as e:
+            print(f"Warm-up connection to {name} failed: {e}")
+            continue
+        metrics.set('worker_startup_seconds', 'Worker startup time by phase',
+                    time.perf_counter() - started, phase=f'connect_{name}')
+
+
+_process_lock = threading.Lock()
+# Process that last started its upstream warm-up; compared with os.getpid() after fork()
+_process_warmed = None
+
+
+def _warm_process(**kwargs):
+    """request_started receiver: once per process, open upstream connections in the background"""
+    global _process_warmed
+    if _process_warmed == os.getpid():
+        return
+    with _process_lock:
+        if _process_warmed == os.getpid():
+            return
+        _process_warmed = os.getpid()
+    threading.Thread(target=_open_upstream_connections, name='warmup-upstream', daemon=True).start()
+
+
+def warm_up(import_seconds: Optional[float] = None) -> Dict[str, float]:
+    """Run the warm-up phases; ``import_seconds`` is how long loading the application took"""
+    timings: Dict[str, float] = {}
+    if import_seconds is not None:
+        timings['import'] = import_seconds
+        metrics.set('worker_startup_seconds', 'Worker startup time by phase', import_seconds, phase='import')
+    if not settings.WARMUP_ENABLED:
+        return timings
+
+    _timed(timings, 'views', _import_views)
+    _timed(timings, 'database', _prime_queries)
+    _timed(timings, 'indexes', _build_indexes)
+    # This may be a parent about to fork workers: don't hand them its sqlite handles
+    _close_connections()
+    if settings.WARMUP_UPSTREAM_CONNECTIONS:
+        request_started.connect(_warm_process, dispatch_uid='search.warmup')
+
+    summary = ', '.join(f'{phase} {seconds * 1000:.0f}ms' for phase, seconds in timings.items())
+    print(f"Worker {os.getpid()} warmed up: {summary}")
+    return timings